@@ -0,0 +1,93 @@
+"""Benchmark which compares the memory footprint of storing lexc
+   sublexicons as a `dict` of `set`s of LexcEntry objects and as a
+   LexiconStore.
+
+   The benchmark generates synthetic stem and ending entries which
+   resemble those in a large Ojibwe verb lexicon. Run as:
+
+   ```
+   python -m fstmorph.benchmarks.lexicon_memory --lemmas 100000
+   ```
+
+"""
+
+import click
+import random
+import time
+import tracemalloc
+
+from fstmorph.src.lexc_path import LexcEntry
+from fstmorph.src.lexicon_store import LexiconStore
+
+PARADIGMS = ["VAI", "VII", "VTA", "VTI"]
+CLASSES = ["C", "Cw", "V", "VV", "n", "aa", "i", "am"]
+PREFIXES = ["NI", "GI", "O", "NONE"]
+ORDERS = ["Ind", "Cnj", "Other"]
+
+def synthetic_entries(lemmas:int, endings:int, seed:int=0):
+    """Yield `(lexicon, analysis, surface, next_lexicon)` tuples for
+       `lemmas` stem entries and `endings` ending entries. Strings are
+       built freshly for every entry, as they are when they are read
+       from spreadsheets.
+
+    """
+    rng = random.Random(seed)
+    letters = "abcdeghijkmnoswyz'"
+    for i in range(lemmas):
+        paradigm = rng.choice(PARADIGMS)
+        klass = f"{paradigm}_{rng.choice(CLASSES)}"
+        lemma = "".join(rng.choice(letters) for _ in range(rng.randint(4, 12)))
+        yield (f"{paradigm}_Stems", lemma, lemma,
+               f"{paradigm}_Class={klass}_Boundary")
+    for i in range(endings):
+        paradigm = rng.choice(PARADIGMS)
+        klass = f"{paradigm}_{rng.choice(CLASSES)}"
+        prefix = rng.choice(PREFIXES)
+        order = rng.choice(ORDERS)
+        lexicon = f"{paradigm}_Class={klass}_Prefix={prefix}_Order={order}_Endings"
+        yield (lexicon, f"+{paradigm}+{order}+Pos+Neu+{i % 40}SgSubj+{i % 23}PlObj",
+               f"igo{i % 997}nan", "EncliticRoot")
+
+def measure(build) -> tuple[int, float]:
+    """Return the memory (in bytes) retained by the object returned by
+       `build()` and the time it took to build it.
+
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    lexicons = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del lexicons
+    return size, elapsed
+
+def build_dict(lemmas, endings):
+    lexicons = {}
+    for entry in synthetic_entries(lemmas, endings):
+        if not entry[0] in lexicons:
+            lexicons[entry[0]] = set()
+        lexicons[entry[0]].add(LexcEntry(*entry))
+    return lexicons
+
+def build_store(lemmas, endings):
+    lexicons = LexiconStore()
+    for entry in synthetic_entries(lemmas, endings):
+        if not entry[0] in lexicons:
+            lexicons[entry[0]] = set()
+        lexicons[entry[0]].add(entry)
+    return lexicons
+
+@click.command()
+@click.option('--lemmas', required=False, default=100000, type=int, help="Number of stem entries")
+@click.option('--endings', required=False, default=100000, type=int, help="Number of ending entries")
+def main(lemmas, endings):
+    dict_size, dict_time = measure(lambda: build_dict(lemmas, endings))
+    store_size, store_time = measure(lambda: build_store(lemmas, endings))
+    print(f"{lemmas} stem entries, {endings} ending entries")
+    print(f"dict of sets: {dict_size / 2**20:8.1f} MiB {dict_time:6.2f} s")
+    print(f"LexiconStore: {store_size / 2**20:8.1f} MiB {store_time:6.2f} s")
+    print(f"Memory saving: {100 * (1 - store_size / dict_size):.1f}%")
+
+if __name__=="__main__":
+    main()
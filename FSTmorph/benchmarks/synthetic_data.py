@@ -0,0 +1,336 @@
+"""Generator for synthetic OjibweMorph-shaped input data.
+
+   The generated directory contains everything `csv2lexc` needs: verb
+   and noun paradigm spreadsheets with `FormNSurface`/`FormNSplit`
+   columns, irregular verb spreadsheets, preverb and prenoun
+   spreadsheets, a derivation spreadsheet, enclitics, Jinja templates,
+   JSON configuration files and two lexical databases with an
+   exclusion list:
+
+   ```
+   OUTPUT_DIR/Morph/config/{verbs,nouns}.json
+   OUTPUT_DIR/Morph/{Verb,Noun,PV,PN,Other,Derivational}Spreadsheets/*.csv
+   OUTPUT_DIR/Morph/templates/*.lexc.j2
+   OUTPUT_DIR/Lex/{OPD,Community}/{VERBS,NOUNS,LEXICAL_PREVERBS}.csv
+   OUTPUT_DIR/Lex/exclude.csv
+   ```
+
+   The data is deterministic for a given seed. Run as:
+
+   ```
+   python -m fstmorph.benchmarks.synthetic_data --output-dir /tmp/synthetic --size medium
+   ```
+
+   and compile it with:
+
+   ```
+   python -m fstmorph.csv2lexc --config-files /tmp/synthetic/Morph/config/verbs.json,/tmp/synthetic/Morph/config/nouns.json --source-path /tmp/synthetic/Morph --database-paths /tmp/synthetic/Lex/OPD,/tmp/synthetic/Lex/Community --lexical-data-to-exclude /tmp/synthetic/Lex/exclude.csv --lexc-path /tmp/synthetic/lexc --add-derivations True
+   ```
+
+"""
+
+import click
+import csv
+import json
+import os
+import random
+from collections import namedtuple
+from os.path import join as pjoin
+
+SIZES = {"small": 1000,
+         "medium": 100000,
+         "large": 1000000}
+"""Number of lemmas for the predefined data sizes."""
+
+DATABASES = ["OPD", "Community"]
+"""Names of the generated lexical database directories."""
+
+LETTERS = "abcdeghijkmnoswyz'"
+
+VERB_FEATURES = ["Paradigm", "Order", "Negation", "Mode", "Subject", "Object"]
+NOUN_FEATURES = ["Paradigm", "Possessor", "Number"]
+
+VERB_CLASSES = {"VTA": ["VTA_C", "VTA_Cw", "VTA_aw", "VTA_s"],
+                "VAI": ["VAI_V", "VAI_n", "VAI_am", "VAI_rfx"],
+                "VII": ["VII_VV", "VII_d", "VII_n"],
+                "VTI": ["VTI_am", "VTI_oo", "VTI_aa"]}
+NOUN_CLASSES = {"NA": ["NA_C", "NA_V", "NA_Cw"],
+                "NI": ["NI_C", "NI_V"]}
+
+PREFIXES = {"1": "ni", "2": "gi", "3": "o", "0": "o"}
+"""Person prefixes used in the independent order."""
+
+SUBJECTS = ["1Sg", "2Sg", "3Sg", "1PlExcl", "21Pl", "2Pl", "3Pl", "3Obv"]
+INANIMATE_SUBJECTS = ["0Sg", "0Pl", "0Obv"]
+OBJECTS = ["1Sg", "2Sg", "3SgProx", "3PlProx", "3Obv"]
+INANIMATE_OBJECTS = ["0Sg", "0Pl"]
+ORDERS = ["Ind", "Cnj"]
+NEGATIONS = ["Pos", "Neg"]
+MODES = ["Neu", "Prt", "Dub", "PrtDub"]
+NUMBERS = ["Sg", "Pl", "Obv", "Loc"]
+POSSESSORS = ["NONE", "1SgPoss", "2SgPoss", "3SgPoss", "1PlExclPoss", "3PlPoss"]
+
+VERB_HEADER = ["Paradigm", "Order", "Class", "Lemma", "Stem", "Subject", "Object", "Mode", "Negation",
+               "Form1Surface", "Form1Split", "Form1Source", "Form2Surface", "Form2Split", "Form2Source"]
+NOUN_HEADER = ["Paradigm", "Class", "Lemma", "Stem", "Number", "Possessor",
+               "Form1Surface", "Form1Split", "Form2Surface", "Form2Split"]
+PRE_ELEMENT_HEADER = ["PV", "Tag", "Independent", "PlainConjunct", "ChangedConjunct"]
+DATABASE_HEADER = ["Paradigm", "Class", "Lemma", "Stem", "Gloss"]
+
+SyntheticData = namedtuple("SyntheticData",
+                           ["config_files",
+                            "source_path",
+                            "database_paths",
+                            "lexical_data_to_exclude"])
+SyntheticData.__doc__ = \
+"""Paths of generated synthetic data in the form expected by
+    `csv2lexc`: a list of configuration files, the source path, a list
+    of lexical database directories and the exclusion CSV.
+
+"""
+
+ROOT_TEMPLATE = """Multichar_Symbols
+@U.ChCnj.On@ @D.ChCnj@ @C.ChCnj@ %<EMPTYLEX%>
+{{ add_harvested_multichar_symbols() }}
+
+LEXICON Root
+VerbRoot ;
+VerbRootIrregular ;
+NounRoot ;
+"""
+
+PREVERB_TEMPLATE = """! Preverbs
+Multichar_Symbols
+{{ all_pre_element_tags() }}
+{{ add_lexeme_multichar_symbols() }}
+
+LEXICON PreverbRoot
+VerbStems ;
+PVTense ;
+PVDir ;
+PVLex ;
+
+{{ generate_pre_element_sub_lexicons([("PV_tns.csv","PVTense/")],"PVTense") }}
+
+{{ generate_pre_element_sub_lexicons([("PV_dir.csv","PVDir/")],"PVDir") }}
+
+LEXICON PVLex
+{{ load_pre_element_database("PVLex/","PreverbRoot") }}
+"""
+
+PRENOUN_TEMPLATE = """LEXICON PrenounRoot
+NounStems ;
+PNLex ;
+
+LEXICON PNLex
+{{ load_pre_element_csv([("PN_lex.csv","PNLex/")],"PrenounRoot","Any") }}
+"""
+
+ENCLITIC_TEMPLATE = """LEXICON EncliticRoot
+# ;
+{{ load_enclitic_csv([("ENCLITICS.csv","Enc/")],"#") }}
+"""
+
+def write_csv(path:str, header:list[str], rows) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def random_word(rng:random.Random, min_length:int, max_length:int) -> str:
+    return "".join(rng.choice(LETTERS) for _ in range(rng.randint(min_length, max_length)))
+
+def get_verb_rows(rng:random.Random, paradigm:str, order:str) -> list[list[str]]:
+    """Return the rows of the inflection table for one verb paradigm and
+       order. Each class has one example lemma. Independent forms get a
+       person prefix. About a third of the forms have an alternative
+       second form.
+
+    """
+    subjects = INANIMATE_SUBJECTS if paradigm == "VII" else SUBJECTS
+    objects = (OBJECTS if paradigm == "VTA" else
+               INANIMATE_OBJECTS if paradigm == "VTI" else
+               ["NONE"])
+    rows = []
+    for klass in VERB_CLASSES[paradigm]:
+        lemma = random_word(rng, 4, 8)
+        for subject in subjects:
+            for obj in objects:
+                if obj[0] == subject[0] and obj != "NONE":
+                    continue
+                for negation in NEGATIONS:
+                    for mode in MODES:
+                        prefix = PREFIXES[subject[0]] if order == "Ind" else ""
+                        suffix = (f"{subject.lower()}{'' if obj == 'NONE' else obj.lower()}"
+                                  f"{'sii' if negation == 'Neg' else ''}{mode.lower()}")
+                        form = [f"{prefix}{lemma}{suffix}", f"{prefix}<<{lemma}>>{suffix}", "Synthetic"]
+                        alternative = ["", "", ""]
+                        if rng.random() < 0.3:
+                            alternative = [f"{prefix}{lemma}{suffix}an", f"{prefix}<<{lemma}>>{suffix}an", "Synthetic"]
+                        rows.append([paradigm, order, klass, lemma, lemma,
+                                     f"{subject}Subj", obj if obj == "NONE" else f"{obj}Obj",
+                                     mode, negation] + form + alternative)
+    return rows
+
+def get_noun_rows(rng:random.Random) -> list[list[str]]:
+    """Return the rows of the noun inflection table."""
+    rows = []
+    for paradigm, classes in NOUN_CLASSES.items():
+        for klass in classes:
+            lemma = random_word(rng, 4, 8)
+            for number in NUMBERS:
+                for possessor in POSSESSORS:
+                    prefix = "" if possessor == "NONE" else PREFIXES[possessor[0]]
+                    suffix = number.lower() + ("" if possessor == "NONE" else "im")
+                    rows.append([paradigm, klass, lemma, lemma, number, possessor,
+                                 f"{prefix}{lemma}{suffix}", f"{prefix}<<{lemma}>>{suffix}", "", ""])
+    return rows
+
+def get_derivation_rows() -> list[list[str]]:
+    """Return derivations from every class of an input paradigm to every
+       class of the output paradigm.
+
+    """
+    rows = []
+    for form, input_paradigm, output_paradigm in [("magad", "VAI", "VII"),
+                                                  ("ige", "VTA", "VAI"),
+                                                  ("ewizi", "VTI", "VAI")]:
+        for input_class in VERB_CLASSES[input_paradigm]:
+            for output_class in VERB_CLASSES[output_paradigm]:
+                rows.append([form, f"Der/{form}", input_paradigm, input_class,
+                             output_paradigm, output_class])
+    return rows
+
+def get_database_rows(rng:random.Random, classes:dict[str, list[str]], lemmas:int):
+    """Yield `lemmas` lexical database rows for random classes."""
+    paradigms = list(classes)
+    for _ in range(lemmas):
+        paradigm = rng.choice(paradigms)
+        lemma = random_word(rng, 3, 12)
+        yield [paradigm, rng.choice(classes[paradigm]), lemma, lemma, "synthetic"]
+
+def get_configs() -> tuple[dict, dict]:
+    """Return the verb and noun configurations."""
+    verb_config = {"pos": "Verb",
+                   "root_lexicon": "VerbRoot",
+                   "morphology_source_path": "./VerbSpreadsheets/",
+                   "regular_csv_files": [f"{paradigm}_{order.upper()}"
+                                         for paradigm in VERB_CLASSES for order in ORDERS],
+                   "irregular_csv_files": ["VAI_IRR"],
+                   "lexical_database": "VERBS.csv",
+                   "lexical_prefix_database": "LEXICAL_PREVERBS.csv",
+                   "regular_lexc_file": "ojibwe_verbs.lexc",
+                   "irregular_lexc_file": "ojibwe_irregular_verbs.lexc",
+                   "morph_features": VERB_FEATURES,
+                   "missing_tag_marker": "NONE",
+                   "missing_form_marker": "MISSING",
+                   "multichar_symbols": ["<T>"],
+                   "pre_element_tag": "[PREVERB]",
+                   "prefix_root": "PreverbRoot",
+                   "template_path": "./templates/preverbs.lexc.j2",
+                   "pv_source_path": "./PVSpreadsheets",
+                   "derivational_csv_file": "./DerivationalSpreadsheets/Der.csv"}
+    noun_config = {"pos": "Noun",
+                   "root_lexicon": "NounRoot",
+                   "morphology_source_path": "./NounSpreadsheets/",
+                   "regular_csv_files": ["NOUNS"],
+                   "irregular_csv_files": [],
+                   "lexical_database": "NOUNS.csv",
+                   "regular_lexc_file": "ojibwe_nouns.lexc",
+                   "irregular_lexc_file": "None",
+                   "morph_features": NOUN_FEATURES,
+                   "missing_tag_marker": "NONE",
+                   "missing_form_marker": "MISSING",
+                   "multichar_symbols": [],
+                   "prefix_root": "PrenounRoot",
+                   "template_path": "./templates/prenouns.lexc.j2",
+                   "pv_source_path": "./PNSpreadsheets"}
+    return verb_config, noun_config
+
+def generate(output_dir:str, lemmas:int, seed:int=0) -> SyntheticData:
+    """Generate synthetic data with `lemmas` lexical database entries
+       (split between the databases, three quarters verbs and one
+       quarter nouns) into `output_dir`.
+
+    """
+    rng = random.Random(seed)
+    source_path = pjoin(output_dir, "Morph")
+    database_paths = [pjoin(output_dir, "Lex", name) for name in DATABASES]
+    for directory in ["config", "VerbSpreadsheets", "NounSpreadsheets", "templates", "PVSpreadsheets",
+                      "PNSpreadsheets", "OtherSpreadsheets", "DerivationalSpreadsheets"]:
+        os.makedirs(pjoin(source_path, directory), exist_ok=True)
+    for database_path in database_paths:
+        os.makedirs(database_path, exist_ok=True)
+
+    for paradigm in VERB_CLASSES:
+        for order in ORDERS:
+            write_csv(pjoin(source_path, "VerbSpreadsheets", f"{paradigm}_{order.upper()}.csv"),
+                      VERB_HEADER, get_verb_rows(rng, paradigm, order))
+    write_csv(pjoin(source_path, "VerbSpreadsheets", "VAI_IRR.csv"), VERB_HEADER,
+              [["VAI", "Ind", "VAI_irr", "izhi", "izhi", f"{subject}Subj", "NONE", "Neu", "Pos",
+                f"{PREFIXES[subject[0]]}dizhi{subject.lower()}", "", "", "", "", ""]
+               for subject in SUBJECTS])
+    write_csv(pjoin(source_path, "NounSpreadsheets", "NOUNS.csv"), NOUN_HEADER, get_noun_rows(rng))
+
+    write_csv(pjoin(source_path, "PVSpreadsheets", "PV_tns.csv"), PRE_ELEMENT_HEADER,
+              [["gii", "PVTense", "gii", "gii", "gaa"],
+               ["wii", "PVTense", "wii", "wii", "waa"],
+               ["ga", "PVTense", "ga", "ge", "NONE"]])
+    write_csv(pjoin(source_path, "PVSpreadsheets", "PV_dir.csv"), PRE_ELEMENT_HEADER,
+              [["ni", "PVDir", "ni", "ni", "eni"],
+               ["bi", "PVDir", "bi", "bi", "baa"],
+               ["o", "PVDir", "o", "o", "NONE"]])
+    write_csv(pjoin(source_path, "PNSpreadsheets", "PN_lex.csv"), PRE_ELEMENT_HEADER,
+              [["gichi", "PNLex", "gichi", "gichi", ""],
+               ["oshki", "PNLex", "oshki", "oshki", ""]])
+    write_csv(pjoin(source_path, "OtherSpreadsheets", "ENCLITICS.csv"), ["Full_Form", "Clitic_Form", "POS"],
+              [["sa", "sa", "Adv"], ["na", "na", "Q"], ["gosha", "gosha", "Adv"]])
+    write_csv(pjoin(source_path, "DerivationalSpreadsheets", "Der.csv"),
+              ["Form", "Tag", "InputParadigm", "InputClass", "OutputParadigm", "OutputClass"],
+              get_derivation_rows())
+
+    for name, template in [("root.lexc.j2", ROOT_TEMPLATE),
+                           ("preverbs.lexc.j2", PREVERB_TEMPLATE),
+                           ("prenouns.lexc.j2", PRENOUN_TEMPLATE),
+                           ("enclitics.lexc.j2", ENCLITIC_TEMPLATE)]:
+        with open(pjoin(source_path, "templates", name), "w") as f:
+            f.write(template)
+
+    verb_config, noun_config = get_configs()
+    config_files = [pjoin(source_path, "config", "verbs.json"),
+                    pjoin(source_path, "config", "nouns.json")]
+    for config_file, config in zip(config_files, [verb_config, noun_config]):
+        with open(config_file, "w") as f:
+            json.dump(config, f, indent=2)
+
+    verb_lemmas = lemmas * 3 // 4
+    for i, database_path in enumerate(database_paths):
+        # Split the lemmas evenly between the databases
+        share = lambda total: total // len(database_paths) + (i < total % len(database_paths))
+        write_csv(pjoin(database_path, "VERBS.csv"), DATABASE_HEADER,
+                  get_database_rows(rng, VERB_CLASSES, share(verb_lemmas)))
+        write_csv(pjoin(database_path, "NOUNS.csv"), DATABASE_HEADER,
+                  get_database_rows(rng, NOUN_CLASSES, share(lemmas - verb_lemmas)))
+        write_csv(pjoin(database_path, "LEXICAL_PREVERBS.csv"), ["Paradigm", "Lemma", "Stem"],
+                  [["PVLex", random_word(rng, 4, 8), random_word(rng, 4, 8)] for _ in range(50)])
+    lexical_data_to_exclude = pjoin(output_dir, "Lex", "exclude.csv")
+    write_csv(lexical_data_to_exclude, ["Directory", "Field", "Value"],
+              [[DATABASES[0], "Class", "VAI_rfx"],
+               [DATABASES[-1], "Lemma", "izhi"]])
+    return SyntheticData(config_files, source_path, database_paths, lexical_data_to_exclude)
+
+@click.command()
+@click.option('--output-dir', required=True, help="Directory into which the data is written")
+@click.option('--size', required=False, default="small", type=click.Choice(list(SIZES)),
+              help="Predefined data size: small (1k lemmas), medium (100k lemmas) or large (1M lemmas)")
+@click.option('--lemmas', required=False, default=None, type=int,
+              help="Number of lemmas in the lexical databases. Overrides --size")
+@click.option('--seed', required=False, default=0, type=int, help="Random seed")
+def main(output_dir, size, lemmas, seed):
+    data = generate(output_dir, lemmas if lemmas is not None else SIZES[size], seed)
+    print(f"--config-files {','.join(data.config_files)} --source-path {data.source_path}",
+          f"--database-paths {','.join(data.database_paths)}",
+          f"--lexical-data-to-exclude {data.lexical_data_to_exclude}")
+
+if __name__=="__main__":
+    main()
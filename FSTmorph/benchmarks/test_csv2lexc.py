@@ -0,0 +1,135 @@
+"""pytest-benchmark harness which times the phases of a csv2lexc build
+   on synthetic data (see `synthetic_data.py`):
+
+   * reading the inflection tables,
+   * constructing lexc paths from the inflection tables,
+   * ingesting the lexical databases,
+   * adding derivations,
+   * writing the lexc file,
+   * rendering the Jinja templates and
+   * a complete in-memory build.
+
+   The benchmarks run offline on data generated into a temporary
+   directory. The size of the data is set by the environment variable
+   `FSTMORPH_BENCHMARK_SIZE` (`small`, `medium` or `large`, default
+   `small`) or `FSTMORPH_BENCHMARK_LEMMAS` (number of lemmas). The
+   harness requires pytest-benchmark and is skipped if it isn't
+   installed.
+
+   Save a baseline (e.g. on the main branch):
+
+   ```
+   pytest FSTmorph/benchmarks --benchmark-autosave
+   ```
+
+   and compare a later run against it, failing if the mean time of a
+   phase has regressed by more than 20%:
+
+   ```
+   pytest FSTmorph/benchmarks --benchmark-compare --benchmark-compare-fail=mean:20%
+   ```
+
+   Baselines are stored in `.benchmarks` in the working directory
+   (see `--benchmark-storage`). Timings are only comparable between
+   runs on the same machine and with the same data size.
+"""
+
+import os
+from os.path import join as pjoin
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from fstmorph.benchmarks.synthetic_data import generate, SIZES
+from fstmorph.csv2lexc import read_config, csv2lexc_modules
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.csv_cache import csv_cache
+from fstmorph.src.lexicon import LexcFile
+from fstmorph.src.templates import render_pre_element_module, render_enclitic_module, render_root_module
+
+ROUNDS = 5
+"""Number of timed rounds for each phase."""
+
+def get_lemma_count() -> int:
+    """Return the number of lemmas given by the environment."""
+    if os.environ.get("FSTMORPH_BENCHMARK_LEMMAS"):
+        return int(os.environ["FSTMORPH_BENCHMARK_LEMMAS"])
+    return SIZES[os.environ.get("FSTMORPH_BENCHMARK_SIZE", "small")]
+
+@pytest.fixture(scope="session")
+def data(tmp_path_factory):
+    return generate(str(tmp_path_factory.mktemp("synthetic_data")), get_lemma_count())
+
+@pytest.fixture(scope="session")
+def verb_config(data):
+    return read_config(data.config_files[0], data.database_paths, alt_tag=False)
+
+def make_lexc_file(data, config, lexc_path=None, read_lexical_database=False):
+    """Build the regular verb LexcFile without derivations."""
+    return LexcFile(config,
+                    data.source_path,
+                    lexc_path,
+                    data.database_paths,
+                    data.lexical_data_to_exclude,
+                    read_lexical_database,
+                    add_derivations=False,
+                    regular=True,
+                    context=BuildContext())
+
+def test_read_csv(benchmark, data, verb_config):
+    paths = [pjoin(data.source_path, verb_config["morphology_source_path"], f"{name}.csv")
+             for name in verb_config["regular_csv_files"]]
+    def read_tables():
+        context = BuildContext()
+        for path in paths:
+            context.read_csv(path, keep_default_na=False)
+    benchmark.pedantic(read_tables, setup=csv_cache.clear, rounds=ROUNDS)
+
+def test_path_construction(benchmark, data, verb_config):
+    # The inflection tables are read once and then served by the CSV
+    # cache, so this only times the construction of the sublexicons
+    make_lexc_file(data, verb_config)
+    lexicon = benchmark.pedantic(make_lexc_file, args=(data, verb_config), rounds=ROUNDS)
+    assert len(lexicon.lexicons) > 1
+
+def test_database_ingestion(benchmark, data, verb_config):
+    def setup():
+        return (make_lexc_file(data, verb_config),), {}
+    def ingest(lexicon):
+        lexicon.read_lexemes_from_database(data.database_paths, data.lexical_data_to_exclude)
+    benchmark.pedantic(ingest, setup=setup, rounds=ROUNDS)
+
+def test_derivations(benchmark, data, verb_config):
+    def setup():
+        return (make_lexc_file(data, verb_config, read_lexical_database=True),), {}
+    benchmark.pedantic(LexcFile.add_derivations, setup=setup, rounds=ROUNDS)
+
+def test_write(benchmark, data, verb_config, tmp_path):
+    lexicon = make_lexc_file(data, verb_config, str(tmp_path), read_lexical_database=True)
+    lexc_file = pjoin(str(tmp_path), verb_config["regular_lexc_file"])
+    def setup():
+        # write_lexc() doesn't rewrite unchanged files
+        if os.path.exists(lexc_file):
+            os.remove(lexc_file)
+    benchmark.pedantic(lexicon.write_lexc, setup=setup, rounds=ROUNDS)
+    assert os.path.exists(lexc_file)
+
+def test_template_rendering(benchmark, data, verb_config):
+    def render():
+        context = BuildContext()
+        render_pre_element_module(verb_config, data.source_path, context).text()
+        render_enclitic_module(data.source_path, data.database_paths, context).text()
+        render_root_module(pjoin(data.source_path, "templates", "root.lexc.j2"), context).text()
+    benchmark.pedantic(render, setup=csv_cache.clear, rounds=ROUNDS)
+
+def test_build(benchmark, data):
+    def build():
+        for module in csv2lexc_modules(data.config_files,
+                                       data.source_path,
+                                       data.database_paths,
+                                       data.lexical_data_to_exclude,
+                                       add_derivations=True):
+            module.text()
+    # Every build reads the spreadsheets through a new CSV cache
+    benchmark.pedantic(build, rounds=ROUNDS)
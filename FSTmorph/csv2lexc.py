@@ -21,39 +21,216 @@
    To compile the lexc files, you can use the unix command `cat` to combine them into a file
    all.lexc. The file root.lexc should be at the top of all.lexc. Apart from that, order doesn't
    matter when concatenating.
+
+   The parameter `jobs` gives the number of worker processes used for compiling the configuration
+   files. With `jobs` > 1, each configuration file is compiled in a separate process. The output is
+   identical to a serial build.
+
+   If `build_cache` is enabled, a content-hash cache is kept in `lexc_path`. Lexc files whose
+   inputs (configuration, spreadsheets, lexical databases, exclusions and templates) haven't
+   changed since the previous build are not regenerated.
+
+   If `database_chunk_size` is positive, each lexical database is streamed in chunks of that many
+   rows. Peak memory then depends on the chunk size rather than on the size of the database files.
+   With `database_threads` > 1, the databases in `database_paths` are read concurrently.
+
+   If `prune` is enabled, sublexicons which can't be reached from the root lexicon and entries
+   which can't lead to the end of a word are removed before writing the lexc files. This doesn't
+   change the accepted language. If `merge_lexicons` is enabled, sublexicons accepting the same
+   language (e.g. the flag and ending lexicons of inflection classes with identical endings) are
+   merged into one. Both process one lexc file at a time, but keep the sublexicons which other lexc
+   files refer to: the root lexicons, the POS stem lexicons and the targets of the derivations of
+   all configuration files.
+
+   If `prune_flags` is enabled, the flag diacritics in all generated lexc files (including those
+   rendered from templates) are analyzed together after the build. Entries which can't occur on
+   any path satisfying the flags are removed, and the expected size increase caused by eliminating
+   the flags of each feature is reported. Since this depends on all lexc files, the build cache
+   isn't used together with `prune_flags`.
+
+   If `estimate` is enabled, the number of paths through the lexicon (with and without flag
+   diacritics) and the number of arcs before and after flag elimination are estimated after the
+   build and reported per configuration file. The estimate is also written into `estimate.json` in
+   `lexc_path`, so that it can be tracked between builds.
+
+   If `profile` is enabled, the wall time, CPU time, memory use and row/entry counts of each build
+   stage (loading a configuration, each inflection table, each lexical database, derivations, each
+   lexc file written and each template rendered) are written into `profile.json` in `lexc_path`.
+   Tracing Python allocations with tracemalloc slows down the build. Disable `profile_memory` to
+   record only times, RSS and counts. Pass a `profiler.Profiler` in the BuildContext to profile
+   `csv2lexc_modules`. If `profile_stats` is enabled, the build runs under cProfile and the
+   statistics are written into `profile.pstats` (which can be read with the `pstats` module).
+   Stages compiled in worker processes are included in `profile.json` but not in `profile.pstats`.
+
+   Messages are printed at the level `log_level` and above, as plain text or (with `log_format`
+   "json") as JSON lines. Repeated warnings, like invalid segmented forms, are only printed a few
+   times and summarized at the end of the build (see `log.Logger`).
+
+   All state of a build (harvested multichar symbols, caches and the logger) is kept in a
+   `BuildContext`, so several builds can run in the same process. Each build reads CSV files
+   through its own `CSVCache`, so the parsed spreadsheets are released when the build is done.
+
+   The functions `csv2lexc_modules` and `csv2lexc_chunks` generate the lexc files in memory
+   without writing anything into `lexc_path`. `csv2lexc_chunks` yields the contents of all.lexc
+   (with root.lexc at the top) as a sequence of strings, which can e.g. be written directly into
+   the standard input of foma.
 """
 
 import click
+import cProfile
 import json
-from os.path import join as pjoin
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from os.path import join as pjoin, basename
 
-from fstmorph.src.lexicon import LexcFile
-from fstmorph.src.templates import render_enclitic_lexicon, render_pre_element_lexicon, render_root_lexicon
-from fstmorph.src.log import set_verbose, info
+from fstmorph.src.build_cache import BuildCache, hash_inputs
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.csv_cache import CSVCache
+from fstmorph.src.lexicon import LexcFile, get_derivation_targets
+from fstmorph.src.lexc_estimate import estimate_modules, log_estimate, write_estimate
+from fstmorph.src.lexc_flags import prune_flag_paths
+from fstmorph.src.output import read_lexc_module
+from fstmorph.src.templates import (render_enclitic_lexicon, render_pre_element_lexicon, render_root_lexicon,
+                                    render_enclitic_module, render_pre_element_module, render_root_module)
+from fstmorph.src.log import Logger, LEVELS
+from fstmorph.src.profiler import Profiler
 
-# Can be imported into other scripts, or called from the command line via main()
-def csv2lexc(config_files, source_path, lexc_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, verbose):
-    set_verbose(verbose)
-    if verbose:
-        info("Compiling in verbose mode. Omit --verbose to disable.")
-    else:
-        info("Compiling in non-verbose mode. For more detailed diagnostics, use option --verbose=True.")
-    config_files = config_files.split(",")
-    info(f"Got {len(config_files)} configuration files: {', '.join(config_files)}")
-    database_paths = database_paths.split(",")
+ESTIMATE_FILE = "estimate.json"
+PROFILE_FILE = "profile.json"
+PROFILE_STATS_FILE = "profile.pstats"
 
-    # Collect POS root lexicons like NounRoot and VerbRoot. We need to
-    # refer to these from root.lexc
-    pos_root_lexicons = set()
+def build_unless_cached(context, output_file, input_hash, build):
+    """Call `build(context)` to generate `output_file` unless the build
+       cache of the BuildContext `context` tells us that its inputs are
+       unchanged. The multichar symbols harvested by `build()` are
+       stored in the cache. For skipped files, cached symbols are added
+       to the multichar symbols of `context` instead.
+
+    """
+    cache = context.build_cache
+    if cache is None:
+        build(context)
+        return
+    cached_symbols = cache.lookup(output_file, input_hash)
+    if cached_symbols is not None:
+        context.add_multichar_symbols(cached_symbols)
+        return
+    # Harvest the symbols for this output file into a fresh context
+    file_context = context.child()
+    build(file_context)
+    context.add_multichar_symbols(file_context.multichar_symbols)
+    cache.store(output_file, input_hash, file_context.multichar_symbols)
+
+def get_lexc_inputs(config, source_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, regular):
+    """Return the input files for the regular or irregular lexc file of a
+       configuration.
+
+    """
+    csv_names = config["regular_csv_files" if regular else "irregular_csv_files"]
+    files = [pjoin(source_path, config["morphology_source_path"], f"{name}.csv")
+             for name in csv_names]
+    if regular and read_lexical_database:
+        if config["lexical_database"] != "None":
+            files += [pjoin(database_path, config["lexical_database"])
+                      for database_path in database_paths]
+        if lexical_data_to_exclude:
+            files.append(lexical_data_to_exclude)
+    if regular and add_derivations and "derivational_csv_file" in config:
+        files.append(pjoin(source_path, config["derivational_csv_file"]))
+    return files
+
+def get_template_inputs(template_path, csv_src_path, database_paths, prefix_database):
+    """Return the input files for a Jinja template: the template itself,
+       every spreadsheet in the pre-element source directory and the
+       prefix database in each lexical database directory.
+
+    """
+    files = [template_path] + sorted(glob(pjoin(csv_src_path, "*.csv")))
+    if not prefix_database in ["None", None]:
+        files += [pjoin(database_path, prefix_database)
+                  for database_path in database_paths]
+    return files
+
+def get_config_lexc_file_names(config_file):
+    """Return the names of the lexc files generated for a single
+       configuration file.
+
+    """
+    config = json.load(open(config_file))
+    file_names = [config["regular_lexc_file"]]
+    if config["irregular_lexc_file"] != "None":
+        file_names.append(config["irregular_lexc_file"])
+    if config["template_path"] != "None":
+        file_names.append(basename(config["template_path"]).replace(".j2",""))
+    return file_names
+
+def get_lexc_file_names(config_files):
+    """Return the names of the lexc files generated for a list of
+       configuration files in the order in which they are concatenated
+       into all.lexc (root.lexc first).
+
+    """
+    file_names = ["root.lexc"]
     for config_file in config_files:
-        info(f"Processing configuration file {config_file}:")
-        config = json.load(open(config_file))
-        config["database_src_dirs"] = database_paths
-        config["append_alt_tag"] = alt_tag
-        info(json.dumps(config, indent=2),force=False)
-        pos_root_lexicons.add(config["root_lexicon"])
-        
-        # We'll first compile regular paradigms into a LEXC file 
+        file_names += get_config_lexc_file_names(config_file)
+    file_names.append("enclitics.lexc")
+    return file_names
+
+def get_shared_lexicons(config_files, source_path, add_derivations, context):
+    """Return the sublexicons which a lexc file may refer to in the lexc
+       file of another configuration, i.e. the targets of the
+       derivations of all configurations. Pruning and merging process
+       one lexc file at a time, so they have to keep these.
+
+    """
+    shared_lexicons = set()
+    if add_derivations:
+        for config_file in config_files:
+            shared_lexicons |= get_derivation_targets(json.load(open(config_file)),
+                                                      source_path, context)
+    return sorted(shared_lexicons)
+
+def read_config(config_file, database_paths, alt_tag, engine="columnar", database_chunk_size=0, database_threads=1, prune=False, merge_lexicons=False, shared_lexicons=()):
+    """Read a JSON configuration file and add the runtime options of
+       this build into it. `shared_lexicons` are the sublexicons
+       referenced across lexc files (see `get_shared_lexicons`).
+
+    """
+    config = json.load(open(config_file))
+    config["database_src_dirs"] = database_paths
+    config["append_alt_tag"] = alt_tag
+    config["lexc_engine"] = engine
+    config["database_chunk_size"] = database_chunk_size
+    config["database_threads"] = database_threads
+    config["prune_lexicons"] = prune
+    config["merge_lexicons"] = merge_lexicons
+    config["shared_lexicons"] = list(shared_lexicons)
+    return config
+
+def compile_config(config_file, source_path, lexc_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, engine="columnar", database_chunk_size=0, database_threads=1, prune=False, merge_lexicons=False, shared_lexicons=(), context=None):
+    """Compile the regular and irregular lexc files as well as the
+       pre-element (preverb/prenoun) lexc file for a single
+       configuration file. Multichar symbols are harvested into the
+       BuildContext `context`. If the context has a build cache,
+       files whose inputs are unchanged are not regenerated.
+
+       Returns the list of POS root lexicons (like `VerbRoot` and
+       `VerbRootIrregular`) which need to be referenced from root.lexc.
+
+    """
+    context = BuildContext() if context is None else context
+    info = context.info
+    pos_root_lexicons = []
+    info(f"Processing configuration file {config_file}:")
+    with context.stage("config_load"):
+        config = read_config(config_file, database_paths, alt_tag, engine,
+                             database_chunk_size, database_threads, prune, merge_lexicons,
+                             shared_lexicons)
+    info(lambda: json.dumps(config, indent=2),force=False)
+    pos_root_lexicons.append(config["root_lexicon"])
+
+    # We'll first compile regular paradigms into a LEXC file 
+    def build_regular(context):
         info("Reading spreadsheets for regular paradigms from directory:",
              f"{pjoin(source_path,config['morphology_source_path'])}")
         lexicon = LexcFile(config,
@@ -63,18 +240,28 @@ def csv2lexc(config_files, source_path, lexc_path, database_paths, lexical_data_
                            lexical_data_to_exclude,
                            read_lexical_database,
                            add_derivations,
-                           regular=True)
+                           regular=True,
+                           context=context)
         info(f"Writing lexc output to {config['regular_lexc_file']}")
         lexicon.write_lexc()
+    input_hash = hash_inputs(config,
+                             get_lexc_inputs(config, source_path, database_paths,
+                                             lexical_data_to_exclude, read_lexical_database,
+                                             add_derivations, regular=True),
+                             read_lexical_database=read_lexical_database,
+                             add_derivations=add_derivations,
+                             regular=True)
+    build_unless_cached(context, config["regular_lexc_file"], input_hash, build_regular)
 
-        # We'll then compile irregular paradigms into a different LEXC
-        # file. These need to be separated because, later on, phonological
-        # rules are only applied to regular paradigms.
-        if config['irregular_lexc_file'] != "None":
+    # We'll then compile irregular paradigms into a different LEXC
+    # file. These need to be separated because, later on, phonological
+    # rules are only applied to regular paradigms.
+    if config['irregular_lexc_file'] != "None":
+        config["root_lexicon"] += "Irregular"
+        pos_root_lexicons.append(config["root_lexicon"])
+        def build_irregular(context):
             info("Reading spreadsheets for irregular paradigms from directory:",
                  f"{pjoin(source_path,config['morphology_source_path'])}")
-            config["root_lexicon"] += "Irregular"
-            pos_root_lexicons.add(config["root_lexicon"])
             irregular_lexicon = LexcFile(config,
                                          source_path,
                                          lexc_path,
@@ -82,22 +269,249 @@ def csv2lexc(config_files, source_path, lexc_path, database_paths, lexical_data_
                                          lexical_data_to_exclude,
                                          read_lexical_database=False,
                                          add_derivations=False,
-                                         regular=False)
+                                         regular=False,
+                                         context=context)
             info(f"Writing lexc output to {config['irregular_lexc_file']}")
             irregular_lexicon.write_lexc()
+        input_hash = hash_inputs(config,
+                                 get_lexc_inputs(config, source_path, database_paths,
+                                                 lexical_data_to_exclude, False, False,
+                                                 regular=False),
+                                 regular=False)
+        build_unless_cached(context, config["irregular_lexc_file"], input_hash, build_irregular)
 
-        if config["template_path"] != "None":
+    if config["template_path"] != "None":
+        pos_root_lexicons.append(config["prefix_root"])
+        def build_pre_elements(context):
             info("Reading prefix template file from:",
                  f"{config['template_path']}")
             info("Reading prefix spreadsheets from directory:",
                  f"{config['pv_source_path']}")
             info(f"Writing lexc output to directory {lexc_path}")
-            pos_root_lexicons.add(config["prefix_root"])
-            render_pre_element_lexicon(config,source_path,lexc_path)
+            render_pre_element_lexicon(config,source_path,lexc_path,context)
+        input_hash = hash_inputs(config,
+                                 get_template_inputs(pjoin(source_path, config["template_path"]),
+                                                     pjoin(source_path, config["pv_source_path"]),
+                                                     database_paths,
+                                                     config.get("lexical_prefix_database")))
+        build_unless_cached(context,
+                            basename(config["template_path"]).replace(".j2",""),
+                            input_hash,
+                            build_pre_elements)
+    return pos_root_lexicons
+
+def compile_config_in_worker(logger_options, cache, profile, profile_memory, *args):
+    """Run `compile_config` in a worker process. Each configuration
+       file is built in its own BuildContext with its own copy of the
+       build cache and its own CSV cache, so we return the harvested symbols,
+       the updated build cache records and the CSV cache counters to the
+       parent process together with the POS root lexicons. If `profile`
+       is enabled, the worker also returns its profiling records
+       (tracing allocations if `profile_memory` is enabled).
+       `logger_options` are the keyword arguments for the worker's
+       Logger.
+
+    """
+    profiler = Profiler(trace_memory=profile_memory) if profile else None
+    context = BuildContext(Logger(**logger_options), CSVCache(), cache, profiler)
+    with context.stage("config", config=args[0]):
+        pos_root_lexicons = compile_config(*args, context=context)
+    context.logger.flush()
+    if profiler:
+        profiler.stop()
+    return (pos_root_lexicons,
+            context.multichar_symbols,
+            cache.updates if cache else {},
+            context.csv_cache.stats(),
+            profiler.records if profiler else [])
+
+def csv2lexc_modules(config_files, source_path, database_paths, lexical_data_to_exclude=None, read_lexical_database=True, add_derivations=False, alt_tag=False, engine="columnar", database_chunk_size=0, database_threads=1, prune=False, merge_lexicons=False, prune_flags=False, context=None):
+    """Generate all lexc files in memory. `config_files` and
+       `database_paths` are lists of paths. The remaining parameters
+       are the same as for `csv2lexc`.
+
+       Returns a list of LexcModule objects. The root.lexc module comes
+       first, followed by the modules for each configuration file and
+       finally enclitics.lexc, i.e. the modules are in the order in
+       which they should be concatenated into all.lexc.
+
+       The sublexicons of every lexc file are held in memory until the
+       modules are consumed, but the lexc code itself is generated
+       lazily. Summaries of repeated warnings are logged before
+       returning. Warnings from generating the lexc code are only
+       summarized when the caller flushes `context.logger` again.
+
+       Without a `context`, the modules are built in a new BuildContext
+       with its own CSV cache.
+
+    """
+    context = BuildContext(csv_cache=CSVCache()) if context is None else context
+    shared_lexicons = (get_shared_lexicons(config_files, source_path, add_derivations, context)
+                       if prune or merge_lexicons else [])
+    modules = []
+    for config_file in config_files:
+        with context.stage("config", config=config_file):
+            context.info(f"Processing configuration file {config_file}:")
+            with context.stage("config_load"):
+                config = read_config(config_file, database_paths, alt_tag, engine,
+                                     database_chunk_size, database_threads, prune, merge_lexicons,
+                                     shared_lexicons)
+            modules.append(LexcFile(config,
+                                    source_path,
+                                    None,
+                                    database_paths,
+                                    lexical_data_to_exclude,
+                                    read_lexical_database,
+                                    add_derivations,
+                                    regular=True,
+                                    context=context).to_module())
+            if config['irregular_lexc_file'] != "None":
+                config["root_lexicon"] += "Irregular"
+                modules.append(LexcFile(config,
+                                        source_path,
+                                        None,
+                                        database_paths,
+                                        lexical_data_to_exclude,
+                                        read_lexical_database=False,
+                                        add_derivations=False,
+                                        regular=False,
+                                        context=context).to_module())
+            if config["template_path"] != "None":
+                modules.append(render_pre_element_module(config, source_path, context))
+    modules.append(render_enclitic_module(source_path, database_paths, context))
+    # root.lexc declares the multichar symbols harvested from all other
+    # modules, so it has to be rendered last
+    root = render_root_module(pjoin(source_path,"templates","root.lexc.j2"), context)
+    modules = [root] + modules
+    if prune_flags:
+        prune_flag_paths(modules, context)
+    context.logger.flush()
+    return modules
+
+def csv2lexc_chunks(*args, context=None, **kwargs):
+    """Generate the contents of all.lexc in memory and yield them as a
+       sequence of strings. Takes the same parameters as
+       `csv2lexc_modules`.
+
+    """
+    context = BuildContext(csv_cache=CSVCache()) if context is None else context
+    for module in csv2lexc_modules(*args, context=context, **kwargs):
+        yield from module.chunks()
+    context.logger.flush()
+
+# Can be imported into other scripts, or called from the command line via main()
+def csv2lexc(config_files, source_path, lexc_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, verbose, jobs=1, build_cache=False, engine="columnar", database_chunk_size=0, database_threads=1, prune=False, merge_lexicons=False, prune_flags=False, estimate=False, profile=False, profile_memory=True, profile_stats=False, log_level=None, log_format="text"):
+    logger_options = {"verbose": verbose,
+                      "level": LEVELS[log_level] if log_level else None,
+                      "json_lines": log_format == "json"}
+    logger = Logger(**logger_options)
+    info = logger.info
+    if verbose:
+        info("Compiling in verbose mode. Omit --verbose to disable.")
+    else:
+        info("Compiling in non-verbose mode. For more detailed diagnostics, use option --verbose=True.")
+    config_files = config_files.split(",")
+    info(f"Got {len(config_files)} configuration files: {', '.join(config_files)}")
+    database_paths = database_paths.split(",")
+    if build_cache and prune_flags:
+        info("Not using the build cache because flag pruning depends on all lexc files.")
+        build_cache = False
+    cache = BuildCache(lexc_path, logger) if build_cache else None
+    profiler = Profiler(trace_memory=profile_memory) if profile else None
+    context = BuildContext(logger, CSVCache(), cache, profiler)
+    if profile_stats:
+        stats_profiler = cProfile.Profile()
+        stats_profiler.enable()
+
+    # Collect POS root lexicons like NounRoot and VerbRoot. We need to
+    # refer to these from root.lexc
+    pos_root_lexicons = set()
+    worker_csv_stats = {"hits": 0, "misses": 0, "evictions": 0}
+    # Derivations can continue into the lexc file of another
+    # configuration. Pruning and merging have to keep their targets.
+    shared_lexicons = (get_shared_lexicons(config_files, source_path, add_derivations, context)
+                       if prune or merge_lexicons else [])
+    args = [(config_file, source_path, lexc_path, database_paths, lexical_data_to_exclude,
+             read_lexical_database, add_derivations, alt_tag, engine, database_chunk_size, database_threads, prune, merge_lexicons,
+             shared_lexicons)
+            for config_file in config_files]
+    if jobs > 1:
+        # Each configuration file is compiled in a separate worker
+        # process. We merge the multichar symbols harvested by the
+        # workers in the order of the configuration files before
+        # rendering root.lexc. Since the symbols are sorted when
+        # root.lexc is rendered, the output is identical to a serial
+        # build.
+        info(f"Compiling configuration files using {jobs} worker processes.")
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(compile_config_in_worker, logger_options, cache, profile, profile_memory,
+                                       *config_args)
+                       for config_args in args]
+            for future in futures:
+                (config_root_lexicons, multichar_symbols,
+                 cache_updates, csv_cache_stats, profile_records) = future.result()
+                pos_root_lexicons.update(config_root_lexicons)
+                if profiler:
+                    profiler.merge(profile_records)
+                context.add_multichar_symbols(multichar_symbols)
+                if cache:
+                    cache.merge(cache_updates)
+                for counter, value in csv_cache_stats.items():
+                    worker_csv_stats[counter] += value
+    else:
+        for config_args in args:
+            with context.stage("config", config=config_args[0]):
+                pos_root_lexicons.update(compile_config(*config_args, context=context))
+
+    def build_enclitics(context):
+        render_enclitic_lexicon(source_path, lexc_path, database_paths, context)
+    input_hash = hash_inputs({},
+                             get_template_inputs(pjoin(source_path, "templates", "enclitics.lexc.j2"),
+                                                 pjoin(source_path, "OtherSpreadsheets"),
+                                                 database_paths,
+                                                 None))
+    build_unless_cached(context, "enclitics.lexc", input_hash, build_enclitics)
 
-    render_enclitic_lexicon(source_path, lexc_path, database_paths)
+    # root.lexc depends on the multichar symbols from all other files,
+    # so it is always rendered
     render_root_lexicon(pjoin(source_path,"templates","root.lexc.j2"),
-                        lexc_path)
+                        lexc_path,
+                        context)
+    if prune_flags or estimate:
+        modules = [read_lexc_module(lexc_path, file_name)
+                   for file_name in get_lexc_file_names(config_files)]
+    flag_analysis = None
+    if prune_flags:
+        flag_analysis = prune_flag_paths(modules, context)
+        for module in modules:
+            module.write(lexc_path)
+    if estimate:
+        config_lexc_files = {config_file: get_config_lexc_file_names(config_file)
+                             for config_file in config_files}
+        lexicon_estimate = estimate_modules(modules, analysis=flag_analysis)
+        log_estimate(lexicon_estimate, config_lexc_files, context,
+                     log_features=flag_analysis is None)
+        context.info(f"Writing estimate to {pjoin(lexc_path, ESTIMATE_FILE)}")
+        write_estimate(lexicon_estimate, pjoin(lexc_path, ESTIMATE_FILE), config_lexc_files)
+    if cache:
+        cache.save()
+    csv_stats = {counter: value + worker_csv_stats[counter]
+                 for counter, value in context.csv_cache.stats().items()}
+    info(f"CSV cache: {csv_stats['hits']} hits, {csv_stats['misses']} misses,",
+         f"{csv_stats['evictions']} evictions")
+    if profile_stats:
+        stats_profiler.disable()
+        info(f"Writing cProfile statistics to {pjoin(lexc_path, PROFILE_STATS_FILE)}")
+        stats_profiler.dump_stats(pjoin(lexc_path, PROFILE_STATS_FILE))
+    if profiler:
+        profiler.stop()
+        info("Build stages:")
+        for stage, total in profiler.totals().items():
+            info(f"  {stage}: {total['calls']} calls, {total['wall']:.2f} s wall,",
+                 f"{total['cpu']:.2f} s CPU")
+        info(f"Writing profile to {pjoin(lexc_path, PROFILE_FILE)}")
+        profiler.write(pjoin(lexc_path, PROFILE_FILE))
+    logger.flush()
 
 @click.command()
 @click.option('--config-files', required=True, help="JSON config files separated by commas. E.g. verb_conf.json, noun_conf.json")
@@ -114,8 +528,36 @@ def csv2lexc(config_files, source_path, lexc_path, database_paths, lexical_data_
               help="If this option is enabled, a \"+Alt\" tag is appended to \"non-standard\" analyses")
 @click.option('--verbose', required=False, default=False,
               help="Print very detailed diagnostics")
-def main(config_files, source_path, lexc_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, verbose):
-    csv2lexc(config_files, source_path, lexc_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, verbose)
+@click.option('--jobs', required=False, default=1, type=int,
+              help="Number of worker processes used for compiling configuration files in parallel")
+@click.option('--build-cache', required=False, default=False, type=bool,
+              help="Skip regenerating lexc files whose inputs haven't changed since the previous build")
+@click.option('--engine', required=False, default="columnar", type=click.Choice(["columnar", "rows"]),
+              help="Convert inflection tables using vectorized column operations (columnar) or one row at a time (rows)")
+@click.option('--database-chunk-size', required=False, default=0, type=int,
+              help="Read lexical databases in chunks of this many rows to bound memory usage (0 reads each database at once)")
+@click.option('--database-threads', required=False, default=1, type=int,
+              help="Number of threads used for reading the lexical databases in --database-paths concurrently")
+@click.option('--prune', required=False, default=False, type=bool,
+              help="Remove unreachable sublexicons and dead-end entries before writing lexc files")
+@click.option('--merge-lexicons', required=False, default=False, type=bool,
+              help="Merge sublexicons which accept the same language before writing lexc files")
+@click.option('--prune-flags', required=False, default=False, type=bool,
+              help="Remove entries with impossible flag diacritic combinations and report flag elimination costs")
+@click.option('--estimate', required=False, default=False, type=bool,
+              help="Whether to report the estimated number of paths and arcs of the lexicon and write it into estimate.json in lexc-path")
+@click.option('--profile', required=False, default=False, type=bool,
+              help="Whether to record time, memory use and counts for each build stage and write them into profile.json in lexc-path")
+@click.option('--profile-memory', required=False, default=True, type=bool,
+              help="Whether --profile traces Python allocations with tracemalloc, which slows down the build")
+@click.option('--profile-stats', required=False, default=False, type=bool,
+              help="Whether to run the build under cProfile and write the statistics into profile.pstats in lexc-path")
+@click.option('--log-level', required=False, default=None, type=click.Choice(["debug", "info", "warning", "error"]),
+              help="Only print messages at this level or above (default: info, or debug with --verbose)")
+@click.option('--log-format', required=False, default="text", type=click.Choice(["text", "json"]),
+              help="Print messages as plain text or as JSON lines")
+def main(config_files, source_path, lexc_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, verbose, jobs, build_cache, engine, database_chunk_size, database_threads, prune, merge_lexicons, prune_flags, estimate, profile, profile_memory, profile_stats, log_level, log_format):
+    csv2lexc(config_files, source_path, lexc_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, verbose, jobs, build_cache, engine, database_chunk_size, database_threads, prune, merge_lexicons, prune_flags, estimate, profile, profile_memory, profile_stats, log_level, log_format)
 
 if __name__=="__main__":
     main()
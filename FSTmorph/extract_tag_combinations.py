@@ -1,10 +1,10 @@
 """Script which extracts all tag combinations from paradigm CSV files."""
 
 import click
-import pandas as pd
 import json
 from os.path import join as pjoin
 from fstmorph.src.log import info
+from fstmorph.src.csv_cache import csv_cache, read_csv
 
 def get_tags(tag_list):
     """ Handle special characters """
@@ -34,7 +34,7 @@ def extract_tag_combinations(config_file, source_path, pre_element, pre_element_
     csv_files = config["regular_csv_files"] + config["irregular_csv_files"]
     for csv_file in csv_files:
         info(f"Reading {csv_file}.csv")
-        csv = pd.read_csv(pjoin(source_path, config["morphology_source_path"], f"{csv_file}.csv"),
+        csv = read_csv(pjoin(source_path, config["morphology_source_path"], f"{csv_file}.csv"),
                           keep_default_na=False)
         csv_tags = set() 
         for feature in config["morph_features"]:            
@@ -43,6 +43,7 @@ def extract_tag_combinations(config_file, source_path, pre_element, pre_element_
         tags[csv_file] = list(csv_tags)
     for feature in config["morph_features"]:
         tags[feature] = list(tags[feature])
+    info(f"CSV cache: {csv_cache.hits} hits, {csv_cache.misses} misses")
     info(f"Writing output JSON file {output_file}")
     with open(output_file, "w") as f:
         json.dump(tags, f, indent=4)
@@ -0,0 +1,86 @@
+"""Script for looking up analyses or intermediate forms in the lexicon
+   layer of the FST without compiling it with foma.
+
+   The lexicon is either generated in memory from the same resources as
+   `csv2lexc` (`config_files`, `source_path`, `database_paths`, ...) or
+   read from existing lexc files given in `lexc_files`.
+
+   Queries are read from `input_file` (one per line, standard input by
+   default). The output uses the format of `hfst-lookup`: one
+   tab-separated `input output` line per result followed by an empty
+   line. Queries without results are output as `input +?`.
+"""
+
+import click
+import sys
+
+from fstmorph.csv2lexc import csv2lexc_modules
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.lexc_lookup import LexcLookup, GENERATE, ANALYZE
+from fstmorph.src.log import Logger
+
+def get_lookup(lexc_files, config_files, source_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, context):
+    """Return a LexcLookup for existing lexc files or, if `lexc_files` is
+       not given, for lexc files generated in memory.
+
+    """
+    lookup = LexcLookup()
+    if lexc_files:
+        for lexc_file in lexc_files.split(","):
+            context.info(f"Reading {lexc_file}")
+            with open(lexc_file) as f:
+                lookup.add_lexc(f.read())
+        return lookup
+    if not (config_files and source_path):
+        raise click.UsageError("Give either --lexc-files or --config-files and --source-path")
+    modules = csv2lexc_modules(config_files.split(","),
+                               source_path,
+                               database_paths.split(",") if database_paths else [],
+                               lexical_data_to_exclude,
+                               read_lexical_database and bool(database_paths),
+                               add_derivations,
+                               alt_tag,
+                               context=context)
+    lookup = LexcLookup.from_modules(modules)
+    context.logger.flush()
+    return lookup
+
+# Can be imported into other scripts, or called from the command line via main()
+def lexc_lookup(lexc_files, config_files, source_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, direction, input_file, verbose):
+    context = BuildContext(Logger(verbose))
+    lookup = get_lookup(lexc_files, config_files, source_path, database_paths,
+                        lexical_data_to_exclude, read_lexical_database, add_derivations,
+                        alt_tag, context)
+    side = GENERATE if direction == "generate" else ANALYZE
+    queries = open(input_file) if input_file else sys.stdin
+    for line in queries:
+        query = line.rstrip("\n")
+        if query == "":
+            continue
+        results = lookup.lookup(query, side)
+        for result in results or ["+?"]:
+            print(f"{query}\t{result}")
+        print()
+
+@click.command()
+@click.option('--lexc-files', required=False, default=None, help="Existing lexc files separated by commas. The file containing the root lexicon should come first")
+@click.option('--config-files', required=False, default=None, help="JSON config files separated by commas. E.g. verb_conf.json, noun_conf.json")
+@click.option('--source-path', required=False, default=None, help="Path to the source files for the FST (e.g. your OjibweMorph directory)")
+@click.option('--database-paths', required=False, default=None, help="Path to lexical database directory for lemmas.  Can be multiple file paths separated by commas.")
+@click.option('--lexical-data-to-exclude', required=False, default=None, help="Data from database-paths that should NOT be included in the lexicon")
+@click.option('--read-lexical-database', required=False, default=True, type=bool,
+              help="Whether to include lexemes from an external lexicon database")
+@click.option('--add-derivations', required=False, default=False, type=bool,
+              help="Whether to include derivational morphology")
+@click.option('--alt-tag', required=False, default=False, type=bool,
+              help="If this option is enabled, a \"+Alt\" tag is appended to \"non-standard\" analyses")
+@click.option('--direction', required=False, default="generate", type=click.Choice(["generate", "analyze"]),
+              help="Map analyses to intermediate forms (generate) or intermediate forms to analyses (analyze)")
+@click.option('--input-file', required=False, default=None, help="File with one query per line (default: standard input)")
+@click.option('--verbose', required=False, default=False, type=bool,
+              help="Print very detailed diagnostics")
+def main(lexc_files, config_files, source_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, direction, input_file, verbose):
+    lexc_lookup(lexc_files, config_files, source_path, database_paths, lexical_data_to_exclude, read_lexical_database, add_derivations, alt_tag, direction, input_file, verbose)
+
+if __name__=="__main__":
+    main()
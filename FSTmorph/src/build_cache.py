@@ -0,0 +1,118 @@
+"""Content-hash based build cache for incremental lexc compilation.
+
+   The cache is stored as a JSON file in the lexc output directory. For
+   each generated file (e.g. `ojibwe_verbs.lexc` or `preverbs.lexc`), we
+   record a hash of all of its inputs (configuration, spreadsheets,
+   lexical databases, exclusion CSV, templates and the code in this
+   package), a hash of the generated file and the multichar symbols
+   which were harvested while generating it. When the inputs are
+   unchanged and the output file hasn't been modified, the file doesn't
+   need to be regenerated and the cached multichar symbols can be used
+   when rendering root.lexc.
+
+"""
+
+import hashlib
+import json
+from glob import glob
+from os.path import join as pjoin, dirname, exists
+
+from .log import Logger, default_logger
+
+CACHE_FILE_NAME = ".csv2lexc_cache.json"
+"""Name of the cache file in the lexc output directory."""
+
+HASH_BLOCK_SIZE = 1 << 20
+"""Files are hashed in blocks of this many bytes."""
+
+CODE_FILES = (sorted(glob(pjoin(dirname(__file__), "*.py"))) +
+              [pjoin(dirname(dirname(__file__)), "csv2lexc.py")])
+"""The lexc generation code in this package and the `csv2lexc.py`
+   driver. Changes in any of these invalidate the cache."""
+
+def hash_file(path:str) -> str:
+    """Return the SHA-256 hex digest of a file. Missing files hash to
+       `"missing"`, so that creating the file later on will invalidate
+       cache entries depending on it.
+
+    """
+    if path is None or not exists(path):
+        return "missing"
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def hash_inputs(config:dict, files:list[str], **params) -> str:
+    """Return a combined hash for a configuration, a list of input files
+       and additional build parameters like `read_lexical_database`.
+       The hash also covers `CODE_FILES`, so that changes in the lexc
+       generation code invalidate the cache.
+
+    """
+    sha = hashlib.sha256()
+    sha.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    sha.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    for path in CODE_FILES + list(files):
+        sha.update(f"{path}\t{hash_file(path)}\n".encode("utf-8"))
+    return sha.hexdigest()
+
+class BuildCache:
+    """The BuildCache maps generated file names to records:
+
+       ```
+       {"inputs": input_hash, "output": output_hash, "multichar_symbols": [...]}
+       ```
+
+       Records which are added or updated during a build are also
+       collected into `updates`. Worker processes return these to the
+       parent process, which merges them using `merge()`.
+
+    """
+    def __init__(self, lexc_path:str, logger:Logger=None):
+        self.logger = default_logger if logger is None else logger
+        self.path = pjoin(lexc_path, CACHE_FILE_NAME)
+        self.lexc_path = lexc_path
+        self.entries = {}
+        self.updates = {}
+        if exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (ValueError, OSError) as e:
+                self.logger.warn(f"Ignoring unreadable build cache {self.path}: {e}")
+
+    def lookup(self, output_file:str, input_hash:str) -> set[str]:
+        """Return the cached multichar symbols for `output_file` if its
+           inputs are unchanged and the file on disk is identical to the
+           one we generated. Otherwise, return `None`.
+
+        """
+        record = self.entries.get(output_file)
+        if record is None or record["inputs"] != input_hash:
+            return None
+        if record["output"] != hash_file(pjoin(self.lexc_path, output_file)):
+            return None
+        self.logger.info(f"Inputs of {output_file} are unchanged. Using cached file.")
+        return set(record["multichar_symbols"])
+
+    def store(self, output_file:str, input_hash:str, multichar_symbols:set[str]) -> None:
+        """Record the inputs and harvested multichar symbols of a freshly
+           generated `output_file`.
+
+        """
+        record = {"inputs": input_hash,
+                  "output": hash_file(pjoin(self.lexc_path, output_file)),
+                  "multichar_symbols": sorted(multichar_symbols)}
+        self.entries[output_file] = record
+        self.updates[output_file] = record
+
+    def merge(self, updates:dict) -> None:
+        """Merge records returned by a worker process."""
+        self.entries.update(updates)
+
+    def save(self) -> None:
+        """Write the cache file into the lexc output directory."""
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
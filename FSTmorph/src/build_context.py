@@ -0,0 +1,85 @@
+"""The BuildContext class carries the state of one lexc build.
+
+   A build harvests multicharacter symbols from spreadsheets,
+   databases and templates (these all need to be declared in root.lexc),
+   reads CSV files through a cache and reports progress through a
+   logger. Keeping this state in a BuildContext object instead of
+   module or class globals allows several builds (e.g. for different
+   dialects) to run concurrently in the same process.
+
+"""
+
+import threading
+
+from .csv_cache import csv_cache as shared_csv_cache
+from .log import Logger
+from .profiler import NULL_STAGE
+
+class BuildContext:
+    """State of a single build:
+
+       * `multichar_symbols` the set of harvested multichar symbols
+       * `logger` a `log.Logger` object
+       * `csv_cache` a `csv_cache.CSVCache` (by default the
+         process-wide cache, which is thread-safe)
+       * `build_cache` an optional `build_cache.BuildCache`
+       * `profiler` an optional `profiler.Profiler` which records
+         the stages of the build (see `stage()`)
+
+       Symbols are added under a lock, so a context can be shared by
+       threads.
+
+    """
+    def __init__(self, logger:Logger=None, csv_cache=None, build_cache=None, profiler=None):
+        self.multichar_symbols = set()
+        self.logger = Logger() if logger is None else logger
+        self.csv_cache = shared_csv_cache if csv_cache is None else csv_cache
+        self.build_cache = build_cache
+        self.profiler = profiler
+        self.lock = threading.Lock()
+
+    def child(self):
+        """Return a new context which shares the logger, caches and
+           profiler of this context but has an empty symbol set. This is
+           used for harvesting the symbols of a single output file.
+
+        """
+        return BuildContext(self.logger, self.csv_cache, self.build_cache, self.profiler)
+
+    def add_multichar_symbol(self, symbol:str) -> None:
+        """Add a symbol to `multichar_symbols`."""
+        with self.lock:
+            self.multichar_symbols.add(symbol)
+
+    def add_multichar_symbols(self, symbols) -> None:
+        """Add all symbols in an iterable to `multichar_symbols`."""
+        symbols = list(symbols)
+        with self.lock:
+            self.multichar_symbols.update(symbols)
+
+    def info(self, *msg, force=True, **fields):
+        self.logger.info(*msg, force=force, **fields)
+
+    def warn(self, *msg, force=True, **fields):
+        self.logger.warn(*msg, force=force, **fields)
+
+    def read_csv(self, path:str, **kwargs):
+        """Read a CSV file through the CSV cache of this context."""
+        return self.csv_cache.read_csv(path, **kwargs)
+
+    def stage(self, name:str, **labels):
+        """Return a context manager which records the build stage `name`
+           in the profiler (see `profiler.Profiler.stage()`). If there is
+           no profiler, nothing is recorded.
+
+        """
+        if self.profiler is None:
+            return NULL_STAGE
+        return self.profiler.stage(name, **labels)
+
+    def stage_labels(self) -> dict:
+        """Return the labels of the current stage in this thread (see
+           `profiler.Profiler.labels()`).
+
+        """
+        return {} if self.profiler is None else self.profiler.labels()
@@ -0,0 +1,132 @@
+"""Process-wide cache for parsed CSV files.
+
+   The same spreadsheets are parsed repeatedly during a build: preverb
+   spreadsheets are read once for every order filter in a template, the
+   prefix database is read for every pre-element tag and the exclusion
+   CSV is read for every configuration file. The function `read_csv` in
+   this module is a drop-in replacement for `pandas.read_csv` which
+   caches parsed DataFrames. Cache entries are keyed by the absolute
+   path of the file, its modification time and size, and the
+   `read_csv` keyword arguments, so modified files are always
+   re-read. Calls with keyword argument values which can't be made
+   hashable bypass the cache. The least recently used entries are
+   evicted when the cache exceeds its size limits.
+
+   DataFrames returned from the cache are shared between callers and
+   must not be modified in place.
+
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+MAX_ENTRIES = 128
+"""Default maximum number of DataFrames in the cache."""
+
+MAX_BYTES = 1 << 30
+"""Default maximum total estimated size (in bytes) of the DataFrames in
+   the cache (see `estimate_size()`)."""
+
+def freeze(value):
+    """Return a hashable version of a `read_csv` keyword argument value,
+       e.g. `dtype={"Lemma": str}` or `usecols=["Lemma", "Stem"]`.
+       Raises TypeError if the value can't be made hashable.
+
+    """
+    if isinstance(value, dict):
+        items = sorted(value.items(), key=lambda item: repr(item[0]))
+        return (dict, tuple((freeze(k), freeze(v)) for k, v in items))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(freeze(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return (frozenset, frozenset(freeze(v) for v in value))
+    hash(value)
+    return value
+
+def estimate_size(df:pd.DataFrame, file_size:int) -> int:
+    """Estimate the memory used by a DataFrame read from a file of
+       `file_size` bytes. Measuring the size of string columns exactly
+       (`memory_usage(deep=True)`) scans every cell, so the size of the
+       file is used as an estimate of the string data instead.
+
+    """
+    return int(df.memory_usage(index=True).sum()) + file_size
+
+class CSVCache:
+    """LRU cache of parsed CSV files. Access is thread-safe."""
+    def __init__(self, max_entries:int=MAX_ENTRIES, max_bytes:int=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """Reset the hit, miss and eviction counters."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self, memory:bool=False) -> dict:
+        """Return the hit, miss and eviction counters. With `memory`, the
+           exact total size in bytes of the cached DataFrames is added
+           as `"bytes"` (this scans every cell of the cached frames).
+
+        """
+        stats = {"hits": self.hits,
+                 "misses": self.misses,
+                 "evictions": self.evictions}
+        if memory:
+            with self.lock:
+                frames = [df for df, _ in self.entries.values()]
+            stats["bytes"] = sum(int(df.memory_usage(index=True, deep=True).sum()) for df in frames)
+        return stats
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def read_csv(self, path:str, **kwargs) -> pd.DataFrame:
+        """Return the result of `pd.read_csv(path, **kwargs)`, reading the
+           file only if it isn't cached.
+
+        """
+        stat = os.stat(path)
+        try:
+            key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size,
+                   freeze(kwargs))
+        except TypeError:
+            with self.lock:
+                self.misses += 1
+            return pd.read_csv(path, **kwargs)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+        df = pd.read_csv(path, **kwargs)
+        size = estimate_size(df, stat.st_size)
+        with self.lock:
+            if not key in self.entries:
+                self.entries[key] = (df, size)
+                self.total_bytes += size
+            while (len(self.entries) > self.max_entries or
+                   (self.total_bytes > self.max_bytes and len(self.entries) > 1)):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+        return df
+
+csv_cache = CSVCache()
+"""The process-wide cache instance."""
+
+def read_csv(path:str, **kwargs) -> pd.DataFrame:
+    """Read a CSV file using the process-wide cache `csv_cache`."""
+    return csv_cache.read_csv(path, **kwargs)
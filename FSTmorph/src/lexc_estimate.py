@@ -0,0 +1,320 @@
+"""Estimates of the size of the FST compiled from a set of lexc files.
+
+   Compiling the FST with foma can take a long time, so it is useful to
+   know beforehand how many analyses a change to the configuration or
+   the spreadsheets adds. `estimate_modules` counts the paths through
+   the lexicon graph of a list of LexcModule objects:
+
+   * `paths` is the number of paths from the root lexicon to `#`
+     ignoring flag diacritics. Different paths can give the same
+     analysis/surface pair, so this is an upper bound on the number of
+     pairs.
+   * `valid_paths` is the number of those paths which satisfy the flag
+     diacritics, i.e. a closer upper bound on the number of pairs
+     accepted by the FST.
+   * `arcs` and `eliminated_arcs` estimate the number of arcs before
+     and after `eliminate flags` (see `lexc_flags.estimate_features`).
+
+   Path counts are computed by memoized depth-first search. Sublexicons
+   like `PreverbRoot` may continue into themselves, in which case the
+   number of paths is unbounded and reported as `None`. For these, the
+   `loop_free_paths` counts give the number of paths which don't take
+   any loop (the edges closing a loop are those leading back to a
+   sublexicon on the current search path).
+"""
+
+import json
+from collections import namedtuple
+
+from .lexc_flags import (analyze_flags, compile_entries, get_tested_features,
+                         get_module_lexicons, log_feature_estimates, FlagAnalysis,
+                         MAX_STATES)
+from .lexc_graph import END_LEXICON
+
+PathCounts = namedtuple("PathCounts",
+                        ["paths",
+                         "loop_free_paths",
+                         "loops"])
+PathCounts.__doc__ = \
+"""Result of `count_paths`: dictionaries mapping nodes to the number of
+    paths to the end (`None` if unbounded) and to the number of paths
+    which don't take any loop, and the sorted list of nodes at which
+    loops start.
+
+"""
+
+ModuleEstimate = namedtuple("ModuleEstimate",
+                            ["file_name",
+                             "sublexicons",
+                             "entries",
+                             "arcs",
+                             "eliminated_arcs",
+                             "entry_lexicons",
+                             "loops"])
+ModuleEstimate.__doc__ = \
+"""Estimate for a single lexc file. `entry_lexicons` maps the
+    sublexicons through which paths enter the file to `(paths,
+    loop_free_paths)` pairs. Continuations to other lexc files count as
+    ending the path. `loops` lists the sublexicons of the file at which
+    loops start.
+
+"""
+
+LexiconEstimate = namedtuple("LexiconEstimate",
+                             ["complete",
+                              "paths",
+                              "loop_free_paths",
+                              "valid_paths",
+                              "loop_free_valid_paths",
+                              "arcs",
+                              "eliminated_arcs",
+                              "modules",
+                              "features",
+                              "max_states"])
+LexiconEstimate.__doc__ = \
+"""Result of `estimate_modules`. `modules` is a list of ModuleEstimate
+    objects and `features` a list of FeatureEstimate objects. If the
+    flag analysis was aborted (`complete` is False) because it would
+    have explored more than `max_states` states, `valid_paths`,
+    `loop_free_valid_paths` and `eliminated_arcs` are `None`.
+
+"""
+
+def get_predecessor_closure(nodes, predecessors:dict) -> set:
+    """Return the set of nodes from which one of `nodes` can be reached."""
+    closure = set(nodes)
+    agenda = list(closure)
+    while agenda:
+        for node in predecessors.get(agenda.pop(), ()):
+            if not node in closure:
+                closure.add(node)
+                agenda.append(node)
+    return closure
+
+def count_paths(successors:dict, roots) -> PathCounts:
+    """Count the paths from each node reachable from `roots` to the
+       end. `successors` maps nodes to lists of successor nodes, one
+       for each edge. The successor `None` ends the path. Nodes missing
+       from `successors` (like flag states without any valid
+       continuation) have no paths to the end.
+
+    """
+    loop_free = {}
+    loop_edges = {}
+    on_path = set()
+    for root in roots:
+        if root in loop_free:
+            continue
+        if not root in successors:
+            loop_free[root] = 0
+            loop_edges[root] = []
+            continue
+        # Iterative depth-first search. Each stack item is a node and
+        # an iterator over its successors.
+        stack = [(root, iter(successors[root]))]
+        on_path.add(root)
+        loop_edges[root] = []
+        while stack:
+            node, targets = stack[-1]
+            for target in targets:
+                if target is None or not target in successors or target in loop_free:
+                    continue
+                if target in on_path:
+                    loop_edges[node].append(target)
+                    continue
+                stack.append((target, iter(successors[target])))
+                on_path.add(target)
+                loop_edges[target] = []
+                break
+            else:
+                stack.pop()
+                on_path.remove(node)
+                loop_free[node] = sum(1 if target is None else loop_free.get(target, 0)
+                                      for target in successors[node]
+                                      if not target in loop_edges[node])
+
+    # Every loop contains an edge leading back to a node on the search
+    # path. The number of paths is unbounded from nodes which can reach
+    # such an edge, provided that the loop can reach the end.
+    predecessors = {}
+    live = set()
+    for node in loop_free:
+        for target in successors.get(node, ()):
+            if target is None:
+                live.add(node)
+            elif target in successors:
+                predecessors.setdefault(target, []).append(node)
+    live = get_predecessor_closure(live, predecessors)
+    unbounded = get_predecessor_closure([node for node, targets in loop_edges.items()
+                                         if targets and node in live],
+                                        predecessors)
+    paths = {node: None if node in unbounded else count
+             for node, count in loop_free.items()}
+    loops = set(target for targets in loop_edges.values() for target in targets)
+    return PathCounts(paths, loop_free, sorted(loops, key=str))
+
+def get_lexicon_successors(lexicons) -> dict[str, list[str]]:
+    """Return the successor lists of the sublexicons for `count_paths`.
+       Continuations to `#` and to undefined lexicons end the path.
+
+    """
+    return {name: [None if (entry.next_lexicon == END_LEXICON or
+                            not entry.next_lexicon in lexicons)
+                   else entry.next_lexicon
+                   for entry in entries]
+            for name, entries in lexicons.items()}
+
+def get_eliminated_arcs(compiled:dict, states:dict[str, set]) -> dict[str, int]:
+    """Estimate the number of arcs of each sublexicon after eliminating
+       all flags. A sublexicon is copied once for each distinct
+       combination of values of the features which are tested later
+       on. Sublexicons which can't be reached under the flags are
+       dropped.
+
+    """
+    tested = get_tested_features(compiled)
+    eliminated_arcs = {}
+    for name, lexicon_states in states.items():
+        features = [feature for feature, lexicons in tested.items() if name in lexicons]
+        copies = len(set(tuple(dict(state).get(feature) for feature in features)
+                         for state in lexicon_states))
+        eliminated_arcs[name] = copies * sum(arcs for _, _, arcs in compiled[name])
+    return eliminated_arcs
+
+def get_module_references(module_lexicons:list[dict]) -> dict[str, set[int]]:
+    """Return a dictionary mapping each continuation lexicon to the
+       indices of the modules in `module_lexicons` which refer to it.
+
+    """
+    references = {}
+    for i, sublexicons in enumerate(module_lexicons):
+        for entries in sublexicons.values():
+            for entry in entries:
+                references.setdefault(entry.next_lexicon, set()).add(i)
+    return references
+
+def estimate_modules(modules, max_states:int=MAX_STATES, analysis:FlagAnalysis=None) -> LexiconEstimate:
+    """Estimate the size of the FST compiled from a list of LexcModule
+       objects (the root module first, see
+       `csv2lexc.csv2lexc_modules`). If the flag diacritics of the
+       modules were already analyzed (e.g. by
+       `lexc_flags.prune_flag_paths`), pass the FlagAnalysis as
+       `analysis` to avoid analyzing them again.
+
+    """
+    module_lexicons = [get_module_lexicons(module) for module in modules]
+    lexicons = {}
+    for sublexicons in module_lexicons:
+        for name, entries in sublexicons.items():
+            lexicons.setdefault(name, []).extend(entries)
+    root = next(iter(lexicons))
+    compiled = compile_entries(lexicons)
+    lexicon_arcs = {name: sum(arcs for _, _, arcs in entries)
+                    for name, entries in compiled.items()}
+    counts = count_paths(get_lexicon_successors(lexicons), [root])
+
+    if analysis is None:
+        analysis = analyze_flags(lexicons, root, max_states)
+    valid_counts = None
+    eliminated_arcs = {}
+    if analysis.complete:
+        successors = {}
+        for source, _, target in analysis.transitions:
+            successors.setdefault(source, []).append(target)
+        valid_counts = count_paths(successors, [(root, ())])
+        eliminated_arcs = get_eliminated_arcs(compiled, analysis.states)
+
+    references = get_module_references(module_lexicons)
+    module_estimates = []
+    for i, (module, sublexicons) in enumerate(zip(modules, module_lexicons)):
+        # Paths enter a lexc file through the sublexicons which other
+        # files refer to
+        entry_lexicons = [name for name in sublexicons
+                          if name == root or references.get(name, set()) - {i}]
+        module_counts = count_paths(get_lexicon_successors(sublexicons), entry_lexicons)
+        module_estimates.append(
+            ModuleEstimate(module.file_name,
+                           len(sublexicons),
+                           sum(len(entries) for entries in sublexicons.values()),
+                           sum(lexicon_arcs[name] for name in sublexicons),
+                           (sum(eliminated_arcs.get(name, 0) for name in sublexicons)
+                            if analysis.complete else None),
+                           {name: (module_counts.paths[name], module_counts.loop_free_paths[name])
+                            for name in entry_lexicons},
+                           module_counts.loops))
+    return LexiconEstimate(analysis.complete,
+                           counts.paths.get(root),
+                           counts.loop_free_paths.get(root),
+                           valid_counts.paths.get((root, ())) if valid_counts else None,
+                           valid_counts.loop_free_paths.get((root, ())) if valid_counts else None,
+                           sum(lexicon_arcs.values()),
+                           sum(eliminated_arcs.values()) if analysis.complete else None,
+                           module_estimates,
+                           analysis.features,
+                           analysis.max_states)
+
+def estimate_to_dict(estimate:LexiconEstimate, config_files:dict[str, list[str]]=None) -> dict:
+    """Convert a LexiconEstimate into a dictionary which can be written
+       as JSON. `config_files` optionally maps configuration files to
+       the names of the lexc files generated from them.
+
+    """
+    result = estimate._asdict()
+    result["modules"] = {module.file_name: {field: value
+                                            for field, value in module._asdict().items()
+                                            if field != "file_name"}
+                         for module in estimate.modules}
+    result["features"] = [feature._asdict() for feature in estimate.features]
+    if config_files is not None:
+        result["config_files"] = config_files
+    return result
+
+def write_estimate(estimate:LexiconEstimate, estimate_file:str, config_files:dict[str, list[str]]=None) -> None:
+    """Write a LexiconEstimate into the JSON file `estimate_file`."""
+    with open(estimate_file, "w") as f:
+        json.dump(estimate_to_dict(estimate, config_files), f, indent=2)
+        f.write("\n")
+
+def format_count(count) -> str:
+    """Format a path count. Unbounded counts are shown as `unbounded`."""
+    return "unbounded" if count is None else f"{count:,}"
+
+def log_estimate(estimate:LexiconEstimate, config_files:dict[str, list[str]], context, log_features=True) -> None:
+    """Log a LexiconEstimate grouped by configuration file.
+       `config_files` maps configuration files to the names of the lexc
+       files generated from them. Lexc files which don't belong to any
+       configuration file (root.lexc and enclitics.lexc) are listed
+       under "Shared". If `log_features` is False, the estimates for
+       the individual features aren't logged (e.g. because
+       `lexc_flags.prune_flag_paths` already logged them).
+
+    """
+    modules = {module.file_name: module for module in estimate.modules}
+    grouped = dict(config_files)
+    listed = set(name for names in config_files.values() for name in names)
+    grouped["Shared"] = [name for name in modules if not name in listed]
+    context.info("Estimated lexicon size:")
+    for config_file, file_names in grouped.items():
+        context.info(f"  {config_file}:")
+        for file_name in file_names:
+            module = modules[file_name]
+            eliminated = ("?" if module.eliminated_arcs is None
+                          else f"{module.eliminated_arcs:,}")
+            context.info(f"    {file_name}: {module.sublexicons} sublexicons,",
+                         f"{module.entries:,} entries,",
+                         f"{module.arcs:,} -> {eliminated} arcs after flag elimination")
+            for name, (paths, loop_free_paths) in module.entry_lexicons.items():
+                context.info(f"      {name}: {format_count(paths)} paths",
+                             f"({format_count(loop_free_paths)} without loops)")
+            if module.loops:
+                context.info(f"      Loops at {', '.join(module.loops)}",force=False)
+    context.info(f"  Total: {format_count(estimate.paths)} paths",
+                 f"({format_count(estimate.loop_free_paths)} without loops)")
+    if not estimate.complete:
+        context.warn(f"Flag analysis aborted: more than {estimate.max_states} states.")
+        return
+    context.info(f"  Paths satisfying flag diacritics: {format_count(estimate.valid_paths)}",
+                 f"({format_count(estimate.loop_free_valid_paths)} without loops)")
+    context.info(f"  Arcs: {estimate.arcs:,} -> {estimate.eliminated_arcs:,} after flag elimination")
+    if log_features:
+        log_feature_estimates(estimate.features, context)
@@ -0,0 +1,275 @@
+"""Static analysis of flag diacritics over the lexicon graph.
+
+   `LexcPath` sets `@P.Prefix.X@` in the person prefix lexicons and
+   checks `@R.Prefix.X@` in the `_Flags` lexicons. Paradigm and order
+   flags (`@P.Paradigm.X@`, `@R.Paradigm.X@` and `@U.Order.X@`) and the
+   changed-conjunct flags in the pre-element templates (`@D.ChCnj@` and
+   `@C.ChCnj@`) restrict the paths further. Entries which lie on no
+   path that satisfies all flags can be removed from the lexc code
+   without changing the language of the FST, and removing them makes
+   `eliminate flags` in `compile_fst.xfst` cheaper.
+
+   `analyze_flags` explores all pairs `(sublexicon, flag state)` which
+   can be reached from the root lexicon and determines which of them
+   can reach `#`. Continuations to sublexicons which aren't defined
+   are treated as if they always reach `#`. It also estimates how much
+   eliminating the flags of each feature expands the lexicon.
+"""
+
+from collections import namedtuple
+
+from .lexc_lookup import apply_flags, END_LEXICON
+from .lexc_parser import parse_lexc, filter_lexc, split_symbols, is_flag
+
+MAX_STATES = 1000000
+"""Maximum number of `(sublexicon, flag state)` pairs explored by
+   `analyze_flags`. If the lexicon has more, the analysis is aborted.
+
+"""
+
+TEST_OPERATIONS = ["R", "D", "U"]
+"""Flag operations which test the value of a feature."""
+
+FeatureEstimate = namedtuple("FeatureEstimate",
+                             ["feature",
+                              "values",
+                              "lexicons",
+                              "arcs",
+                              "eliminated_arcs"])
+FeatureEstimate.__doc__ = \
+"""Estimated cost of eliminating the flags of one feature: the number
+    of distinct values of the feature, the number of sublexicons which
+    need to be copied for more than one value, and the approximate
+    number of arcs in the reachable sublexicons before and after
+    elimination.
+
+"""
+
+FlagAnalysis = namedtuple("FlagAnalysis",
+                          ["complete",
+                           "impossible_entries",
+                           "features",
+                           "states",
+                           "transitions",
+                           "max_states"])
+FlagAnalysis.__doc__ = \
+"""Result of `analyze_flags`. `complete` is False if the analysis was
+    aborted because of too many states. `impossible_entries` is the set
+    of LexcEntry objects in reachable sublexicons which lie on no
+    successful path. `features` is a list of FeatureEstimate objects
+    sorted by decreasing blow-up. `states` maps each reachable
+    sublexicon to the set of flag states in which it is entered and
+    `transitions` is the list of `(source, entry, target)` transitions
+    between `(sublexicon, flag state)` pairs (`target` is `None` if the
+    transition ends the word). `max_states` is the state limit of the
+    analysis.
+
+"""
+
+def get_flag_parts(flag:str) -> tuple[str, str, str]:
+    """Split a flag diacritic `@R.Prefix.NI@` into `("R", "Prefix",
+       "NI")`. Flags without a value (like `@C.ChCnj@`) have value
+       `None`.
+
+    """
+    parts = flag[1:-1].split(".", 2)
+    return parts[0], parts[1], parts[2] if len(parts) == 3 else None
+
+def compile_entries(lexicons) -> dict[str, list[tuple]]:
+    """Return a dictionary mapping sublexicon names to lists of `(entry,
+       flags, arcs)` tuples, where `flags` are the flag diacritics of the
+       entry and `arcs` is the number of symbol pairs on the entry.
+
+    """
+    compiled = {}
+    for name, entries in lexicons.items():
+        compiled_entries = compiled.setdefault(name, [])
+        for entry in entries:
+            upper = split_symbols(entry.analysis)
+            lower = split_symbols(entry.surface)
+            flags = (tuple(s for s in upper if is_flag(s)) or
+                     tuple(s for s in lower if is_flag(s)))
+            compiled_entries.append((entry, flags, max(1, len(upper), len(lower))))
+    return compiled
+
+def get_tested_features(compiled:dict) -> dict[str, set[str]]:
+    """Return a dictionary mapping each feature to the sublexicons from
+       which a test of the feature (an R, D or U flag) can be reached.
+       Only in these sublexicons does the value of the feature matter
+       when flags are eliminated.
+
+    """
+    predecessors = {}
+    tested = {}
+    for name, entries in compiled.items():
+        for entry, flags, _ in entries:
+            predecessors.setdefault(entry.next_lexicon, set()).add(name)
+            for flag in flags:
+                op, feature, _ = get_flag_parts(flag)
+                if op in TEST_OPERATIONS:
+                    tested.setdefault(feature, set()).add(name)
+    for feature, lexicons in tested.items():
+        agenda = list(lexicons)
+        while agenda:
+            for name in predecessors.get(agenda.pop(), ()):
+                if not name in lexicons:
+                    lexicons.add(name)
+                    agenda.append(name)
+    return tested
+
+def estimate_features(compiled:dict, states:dict[str, set]) -> list[FeatureEstimate]:
+    """Estimate the cost of eliminating the flags of each feature given
+       the flag states which reach each sublexicon. A sublexicon is
+       copied once for each value (including no value) the feature can
+       have when entering it, provided that the feature is still tested
+       later on.
+
+    """
+    values = {}
+    for entries in compiled.values():
+        for _, flags, _ in entries:
+            for flag in flags:
+                _, feature, value = get_flag_parts(flag)
+                values.setdefault(feature, set())
+                if value is not None:
+                    values[feature].add(value)
+    arcs = {name: sum(entry_arcs for _, _, entry_arcs in compiled[name])
+            for name in states}
+    total_arcs = sum(arcs.values())
+    estimates = []
+    for feature, lexicons in get_tested_features(compiled).items():
+        copied_lexicons = 0
+        eliminated_arcs = 0
+        for name, lexicon_states in states.items():
+            copies = 1
+            if name in lexicons:
+                copies = len(set(dict(state).get(feature) for state in lexicon_states))
+            if copies > 1:
+                copied_lexicons += 1
+            eliminated_arcs += copies * arcs[name]
+        estimates.append(FeatureEstimate(feature,
+                                         len(values.get(feature, ())),
+                                         copied_lexicons,
+                                         total_arcs,
+                                         eliminated_arcs))
+    return sorted(estimates, key=lambda e: (-e.eliminated_arcs, e.feature))
+
+def analyze_flags(lexicons, root:str, max_states:int=MAX_STATES) -> FlagAnalysis:
+    """Propagate flag states from the sublexicon `root` over the lexicon
+       graph. `lexicons` maps sublexicon names to iterables of LexcEntry
+       objects. See FlagAnalysis for the result.
+
+    """
+    compiled = compile_entries(lexicons)
+    start = (root, ())
+    seen = {start}
+    agenda = [start]
+    # Transitions (source, entry, target) between (sublexicon, state)
+    # pairs. The target is None for transitions which end the word.
+    transitions = []
+    while agenda:
+        source = agenda.pop()
+        lexicon, state = source
+        for entry, flags, _ in compiled.get(lexicon, ()):
+            new_state = apply_flags(flags, state)
+            if new_state is None:
+                continue
+            next_lexicon = entry.next_lexicon
+            if next_lexicon == END_LEXICON or not next_lexicon in compiled:
+                transitions.append((source, entry, None))
+                continue
+            target = (next_lexicon, new_state)
+            transitions.append((source, entry, target))
+            if not target in seen:
+                if len(seen) >= max_states:
+                    return FlagAnalysis(False, set(), [], {}, [], max_states)
+                seen.add(target)
+                agenda.append(target)
+
+    # Find the (sublexicon, state) pairs from which # can be reached
+    predecessors = {}
+    live = set()
+    for source, _, target in transitions:
+        if target is None:
+            live.add(source)
+        else:
+            predecessors.setdefault(target, []).append(source)
+    agenda = list(live)
+    while agenda:
+        for source in predecessors.get(agenda.pop(), ()):
+            if not source in live:
+                live.add(source)
+                agenda.append(source)
+
+    useful = set(entry for source, entry, target in transitions
+                 if source in live and (target is None or target in live))
+    states = {}
+    for lexicon, state in seen:
+        states.setdefault(lexicon, set()).add(state)
+    impossible = set(entry
+                     for lexicon in states
+                     for entry, _, _ in compiled.get(lexicon, ())
+                     if not entry in useful)
+    return FlagAnalysis(True, impossible, estimate_features(compiled, states),
+                        states, transitions, max_states)
+
+def get_module_lexicons(module) -> dict:
+    """Return the sublexicons of a LexcModule. Modules which weren't
+       generated from a LexcFile are parsed.
+
+    """
+    if module.lexicons is not None:
+        return module.lexicons
+    return parse_lexc(module.text())[1]
+
+def log_feature_estimates(features:list[FeatureEstimate], context) -> None:
+    """Log the estimated cost of eliminating the flags of each feature."""
+    context.info("Estimated lexicon size after flag elimination:")
+    for estimate in features:
+        context.info(f"  {estimate.feature}: {estimate.values} values,",
+                     f"{estimate.lexicons} sublexicons copied,",
+                     f"{estimate.arcs} -> {estimate.eliminated_arcs} arcs",
+                     f"({estimate.eliminated_arcs / max(estimate.arcs, 1):.2f}x)")
+
+def prune_flag_paths(modules, context, max_states:int=MAX_STATES) -> FlagAnalysis:
+    """Analyze the flag diacritics in a list of LexcModule objects (the
+       root module first, see `csv2lexc.csv2lexc_modules`) and remove
+       impossible entries from them. Modules generated from a LexcFile
+       are pruned in place. Other modules are parsed and the lines
+       containing impossible entries are dropped.
+
+       Returns the FlagAnalysis of the modules before pruning. Pruning
+       doesn't change the paths which satisfy the flags, so it can be
+       passed on to `lexc_estimate.estimate_modules`.
+
+    """
+    lexicons = {}
+    module_entries = []
+    for module in modules:
+        entries = set()
+        for name, sublexicon in get_module_lexicons(module).items():
+            sublexicon = list(sublexicon)
+            lexicons.setdefault(name, []).extend(sublexicon)
+            entries.update(sublexicon)
+        module_entries.append(entries)
+    root = next(iter(lexicons))
+    analysis = analyze_flags(lexicons, root, max_states)
+    if not analysis.complete:
+        context.warn(f"Flag analysis aborted: more than {max_states} states.",
+                     "No entries were removed.")
+        return analysis
+
+    for module, entries in zip(modules, module_entries):
+        removed = entries & analysis.impossible_entries
+        if len(removed) == 0:
+            continue
+        context.info(f"Removed {len(removed)} entries with impossible flag combinations from",
+                     module.file_name)
+        if module.lexicons is not None:
+            for entry in removed:
+                module.lexicons[entry.lexicon].discard(entry)
+        else:
+            text = filter_lexc(module.text(), removed)
+            module.get_chunks = lambda text=text: [text]
+    log_feature_estimates(analysis.features, context)
+    return analysis
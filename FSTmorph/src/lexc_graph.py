@@ -0,0 +1,169 @@
+"""Graph analyses over the sublexicons of a lexc file.
+
+   The sublexicons of a `LexcFile` form a directed graph: each entry is
+   an edge from its sublexicon to its continuation lexicon. The
+   continuation `#` ends a word. Continuations to lexicons which are not
+   defined in the file (like `PreverbRoot` or `EncliticRoot`, which are
+   defined in other lexc files) are external. Since we can't see their
+   contents, they are treated as if they always lead to `#`.
+
+"""
+
+from collections import namedtuple
+
+END_LEXICON = "#"
+
+PruneReport = namedtuple("PruneReport",
+                         ["removed_lexicons",
+                          "removed_entries"])
+PruneReport.__doc__ = \
+"""Result of `prune_lexicons`: a list of removed sublexicon names
+    and the number of removed entries (including the entries of removed
+    sublexicons).
+
+"""
+
+def is_external(lexicon:str, lexicons) -> bool:
+    """Return True if `lexicon` is `#` or isn't defined in `lexicons`."""
+    return lexicon == END_LEXICON or not lexicon in lexicons
+
+def get_live_lexicons(lexicons) -> set[str]:
+    """Return the sublexicons from which `#` or an external lexicon can
+       be reached (i.e. which are co-reachable). `lexicons` maps
+       sublexicon names to iterables of LexcEntry objects.
+
+    """
+    predecessors = {}
+    live = set()
+    for name, entries in lexicons.items():
+        for entry in entries:
+            if is_external(entry.next_lexicon, lexicons):
+                live.add(name)
+            else:
+                predecessors.setdefault(entry.next_lexicon, set()).add(name)
+    agenda = list(live)
+    while agenda:
+        for name in predecessors.get(agenda.pop(), ()):
+            if not name in live:
+                live.add(name)
+                agenda.append(name)
+    return live
+
+def get_reachable_lexicons(lexicons, roots, live:set[str]=None) -> set[str]:
+    """Return the sublexicons which can be reached from the sublexicons in
+       `roots`. If `live` is given, only entries continuing to live
+       sublexicons are followed.
+
+    """
+    reachable = set(root for root in roots if root in lexicons)
+    agenda = list(reachable)
+    while agenda:
+        for entry in lexicons[agenda.pop()]:
+            next_lexicon = entry.next_lexicon
+            if (is_external(next_lexicon, lexicons) or next_lexicon in reachable or
+                (live is not None and not next_lexicon in live)):
+                continue
+            reachable.add(next_lexicon)
+            agenda.append(next_lexicon)
+    return reachable
+
+def prune_lexicons(lexicons, roots) -> PruneReport:
+    """Remove sublexicons which can't be reached from `roots` and
+       entries which can't lead to `#`. The sublexicons in `roots` are
+       always kept (possibly empty) because other lexc files refer to
+       them. The accepted language doesn't change.
+
+       `lexicons` is a LexiconStore or a dictionary mapping sublexicon
+       names to sets of LexcEntry objects. It is modified in place.
+
+    """
+    live = get_live_lexicons(lexicons)
+    reachable = get_reachable_lexicons(lexicons, roots, live)
+    removed_lexicons = [name for name in lexicons.keys()
+                        if not name in reachable and not name in roots]
+    removed_entries = 0
+    for name in reachable | set(roots):
+        if not name in lexicons:
+            continue
+        # Continuations to sublexicons which are defined but not live
+        # can never reach #
+        dead = [entry for entry in lexicons[name]
+                if not (is_external(entry.next_lexicon, lexicons) or
+                        entry.next_lexicon in live)]
+        for entry in dead:
+            lexicons[name].discard(entry)
+        removed_entries += len(dead)
+    for name in removed_lexicons:
+        removed_entries += len(lexicons[name])
+        del lexicons[name]
+    return PruneReport(removed_lexicons, removed_entries)
+
+def get_equivalent_lexicons(lexicons) -> list[list[str]]:
+    """Partition the sublexicons into classes which accept the same
+       right language. Two sublexicons are equivalent if, after
+       replacing each continuation lexicon by its class, they contain
+       the same entries. The classes are computed by iteratively
+       refining a partition (starting from a single class) using hashes
+       of these entry sets, which works bottom-up from `#` and also
+       handles cycles.
+
+       Returns a list of classes. Each class is a list of sublexicon
+       names in the order of `lexicons`.
+
+    """
+    names = list(lexicons.keys())
+    block = {name: 0 for name in names}
+    block_count = 1
+    while True:
+        signatures = {}
+        new_block = {}
+        for name in names:
+            signature = (block[name],
+                         frozenset((entry.analysis,
+                                    entry.surface,
+                                    block.get(entry.next_lexicon, entry.next_lexicon))
+                                   for entry in lexicons[name]))
+            new_block[name] = signatures.setdefault(signature, len(signatures))
+        block = new_block
+        if len(signatures) == block_count:
+            break
+        block_count = len(signatures)
+    classes = {}
+    for name in names:
+        classes.setdefault(block[name], []).append(name)
+    return list(classes.values())
+
+def merge_lexicons(lexicons, roots) -> dict[str, list[str]]:
+    """Merge equivalent sublexicons (see `get_equivalent_lexicons`). Each
+       class of equivalent sublexicons is replaced by one representative
+       and continuations are rewritten to point to it. Sublexicons in
+       `roots` are always kept because other lexc files refer to them.
+       The accepted language doesn't change.
+
+       `lexicons` is a LexiconStore or a dictionary mapping sublexicon
+       names to sets of LexcEntry objects. It is modified in place.
+
+       Returns a dictionary mapping representatives to the names of the
+       sublexicons merged into them.
+
+    """
+    representative = {}
+    merged = {}
+    for names in get_equivalent_lexicons(lexicons):
+        class_roots = [name for name in names if name in roots]
+        rep = class_roots[0] if class_roots else names[0]
+        for name in names:
+            if name != rep and not name in roots:
+                representative[name] = rep
+                merged.setdefault(rep, []).append(name)
+    if representative == {}:
+        return merged
+    for name in representative:
+        del lexicons[name]
+    for name in lexicons.keys():
+        rewritten = [entry for entry in lexicons[name]
+                     if entry.next_lexicon in representative]
+        for entry in rewritten:
+            lexicons[name].discard(entry)
+            lexicons[name].add(entry._replace(next_lexicon=representative[entry.next_lexicon]))
+    return merged
@@ -0,0 +1,199 @@
+"""In-process lookup over the lexicon layer of the FST.
+
+   Compiling the full FST with foma takes minutes. The LexcLookup class
+   in this module instead indexes the continuation graph of the
+   generated sublexicons directly, so analyses can be checked against
+   the lexc code within seconds of editing a spreadsheet:
+
+   ```
+   lookup = LexcLookup.from_modules(csv2lexc_modules(...))
+   lookup.generate("aaba'+VTA+Ind+Pos+Neu+1Sg+3SgProxObj")
+   # ["ni<<aaba'w>>aa"]
+   ```
+
+   Generation maps analyses to intermediate forms containing the
+   morpheme boundaries `<<` and `>>`, i.e. the output of the lexc
+   layer before phonological rules apply. Analysis is the inverse.
+
+   The P, N, R, D, C and U flag diacritics emitted by `LexcPath` and the
+   templates are enforced during lookup with the same semantics as in
+   foma. Each sublexicon is indexed as a character trie, so only
+   entries matching the next characters of the input are visited.
+"""
+
+from .lexc_parser import parse_lexc, split_symbols, is_flag
+from .lexc_path import LexcEntry
+
+GENERATE = 0
+"""Lookup direction analysis → surface"""
+
+ANALYZE = 1
+"""Lookup direction surface → analysis"""
+
+END_LEXICON = "#"
+
+def apply_flag(flag:str, state:dict) -> bool:
+    """Apply a flag diacritic like `@P.Prefix.NI@` to `state` (a
+       dictionary mapping features to `(positive, value)` pairs) in
+       place. Returns False if the flag blocks the path.
+
+    """
+    parts = flag[1:-1].split(".", 2)
+    op, feature = parts[0], parts[1]
+    value = parts[2] if len(parts) == 3 else None
+    current = state.get(feature)
+    if op == "P":
+        state[feature] = (True, value)
+    elif op == "N":
+        state[feature] = (False, value)
+    elif op == "C":
+        state.pop(feature, None)
+    elif op == "R":
+        if value is None:
+            return current is not None
+        return current == (True, value)
+    elif op == "D":
+        if value is None:
+            return current is None
+        return current != (True, value)
+    elif op == "U":
+        if current is None or (not current[0] and current[1] != value):
+            state[feature] = (True, value)
+        elif current != (True, value):
+            return False
+    return True
+
+def apply_flags(flags:tuple[str], state:tuple) -> tuple:
+    """Apply a sequence of flag diacritics to a flag state, which is a
+       sorted tuple of `(feature, (positive, value))` pairs. Returns
+       the new state or `None` if one of the flags blocks the path.
+
+    """
+    if not flags:
+        return state
+    new_state = dict(state)
+    for flag in flags:
+        if not apply_flag(flag, new_state):
+            return None
+    return tuple(sorted(new_state.items()))
+
+def compile_entry(entry:LexcEntry) -> tuple[str, str, tuple[str], str]:
+    """Convert a LexcEntry into an `(upper, lower, flags,
+       next_lexicon)` tuple where upper and lower are unescaped strings
+       without flag diacritics.
+
+    """
+    upper = split_symbols(entry.analysis)
+    lower = split_symbols(entry.surface)
+    flags = tuple(s for s in upper if is_flag(s)) or tuple(s for s in lower if is_flag(s))
+    return ("".join(s for s in upper if not is_flag(s)),
+            "".join(s for s in lower if not is_flag(s)),
+            flags,
+            entry.next_lexicon)
+
+class LexcLookup:
+    """Analyzer and generator for the lexicon graph given by a set of
+       sublexicons. Lookup starts at the lexicon `root` and succeeds
+       when the end lexicon `#` is reached after consuming the entire
+       input.
+
+    """
+    def __init__(self, root:str="Root"):
+        self.root = root
+        self.entries = {}
+        self.tries = ({}, {})
+
+    @classmethod
+    def from_modules(cls, modules, root:str="Root"):
+        """Build a LexcLookup from LexcModule objects (see
+           `csv2lexc.csv2lexc_modules`). Modules generated from a
+           LexcFile are indexed directly. Template modules are parsed.
+
+        """
+        lookup = cls(root)
+        for module in modules:
+            if getattr(module, "lexicons", None) is not None:
+                lookup.add_lexicons(module.lexicons)
+            else:
+                lookup.add_lexc(module.text())
+        return lookup
+
+    def add_lexicons(self, lexicons) -> None:
+        """Add sublexicons from a mapping of sublexicon names to
+           iterables of LexcEntry objects (like `LexcFile.lexicons`).
+
+        """
+        for name, entries in lexicons.items():
+            self.add_entries(name, entries)
+
+    def add_lexc(self, lexc_code:str) -> None:
+        """Parse lexc code and add its sublexicons."""
+        _, lexicons = parse_lexc(lexc_code)
+        self.add_lexicons(lexicons)
+
+    def add_entries(self, lexicon:str, entries) -> None:
+        """Add LexcEntry objects to sublexicon `lexicon`."""
+        self.entries.setdefault(lexicon, []).extend(map(compile_entry, entries))
+        for tries in self.tries:
+            tries.pop(lexicon, None)
+
+    def get_trie(self, lexicon:str, side:int) -> dict:
+        """Return the trie for `lexicon` keyed on the upper (side
+           `GENERATE`) or lower (side `ANALYZE`) strings of its
+           entries. Each trie node is a dictionary from characters to
+           child nodes. Entries ending at a node are stored under the
+           key `None` as `(output, flags, next_lexicon)` tuples.
+
+        """
+        tries = self.tries[side]
+        if not lexicon in tries:
+            trie = {}
+            for entry in self.entries.get(lexicon, []):
+                node = trie
+                for c in entry[side]:
+                    node = node.setdefault(c, {})
+                node.setdefault(None, []).append((entry[1 - side], entry[2], entry[3]))
+            tries[lexicon] = trie
+        return tries[lexicon]
+
+    def lookup(self, query:str, side:int) -> list[str]:
+        """Return the sorted outputs for `query` in direction `side`."""
+        results = set()
+        # Paths can loop through sublexicons without consuming input
+        # (e.g. pre-element lexicons). We therefore skip configurations
+        # which are already being explored on the current path.
+        active = set()
+        output = []
+        def search(lexicon, pos, state):
+            if lexicon == END_LEXICON:
+                if pos == len(query):
+                    results.add("".join(output))
+                return
+            key = (lexicon, pos, state)
+            if key in active:
+                return
+            active.add(key)
+            node = self.get_trie(lexicon, side)
+            i = pos
+            while node is not None:
+                for out, flags, next_lexicon in node.get(None, ()):
+                    new_state = apply_flags(flags, state)
+                    if new_state is not None:
+                        output.append(out)
+                        search(next_lexicon, i, new_state)
+                        output.pop()
+                if i == len(query):
+                    break
+                node = node.get(query[i])
+                i += 1
+            active.discard(key)
+        search(self.root, 0, ())
+        return sorted(results)
+
+    def generate(self, analysis:str) -> list[str]:
+        """Return the intermediate forms for an analysis."""
+        return self.lookup(analysis, GENERATE)
+
+    def analyze(self, form:str) -> list[str]:
+        """Return the analyses of an intermediate form."""
+        return self.lookup(form, ANALYZE)
@@ -0,0 +1,151 @@
+"""Functions for reading lexc code back into LexcEntry objects.
+
+   This is needed for lexc files which are generated from Jinja
+   templates (preverbs.lexc, enclitics.lexc, root.lexc) and which
+   therefore aren't available as `LexcFile.lexicons`. The parser
+   supports the subset of lexc which we generate:
+
+   ```
+   Multichar_Symbols
+   +VTA @P.Prefix.NI@ ...
+
+   ! Comment
+   LEXICON VTA_Prefix
+   @P.Prefix.NI@:@P.Prefix.NI@ni VTA_PrefixBoundary ;
+   ```
+
+   Regular expression entries (`< ... >`) are not supported.
+"""
+
+import re
+
+from .lexc_path import LexcEntry
+
+FLAG_PATTERN = re.compile(r"@[PNRDCU]\.[^@]+@")
+"""Matches flag diacritics like `@P.Prefix.NI@` or `@C.ChCnj@`."""
+
+TOKEN_PATTERN = re.compile(r"(?:%.|[^\s;!%])+|;|!")
+"""Matches entry fields, entry terminators and comment starts on a lexc
+   line. Escaped characters (like `%;` and `% `) are part of a field.
+
+"""
+
+def split_symbols(s:str) -> list[str]:
+    """Split a lexc string into flag diacritics and single (unescaped)
+       characters. Unescaped zeros (epsilon) are dropped.
+
+       `split_symbols("@P.Prefix.NI@ni%>0")` returns
+       `["@P.Prefix.NI@", "n", "i", ">"]`.
+
+    """
+    symbols = []
+    i = 0
+    while i < len(s):
+        if s[i] == "@":
+            flag = FLAG_PATTERN.match(s, i)
+            if flag:
+                symbols.append(flag.group())
+                i = flag.end()
+                continue
+        if s[i] == "%" and i + 1 < len(s):
+            symbols.append(s[i+1])
+            i += 2
+            continue
+        if s[i] != "0":
+            symbols.append(s[i])
+        i += 1
+    return symbols
+
+def is_flag(symbol:str) -> bool:
+    """Return True if `symbol` is a flag diacritic."""
+    return len(symbol) > 2 and symbol[0] == "@" and FLAG_PATTERN.fullmatch(symbol) is not None
+
+def split_pair(form:str) -> tuple[str, str]:
+    """Split an entry form `upper:lower` at the first unescaped colon.
+       Forms without a colon have identical upper and lower strings.
+
+    """
+    i = 0
+    while i < len(form):
+        if form[i] == "%":
+            i += 2
+            continue
+        if form[i] == ":":
+            return form[:i], form[i+1:]
+        i += 1
+    return form, form
+
+def iter_lexc(lexc_code:str):
+    """Iterate over the lines of lexc code. Yields `(line, lexicon,
+       entries, symbols)` tuples where `lexicon` is the current
+       sublexicon (or `None` outside of sublexicons), `entries` is the
+       list of LexcEntry objects which end on the line and `symbols` is
+       the list of multichar symbols declared on the line. Entries
+       consisting of only a continuation lexicon get the analysis and
+       surface string `"0"`.
+
+    """
+    lexicon = None
+    in_multichar_symbols = False
+    fields = []
+    ended = False
+    for line in lexc_code.split("\n"):
+        entries = []
+        symbols = []
+        tokens = TOKEN_PATTERN.findall(line) if not ended else []
+        if "!" in tokens:
+            tokens = tokens[:tokens.index("!")]
+        if tokens and tokens[0] == "Multichar_Symbols":
+            in_multichar_symbols = True
+            symbols = tokens[1:]
+        elif tokens and tokens[0] == "LEXICON":
+            in_multichar_symbols = False
+            if len(tokens) < 2:
+                raise ValueError(f"Missing lexicon name: {line}")
+            lexicon = tokens[1]
+            fields = []
+        elif tokens and tokens[0] == "END":
+            ended = True
+        elif in_multichar_symbols:
+            symbols = tokens
+        else:
+            for token in tokens:
+                if token != ";":
+                    fields.append(token)
+                    continue
+                if lexicon is None:
+                    raise ValueError(f"Entry outside of a LEXICON: {' '.join(fields)}")
+                if len(fields) == 1:
+                    analysis, surface = "0", "0"
+                elif len(fields) == 2:
+                    analysis, surface = split_pair(fields[0])
+                else:
+                    raise ValueError(f"Invalid entry in LEXICON {lexicon}: {' '.join(fields)} ;")
+                entries.append(LexcEntry(lexicon, analysis, surface, fields[-1]))
+                fields = []
+        yield line, lexicon, entries, symbols
+
+def parse_lexc(lexc_code:str) -> tuple[set[str], dict[str, list[LexcEntry]]]:
+    """Parse lexc code into a set of declared multichar symbols and a
+       dictionary mapping sublexicon names to lists of LexcEntry
+       objects. Sublexicons are listed in the order in which they are
+       defined.
+
+    """
+    multichar_symbols = set()
+    lexicons = {}
+    for _, lexicon, entries, symbols in iter_lexc(lexc_code):
+        multichar_symbols.update(symbols)
+        if lexicon is not None:
+            lexicons.setdefault(lexicon, []).extend(entries)
+    return multichar_symbols, lexicons
+
+def filter_lexc(lexc_code:str, removed_entries:set[LexcEntry]) -> str:
+    """Return lexc code without the lines which contain entries in
+       `removed_entries`. Comments and all other lines are kept
+       verbatim. This assumes that removed entries don't share a line
+       with other entries (which is true for the lexc code we generate).
+
+    """
+    return "\n".join(line for line, _, entries, _ in iter_lexc(lexc_code)
+                     if not any(entry in removed_entries for entry in entries))
@@ -6,7 +6,8 @@
 import re
 import pandas as pd
 from collections import namedtuple
-from .log import warn
+from .log import Logger, default_logger
+from .build_context import BuildContext
 from copy import deepcopy
 
 MAXFORMS=100
@@ -102,22 +103,47 @@ def escape(symbol:str) -> str:
     """
     return re.sub("(?<!%)([!%<>0/#; ])",r"%\1",symbol)
 
-def split_form(form:str) -> SplitForm:
+MISSING_PREFIX_BOUNDARY = f"Invalid segmented form (missing '{PREFIX_BOUNDARY}')"
+MISSING_SUFFIX_BOUNDARY = f"Invalid segmented form (missing '{SUFFIX_BOUNDARY}')"
+MISSING_FORMS = "Row without surface forms"
+"""Keys for aggregating repeated warnings (see `log.Logger`)."""
+
+def missing_prefix_boundary_message(form:str) -> str:
+    return f"Invalid segmented form: {form}. Appending morpheme boundary '{PREFIX_BOUNDARY}' at the start."
+
+def missing_suffix_boundary_message(form:str) -> str:
+    return f"Invalid segmented form: {form}. Appending morpheme boundary '{SUFFIX_BOUNDARY}' at the end."
+
+class MissingFormsError(ValueError):
+    """Raised for spreadsheet rows without surface forms. The message is
+       only formatted when it is printed.
+
+    """
+    def __init__(self, row:pd.core.series.Series):
+        super().__init__()
+        self.row = row
+
+    def __str__(self):
+        return f"No surface forms given for row: {self.row.to_dict()}"
+
+def split_form(form:str, logger:Logger=None) -> SplitForm:
     """Split a form `prefix<<stem>>suffix` (e.g. found in the column
         `Form1Split` in paradigm spreadsheets) at morpheme boundaries
         (`<<` and `>>`). If either boundary is missing, the function
-        will add one at the start and end and issue a warning. A
-        SplitForm object is returned.
+        will add one at the start and end and issue a warning using
+        `logger` (by default, the module-level logger). A SplitForm
+        object is returned.
 
     """
+    warn = (logger or default_logger).warn
     # re.split results in a 5-element array [prefix, "<<", stem, ">>",
     # suffix]
     if not PREFIX_BOUNDARY in form:
         form = PREFIX_BOUNDARY + form
-        warn(f"Invalid segmented form: {form}. Appending morpheme boundary '{PREFIX_BOUNDARY}' at the start.")    
+        warn(lambda: missing_prefix_boundary_message(form), key=MISSING_PREFIX_BOUNDARY)
     if not SUFFIX_BOUNDARY in form:
         form += SUFFIX_BOUNDARY
-        warn(f"Invalid segmented form: {form}. Appending morpheme boundary '{SUFFIX_BOUNDARY}' at the end.")
+        warn(lambda: missing_suffix_boundary_message(form), key=MISSING_SUFFIX_BOUNDARY)
     form = re.split(f"({PREFIX_BOUNDARY}|{SUFFIX_BOUNDARY})", form)
     if len(form) != 5:
         raise ValueError(f"Invalid form: {orig_form}. Split: {form}")
@@ -144,46 +170,44 @@ class LexcPath:
        an inflected form.
     """
 
-    multichar_symbols:set[str] = set()
-    """Multichar symbols (across all lexc files) are stored in this static
-       set
-
-    """
-
-    @classmethod
-    def update_multichar_symbol_set(cls, conf:dict) -> None:
+    @staticmethod
+    def update_multichar_symbol_set(conf:dict, context:BuildContext) -> None:
         """This function adds all multicharacter symbols speficied in a
            configuration file + morpheme boundaries into the
-           `multichar_symbols` set.
+           `multichar_symbols` set of the build context.
 
         """
-        cls.multichar_symbols.update(map(escape,conf["multichar_symbols"]))
-        cls.multichar_symbols.add(escape(PREFIX_BOUNDARY))
-        cls.multichar_symbols.add(escape(SUFFIX_BOUNDARY))
-        cls.multichar_symbols.add(escape(ALT_TAG))
+        context.add_multichar_symbols(map(escape,conf["multichar_symbols"]))
+        context.add_multichar_symbols([escape(PREFIX_BOUNDARY),
+                                       escape(SUFFIX_BOUNDARY),
+                                       escape(ALT_TAG)])
         
-    @classmethod
-    def get_prefix_flags(cls, prefix:str) -> tuple[str]:
+    @staticmethod
+    def get_prefix_flags(prefix:str, context:BuildContext=None) -> tuple[str]:
         """Get P and R flag diacritics like @P.Prefix.NI@ which
            determine valid combinations of prefixes and suffixes.
 
-           The flag diacritics will be added to `multichar_symbols`.
+           If a build context is given, the flag diacritics will be
+           added to its `multichar_symbols`.
 
         """
         prefix = "NONE" if prefix == "" else prefix.upper()
         pflag, rflag = f"@P.Prefix.{prefix}@", f"@R.Prefix.{prefix}@"
-        cls.multichar_symbols.update([pflag, rflag])
+        if context is not None:
+            context.add_multichar_symbols([pflag, rflag])
         return pflag, rflag
 
-    @classmethod
-    def get_paradigm_flags(cls, paradigm:str) -> tuple[str]:
+    @staticmethod
+    def get_paradigm_flags(paradigm:str, context:BuildContext=None) -> tuple[str]:
         """Get P and R flag diacritics for a given paradigm like VTA.
 
-           The flag diacritics will be added to `multichar_symbols`.
+           If a build context is given, the flag diacritics will be
+           added to its `multichar_symbols`.
 
         """        
         pflag, rflag = f"@P.Paradigm.{paradigm}@", f"@R.Paradigm.{paradigm}@"
-        cls.multichar_symbols.update([pflag, rflag])        
+        if context is not None:
+            context.add_multichar_symbols([pflag, rflag])
         return pflag, rflag
     
     def get_order_flag(self) -> tuple[str]:
@@ -198,10 +222,11 @@ class LexcPath:
         elif "+Cnj" in self.tags:
             order = "Cnj"
         flag = f"@U.Order.{order}@"
-        LexcPath.multichar_symbols.update([flag])
+        self.context.add_multichar_symbol(flag)
         return order, flag
 
-    def __init__(self, row:pd.core.series.Series, conf:dict, regular:bool):
+    def __init__(self, row:pd.core.series.Series, conf:dict, regular:bool,
+                 context:BuildContext):
         """Initialize this LexcPath using the configuration file conf and a
         spreadsheet row. The boolean parameter regular determines whether this
         is treated as a regular form (which should have morpheme boundaries
@@ -209,14 +234,15 @@ class LexcPath:
         in the lexc file in verbatim.
 
         All morphological features like "+VTA", "+Ind" and "+1SgSubj"
-        apperaing on the spreadsheet row will be added to
-        multichar_symbols.
+        apperaing on the spreadsheet row will be added to the
+        multichar_symbols of the build context.
 
         """
         self.root_lexicon = conf["root_lexicon"]
         self.row = row
         self.conf = conf
         self.regular = regular
+        self.context = context
         self.paradigm = row["Paradigm"]
         self.klass = row["Class"]
         self.lemma = escape(row["Lemma"])
@@ -229,16 +255,17 @@ class LexcPath:
 
         try:
             self.read_forms(row, conf)
+        except MissingFormsError as e:
+            context.warn(e, force=False, key=MISSING_FORMS)
         except ValueError as e:
-            warn(e, force=False)
+            context.warn(e, force=False)
             
     def harvest_multichar_symbols(self) -> None:
         """Add all morphological features like "+VTA", "+Ind" and "+1SgSubj"
-           from this path to the multichar_symbols set
+           from this path to the multichar_symbols set of the build context
 
         """
-        for tag in self.tags:
-            LexcPath.multichar_symbols.add(tag)
+        self.context.add_multichar_symbols(self.tags)
 
     def read_forms(self, row:pd.core.series.Series, conf:dict) -> None:
         """Read all forms on the given dataframe row. Store both the plain
@@ -254,10 +281,10 @@ class LexcPath:
             return [i for i in range(MAXFORMS) if f"Form{i}Surface" in row and
                                                   not row[f"Form{i}Surface"] in [missing, ""]]
         
-        self.forms = [(row[f"Form{i}Surface"], split_form(row[f"Form{i}Split"]))
+        self.forms = [(row[f"Form{i}Surface"], split_form(row[f"Form{i}Split"], self.context.logger))
                       for i in get_form_indices()]
         if len(self.forms) == 0:
-            raise ValueError(f"No surface forms given for row: {row.to_dict()}")
+            raise MissingFormsError(row)
         
     def get_lexc_paths(self) -> list[list[LexcEntry]]:
         """Convert this path into a list of lexc lexicon paths starting
@@ -349,8 +376,9 @@ class LexcPath:
                 #     and the changed-conjunct marker require conjunct order and some
                 #     preverbs have distinct independent and conjunct order surface
                 #     forms) 
-                set_prefix_flag, check_prefix_flag = LexcPath.get_prefix_flags(parts.prefix)
-                _, check_paradigm_flag = LexcPath.get_paradigm_flags(paradigm)
+                set_prefix_flag, check_prefix_flag = LexcPath.get_prefix_flags(parts.prefix,
+                                                                                   self.context)
+                _, check_paradigm_flag = LexcPath.get_paradigm_flags(paradigm, self.context)
                 order, check_order_flag = self.get_order_flag()
 
                 # Initialize the person prefix for this form
@@ -424,7 +452,7 @@ class LexcPath:
             return re.sub("[_].*","",s)
         for path in self.get_lexc_paths():
             paradigm = get_paradigm(path[0].lexicon)
-            p_paradigm_flag, _ = LexcPath.get_paradigm_flags(paradigm)
+            p_paradigm_flag, _ = LexcPath.get_paradigm_flags(paradigm, self.context)
             lexicons[self.root_lexicon].add(LexcEntry(self.root_lexicon,
                                                       p_paradigm_flag,
                                                       p_paradigm_flag,
@@ -447,7 +475,7 @@ class LexcPath:
         return hash(str(self))
 
 class DerivationPath:
-    def __init__(self, row:pd.core.series.Series, conf:dict):
+    def __init__(self, row:pd.core.series.Series, conf:dict, context:BuildContext):
         self.conf = conf
         self.form = row.Form
         self.tag = f"+{row.Tag}"
@@ -455,13 +483,21 @@ class DerivationPath:
         self.input_class = row.InputClass
         self.output_paradigm = row.OutputParadigm
         self.output_class = row.OutputClass
-        LexcPath.multichar_symbols.update([self.tag])
-        
+        context.add_multichar_symbol(self.tag)
+
+    @staticmethod
+    def get_boundary_lexicon(paradigm:str, klass:str) -> str:
+        """Return the inflection class boundary lexicon (like
+           `VII_Class=VII_VV_Boundary`) of a paradigm and class.
+
+        """
+        return f"{paradigm}_Class={klass}_Boundary"
+
     def extend_lexicons(self, lexicons:dict) -> None:
-        input_boundary_lexicon = f"{self.input_paradigm}_Class={self.input_class}_Boundary"
+        input_boundary_lexicon = self.get_boundary_lexicon(self.input_paradigm, self.input_class)
         analysis = f"+{self.input_paradigm}{self.tag}"
         surface = f"0{escape(SUFFIX_BOUNDARY)}{self.form}"
-        output_boundary_lexicon = f"{self.output_paradigm}_Class={self.output_class}_Boundary"
+        output_boundary_lexicon = self.get_boundary_lexicon(self.output_paradigm, self.output_class)
         if not input_boundary_lexicon in lexicons:
             lexicons[input_boundary_lexicon] = set()
         lexicons[input_boundary_lexicon].add(LexcEntry(input_boundary_lexicon,
@@ -0,0 +1,228 @@
+"""Columnar conversion of paradigm spreadsheets into lexc sublexicon
+   entries.
+
+   Constructing a `LexcPath` object for every spreadsheet row is slow
+   for large inflection tables. The function `extend_lexicons` in this
+   module processes an entire table at once using vectorized pandas
+   string operations. It produces exactly the same `LexcEntry` objects
+   and multichar symbols as calling `LexcPath(row, conf, regular,
+   context).extend_lexicons(lexicons)` for every row of the table.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from .lexc_path import (LexcPath, LexcEntry, MAXFORMS, PREFIX_BOUNDARY,
+                        SUFFIX_BOUNDARY, ALT_TAG, escape, split_form,
+                        MISSING_PREFIX_BOUNDARY, MISSING_SUFFIX_BOUNDARY, MISSING_FORMS,
+                        missing_prefix_boundary_message, missing_suffix_boundary_message,
+                        MissingFormsError)
+from .build_context import BuildContext
+from .log import Logger, default_logger
+
+ESCAPE_PATTERN = r"(?<!%)([!%<>0/#; ])"
+"""Vectorized counterpart of `lexc_path.escape()`."""
+
+def escape_column(column:pd.Series) -> pd.Series:
+    """Escape lexc special characters in every string in a column. See
+       `lexc_path.escape()`.
+
+    """
+    return column.astype(str).str.replace(ESCAPE_PATTERN, r"%\1", regex=True)
+
+def get_tags(table:pd.DataFrame, conf:dict) -> tuple[pd.Series, list[pd.Series]]:
+    """Return the concatenated tag string (like `+VTA+Ind+1SgSubj`) for
+       every row of the table as well as a list of per-feature tag
+       columns. Missing features are represented by empty strings.
+
+    """
+    tags = pd.Series("", index=table.index, dtype=object)
+    tag_columns = []
+    for feat in conf["morph_features"]:
+        valid = ((table[feat] != conf["missing_tag_marker"]) &
+                 (table[feat] != ""))
+        tag_column = escape_column("+" + table[feat].astype(str)).where(valid, "")
+        tag_columns.append(tag_column)
+        tags = tags + tag_column
+    return tags, tag_columns
+
+def get_order(tag_columns:list[pd.Series], index:pd.Index) -> np.ndarray:
+    """Return the order (Ind, Cnj or Other) for every row. See
+       `LexcPath.get_order_flag()`.
+
+    """
+    is_ind = np.zeros(len(index), dtype=bool)
+    is_cnj = np.zeros(len(index), dtype=bool)
+    for tag_column in tag_columns:
+        is_ind |= (tag_column == "+Ind").to_numpy()
+        is_cnj |= (tag_column == "+Cnj").to_numpy()
+    return np.where(is_ind, "Ind", np.where(is_cnj, "Cnj", "Other")).astype(object)
+
+def get_forms(table:pd.DataFrame, conf:dict) -> pd.DataFrame:
+    """Return a frame with one row for each non-empty form on each
+       spreadsheet row. The frame has columns `row` (position of the
+       spreadsheet row), `rank` (position of the form among the forms on
+       its row), `surface` and `split`. It is sorted by `row` and
+       `rank`.
+
+    """
+    missing = conf["missing_form_marker"]
+    forms = []
+    for i in range(MAXFORMS):
+        if not f"Form{i}Surface" in table:
+            continue
+        surface = table[f"Form{i}Surface"]
+        valid = ~surface.isin([missing, ""]).to_numpy()
+        forms.append(pd.DataFrame({"row": np.flatnonzero(valid),
+                                   "surface": surface.to_numpy()[valid],
+                                   "split": table[f"Form{i}Split"].to_numpy()[valid]}))
+    if forms == []:
+        forms = pd.DataFrame({"row": pd.Series([], dtype=int),
+                              "surface": pd.Series([], dtype=object),
+                              "split": pd.Series([], dtype=object)})
+    else:
+        forms = pd.concat(forms, ignore_index=True)
+    forms = forms.sort_values("row", kind="stable", ignore_index=True)
+    forms["rank"] = forms.groupby("row").cumcount()
+    return forms
+
+def split_forms(split:pd.Series, logger:Logger=None) -> tuple[pd.Series, pd.Series, pd.Series]:
+    """Vectorized counterpart of `lexc_path.split_form()`. Returns escaped
+       prefix, stem and suffix columns.
+
+    """
+    logger = logger or default_logger
+    split = split.astype(str)
+    no_prefix = ~split.str.contains(PREFIX_BOUNDARY, regex=False)
+    split = split.where(~no_prefix, PREFIX_BOUNDARY + split)
+    logger.warn_all(split[no_prefix], missing_prefix_boundary_message, MISSING_PREFIX_BOUNDARY)
+    no_suffix = ~split.str.contains(SUFFIX_BOUNDARY, regex=False)
+    split = split.where(~no_suffix, split + SUFFIX_BOUNDARY)
+    logger.warn_all(split[no_suffix], missing_suffix_boundary_message, MISSING_SUFFIX_BOUNDARY)
+    parts = split.str.split(f"({PREFIX_BOUNDARY}|{SUFFIX_BOUNDARY})", regex=True)
+    for form in split[parts.str.len() != 5]:
+        # Let split_form report the invalid form
+        split_form(form, logger)
+    return (escape_column(parts.str[0]),
+            escape_column(parts.str[2]),
+            escape_column(parts.str[4]))
+
+def add_entries(lexicons:dict, columns:list[tuple]) -> None:
+    """Add entries to lexicons. `columns` is a list of (lexicon,
+       analysis, surface, next_lexicon) tuples of equal-length arrays,
+       one tuple for each position on a lexc path. New sublexicons are
+       created in the same order in which a row-by-row traversal of the
+       paths would create them.
+
+    """
+    names = np.stack([np.asarray(lexicon, dtype=object) for lexicon, _, _, _ in columns],
+                     axis=1)
+    for name in pd.unique(names.ravel()):
+        if not name in lexicons:
+            lexicons[name] = set()
+    for lexicon, analysis, surface, next_lexicon in columns:
+        entries = pd.DataFrame({"lexicon": lexicon,
+                                "analysis": analysis,
+                                "surface": surface,
+                                "next_lexicon": next_lexicon}).drop_duplicates()
+        for entry in entries.itertuples(index=False, name=None):
+            lexicons[entry[0]].add(LexcEntry(*entry))
+
+def extend_lexicons(table:pd.DataFrame, conf:dict, regular:bool, lexicons:dict,
+                    context:BuildContext) -> None:
+    """Add the lexc paths for all rows of a paradigm spreadsheet to
+       lexicons. This is equivalent to `LexcPath(row, conf, regular,
+       context).extend_lexicons(lexicons)` for each row in the table
+       (see `LexcPath.get_lexc_paths()` for a description of the paths).
+
+    """
+    table = table.reset_index(drop=True)
+    root_lexicon = conf["root_lexicon"]
+    tags, tag_columns = get_tags(table, conf)
+    for tag_column in tag_columns:
+        context.add_multichar_symbols(tag_column[tag_column != ""])
+    order = get_order(tag_columns, table.index)
+
+    forms = get_forms(table, conf)
+    context.logger.warn_all(sorted(set(table.index) - set(forms["row"])),
+                            lambda row: str(MissingFormsError(table.loc[row])),
+                            MISSING_FORMS,
+                            force=False)
+    if len(forms) == 0:
+        return
+    prefix, _, suffix = split_forms(forms["split"], context.logger)
+    prefix = prefix.to_numpy(dtype=object)
+    suffix = suffix.to_numpy(dtype=object)
+    rows = forms["row"].to_numpy()
+    paradigm = table["Paradigm"].astype(str).to_numpy(dtype=object)[rows]
+    klass = table["Class"].astype(str).to_numpy(dtype=object)[rows]
+    lemma = escape_column(table["Lemma"]).to_numpy(dtype=object)[rows]
+    stem = escape_column(table["Stem"]).to_numpy(dtype=object)[rows]
+    order = order[rows]
+    form_tags = tags.to_numpy(dtype=object)[rows]
+    if conf["append_alt_tag"]:
+        form_tags = np.where(forms["rank"].to_numpy() > 0, form_tags + ALT_TAG, form_tags)
+
+    if regular:
+        prefix_name = np.where(prefix == "", "NONE",
+                               pd.Series(prefix, dtype=object).str.upper()).astype(object)
+        for p in pd.unique(prefix):
+            LexcPath.get_prefix_flags(p, context)
+        for p in pd.unique(paradigm):
+            LexcPath.get_paradigm_flags(p, context)
+        context.add_multichar_symbols(f"@U.Order.{o}@" for o in pd.unique(order))
+        set_prefix_flag = "@P.Prefix." + prefix_name + "@"
+        check_prefix_flag = "@R.Prefix." + prefix_name + "@"
+        check_paradigm_flag = "@R.Paradigm." + paradigm + "@"
+        check_order_flag = "@U.Order." + order + "@"
+
+        person_prefix_lexicon = paradigm + "_Prefix"
+        morpheme_boundary_lexicon = paradigm + "_PrefixBoundary"
+        preverb_lexicon = (conf["prefix_root"]
+                           if "prefix_root" in conf
+                           else None)
+        enclitic_lexicon = "EncliticRoot"
+        pos_stem_lexicon = np.full(len(forms), f"{conf['pos']}Stems", dtype=object)
+        paradigm_stem_lexicon = paradigm + "_Stems"
+        class_lexicon = paradigm + "_Class=" + klass
+        inflection_class_lexicon = class_lexicon + "_Boundary"
+        check_prefix_lexicon = class_lexicon + "_Flags"
+        check_order_lexicon = check_prefix_lexicon + "_Prefix=" + prefix_name
+        ending_lexicon = class_lexicon + "_Prefix=" + prefix_name + "_Order=" + order + "_Endings"
+
+        def const(value):
+            return np.full(len(forms), value, dtype=object)
+        path = [
+            (person_prefix_lexicon, set_prefix_flag, set_prefix_flag + prefix,
+             morpheme_boundary_lexicon),
+            (morpheme_boundary_lexicon, const("0"), const(escape(PREFIX_BOUNDARY)),
+             const(preverb_lexicon or pos_stem_lexicon[0])),
+            (pos_stem_lexicon, check_paradigm_flag, check_paradigm_flag,
+             paradigm_stem_lexicon),
+            (paradigm_stem_lexicon, lemma, stem, inflection_class_lexicon),
+            (inflection_class_lexicon, const("0"), const(escape(SUFFIX_BOUNDARY)),
+             check_prefix_lexicon),
+            (check_prefix_lexicon, check_prefix_flag, check_prefix_flag,
+             check_order_lexicon),
+            (check_order_lexicon, check_order_flag, check_order_flag,
+             ending_lexicon),
+            (ending_lexicon, form_tags, suffix, const(enclitic_lexicon or "#"))
+        ]
+        first_lexicon = person_prefix_lexicon
+    else:
+        irregular_lexicon = paradigm + "_Irregular"
+        path = [(irregular_lexicon, lemma + form_tags, forms["surface"].to_numpy(dtype=object),
+                 np.full(len(forms), "#", dtype=object))]
+        first_lexicon = irregular_lexicon
+
+    # Every path is reachable from the root lexicon via a paradigm flag
+    root_paradigm = (pd.Series(first_lexicon, dtype=object)
+                     .str.replace("[_].*", "", regex=True)
+                     .to_numpy(dtype=object))
+    for p in pd.unique(root_paradigm):
+        LexcPath.get_paradigm_flags(p, context)
+    root_flag = "@P.Paradigm." + root_paradigm + "@"
+    root_entries = (np.full(len(forms), root_lexicon, dtype=object),
+                    root_flag, root_flag, first_lexicon)
+    add_entries(lexicons, [root_entries] + path)
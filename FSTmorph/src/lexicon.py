@@ -2,11 +2,112 @@
 
 import pandas as pd
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from os.path import join as pjoin
 
-from .lexc_path import LexcPath, DerivationPath, entry2str, LexcEntry, escape
-from .log import info, warn
+from .lexc_path import LexcPath, DerivationPath, entry2str, LexcEntry
+from . import lexc_table
+from .lexc_table import escape_column
 from .lexc_comment import comment_block
+from .lexicon_store import LexiconStore
+from .build_context import BuildContext
+from .lexc_graph import prune_lexicons, merge_lexicons, PruneReport
+from .output import LexcModule
+
+EXCLUSION_FIELDS = ["Class", "Lemma", "Paradigm", "Stem"]
+"""Lexical database fields which can be used for excluding entries."""
+
+def read_exclusions(lexical_data_to_exclude:str,
+                    context:BuildContext) -> dict[str, dict[str, set]]:
+    """Parse the CSV listing lexical data to exclude. Each row of the
+       CSV specifies a lexical database "Directory", a "Field" and its
+       "Value". E.g., to exclude all forms with lemma X from the database
+       in directory OPD, Directory=OPD, Field=Lemma and Value=X.
+
+       Returns a dictionary mapping directories to sets of excluded
+       values for each field:
+
+       ```
+       {"OPD": {"Class": set(), "Lemma": {"X"}, "Paradigm": set(), "Stem": set()}}
+       ```
+
+    """
+    exclusions = {}
+    # There may have been no CSV supplied (if no exclusions necessary)
+    if not lexical_data_to_exclude:
+        return exclusions
+    exclusion_info = context.read_csv(lexical_data_to_exclude, dtype=str)
+    for index, (directory, field, value) in enumerate(zip(exclusion_info["Directory"],
+                                                          exclusion_info["Field"],
+                                                          exclusion_info["Value"])):
+        if field in EXCLUSION_FIELDS:
+            if not directory in exclusions:
+                exclusions[directory] = {f:set() for f in EXCLUSION_FIELDS}
+            exclusions[directory][field].add(value)
+        else:
+            context.warn(f"ERROR: CSV with forms to exclude ({lexical_data_to_exclude}) has an erroneous row.",
+                         f"\nRow {index} has the Field '{field}', which is not a recognized value.",
+                         f"\nRecognized values are: {', '.join(EXCLUSION_FIELDS)}",
+                         file=lexical_data_to_exclude, row=index, field=field)
+    return exclusions
+
+def read_database_chunks(database_file:str, chunk_size:int):
+    """Iterate over a lexical database CSV in chunks of `chunk_size`
+       rows. This keeps memory usage bounded for very large
+       databases. If `chunk_size` is `None`, the entire database is
+       returned as one chunk.
+
+       All columns are read as strings so that the result doesn't
+       depend on how the file is split into chunks.
+
+    """
+    database = pd.read_csv(database_file,
+                           keep_default_na=False,
+                           dtype=str,
+                           chunksize=chunk_size)
+    if chunk_size is None:
+        yield database
+    else:
+        with database as reader:
+            yield from reader
+
+def get_exclusions(exclusions:dict, database_path:str) -> dict[str, set]:
+    """Return the excluded values for each field which apply to the
+       lexical database source in `database_path`.
+
+    """
+    res = {field:set() for field in EXCLUSION_FIELDS}
+    for directory, excluded_values in exclusions.items():
+        # Only apply exclusions intended for this lexical database source
+        if isinstance(directory, str) and database_path.endswith(directory):
+            for field in EXCLUSION_FIELDS:
+                res[field].update(excluded_values[field])
+    return res
+
+def get_exclusion_mask(lexeme_database:pd.DataFrame, exclusions:dict) -> pd.Series:
+    """Return a boolean mask which is True for rows of the lexical
+       database that match any of the excluded values.
+
+    """
+    mask = pd.Series(False, index=lexeme_database.index)
+    for field in EXCLUSION_FIELDS:
+        if len(exclusions[field]) > 0:
+            mask |= lexeme_database[field].isin(exclusions[field])
+    return mask
+
+def get_derivation_targets(conf:dict, source_path:str, context:BuildContext) -> set[str]:
+    """Return the inflection class boundary lexicons (like
+       `VII_Class=VII_VV_Boundary`) into which the derivations of a
+       configuration continue. These can be defined in the lexc file of
+       another configuration.
+
+    """
+    if not "derivational_csv_file" in conf:
+        return set()
+    der_csv = context.read_csv(pjoin(source_path, conf["derivational_csv_file"]))
+    return set(DerivationPath.get_boundary_lexicon(row.OutputParadigm, row.OutputClass)
+               for row in der_csv.itertuples(index=False))
 
 class LexcFile:
     @staticmethod
@@ -18,14 +119,14 @@ class LexcFile:
         print("", file=lexc_file)
 
     @staticmethod
-    def write_root_lexc(root_lexc_filename,pos_root_lexicons):
+    def write_root_lexc(root_lexc_filename,pos_root_lexicons,multichar_symbols):
         """Write the `LEXICON Root` into a lexc_file. Each POS has their own
            custom root lexicon (e.g. VerbRoot and NounRoot) which the
            master root lexicon needs to reference.
 
         """
         with open(root_lexc_filename,"w") as root_lexc_file:
-            LexcFile.write_multichar_symbols(LexcPath.multichar_symbols,
+            LexcFile.write_multichar_symbols(multichar_symbols,
                                             root_lexc_file)
             print("LEXICON Root", file=root_lexc_file)
             for lexicon_name in pos_root_lexicons:
@@ -40,39 +141,72 @@ class LexcFile:
                  lexical_data_to_exclude:str,
                  read_lexical_database:bool,
                  add_derivations:bool,
-                 regular:bool):
+                 regular:bool,
+                 context:BuildContext=None):
         """Initialize the lexicon using a configuration file. Parameters: 
            * `conf` configuration 
            * `source_path` path to OjibweMorph repo
-           * `lexc_path` destination directory for lexc code
+           * `lexc_path` destination directory for lexc code (can be
+             `None` if the file is only generated in memory, see
+             `to_module()`)
            * `database_paths` paths to lexical data CSVs (with lemmas/stems)
            * `lexical_data_to_exclude` path to CSV listing lexical data to NOT include
            * `read_lexical_database` whether to include lexemes from database 
            * `regular` whether this is a lexc file for regular or irregular lexemes 
+           * `context` the BuildContext which collects multichar symbols
+             (a fresh context is created if this is omitted)
+
+           Inflection tables are converted into lexc paths using the
+           vectorized engine in `lexc_table`. Setting the configuration
+           field `"lexc_engine"` to `"rows"` switches to constructing
+           one `LexcPath` object per spreadsheet row instead.
+
+           If the configuration field `"prune_lexicons"` is true,
+           the sublexicons are pruned (see `prune()`). If
+           `"merge_lexicons"` is true, equivalent sublexicons are merged
+           (see `merge()`). The sublexicons listed in the field
+           `"shared_lexicons"` are referenced from other lexc files, so
+           they are kept by both.
         """
         self.conf = conf
         self.root_lexicon = conf["root_lexicon"]
         self.source_path = source_path        
         self.lexc_path = lexc_path
         self.regular = regular
-        self.lexicons = {self.root_lexicon:set()}
-        LexcPath.update_multichar_symbol_set(self.conf)
+        self.context = BuildContext() if context is None else context
+        self.lexicons = LexiconStore()
+        self.lexicons[self.root_lexicon] = set()
+        self.merged_lexicons = {}
+        LexcPath.update_multichar_symbol_set(self.conf, self.context)
         
         csv_names = conf["regular_csv_files" if regular else "irregular_csv_files"]
         for name in csv_names:
             csv_file = os.path.join(os.path.join(self.source_path,
                                                  conf["morphology_source_path"]), f"{name}.csv")
-            info(f"Reading inflection table from {csv_file}",force=False)
-            table = pd.read_csv(csv_file, keep_default_na=False)
-            for _, row in table.iterrows():
-                lexc_path = LexcPath(row, conf, regular)
-                lexc_path.extend_lexicons(self.lexicons)
+            self.context.info(f"Reading inflection table from {csv_file}",force=False)
+            with self.context.stage("inflection_csv", csv=csv_file) as stage:
+                entries = self.count_entries()
+                table = self.context.read_csv(csv_file, keep_default_na=False)
+                if conf.get("lexc_engine", "columnar") == "rows":
+                    for _, row in table.iterrows():
+                        lexc_path = LexcPath(row, conf, regular, self.context)
+                        lexc_path.extend_lexicons(self.lexicons)
+                else:
+                    lexc_table.extend_lexicons(table, conf, regular, self.lexicons,
+                                               self.context)
+                stage.count(rows=len(table), entries=self.count_entries() - entries)
 
         if read_lexical_database:
             self.read_lexemes_from_database(database_paths, lexical_data_to_exclude)
 
         if add_derivations and "derivational_csv_file" in conf:
             self.add_derivations()
+
+        if conf.get("prune_lexicons"):
+            self.prune()
+
+        if conf.get("merge_lexicons"):
+            self.merge()
             
     def read_lexemes_from_database(self, database_paths, lexical_data_to_exclude) -> None:
         """Read lemma/stem entries from one or more external CSV file
@@ -90,118 +224,208 @@ class LexcFile:
 
         """
         # Determine which forms to exclude, as specified by the user
-        # Each row of the CSV specifies the "Field" and its "Value"
-        # e.g., to exclude all forms with lemma X, Field=Lemma and Value=X
-        classes_to_exclude = []
-        lemmas_to_exclude = []
-        paradigms_to_exclude = []
-        stems_to_exclude = []
-        # There may have been no CSV supplied (if no exclusions necessary)
-        if lexical_data_to_exclude:
-            exclusion_info = pd.read_csv(lexical_data_to_exclude)
-            for index, row in exclusion_info.iterrows():
-                field = row["Field"]
-                if field == "Class":
-                    classes_to_exclude.append(row['Value'])
-                elif field == "Lemma":
-                    lemmas_to_exclude.append(row['Value'])
-                elif field == "Paradigm":
-                    paradigms_to_exclude.append(row['Value'])
-                elif field == "Stem":
-                    stems_to_exclude.append(row['Value'])
-                else:
-                    print(f"ERROR: CSV with forms to exclude ({lexical_data_to_exclude}) has an erroneous row.",
-                          f"\nRow {index} has the Field '{field}', which is not a recognized value.",
-                          f"\nRecognized values are: Class, Lemma")
-
-        info(f"Reading in {len(database_paths)} lexical database input(s).")
-        # Read through *each* lexical database source
-        for database_path in database_paths:
-            info(f"Reading external lexical database {self.conf['lexical_database']} from directory {database_path}\n")
-            if self.conf["lexical_database"] != "None":
-                lexeme_database = pd.read_csv(os.path.join(database_path,
-                                                self.conf["lexical_database"]),
-                                                keep_default_na=False)
-
-                # Determine which forms to exclude, as specified by the user
-                # Each row of the CSV specifies the "Field" and its "Value"
-                # e.g., to exclude all forms with lemma X, Field=Lemma and Value=X
-                classes_to_exclude = []
-                lemmas_to_exclude = []
-                paradigms_to_exclude = []
-                stems_to_exclude = []
-                # There may have been no CSV supplied (if no exclusions necessary)
-                if lexical_data_to_exclude:
-                    exclusion_info = pd.read_csv(lexical_data_to_exclude)
-                    for index, row in exclusion_info.iterrows():
-                        directory = row["Directory"]
-                        # Only apply exclusions intended for this lexical database source
-                        if database_path.endswith(directory):
-                            field = row["Field"]
-                            if field == "Class":
-                                classes_to_exclude.append(row['Value'])
-                            elif field == "Lemma":
-                                lemmas_to_exclude.append(row['Value'])
-                            elif field == "Paradigm":
-                                paradigms_to_exclude.append(row['Value'])
-                            elif field == "Stem":
-                                stems_to_exclude.append(row['Value'])
-                            else:
-                                print(f"ERROR: CSV with forms to exclude ({lexical_data_to_exclude}) has an erroneous row.",
-                                    f"\nRow {index} has the Field '{field}', which is not a recognized value.",
-                                    f"\nRecognized values are: Class, Lemma")
-
-                # Extract the data from the lexical database file
-                skipped = 0
-                excluded = 0
-                for _, row in lexeme_database.iterrows():
-                    try:
-                        klass = row.Class
-                        paradigm = row.Paradigm
-                        lemma = row.Lemma
-                        stem = row.Stem
-                        # Only proceed if this stems is *not* to be excluded
-                        if not(klass in classes_to_exclude) and not(lemma in lemmas_to_exclude) and not(paradigm in paradigms_to_exclude) and not (stem in stems_to_exclude):
-                            self.lexicons[f"{paradigm}_Stems"].add(
-                                LexcEntry(f"{paradigm}_Stems",
-                                        escape(lemma),
-                                        escape(stem),
-                                        f"{paradigm}_Class={klass}_Boundary"))
-                        else:
-                            excluded += 1
-                    except ValueError as e:
-                        warn(e)
-                        skipped += 1
-                info(f"Checked {len(lexeme_database)} lexical entries.\n",
-                    f"Added {len(lexeme_database) - skipped} entries to lexc file.\n",
-                    f"Skipped {skipped} invalid entries.\n",
-                    f"Excluded {excluded} entries specified by the user.")
+        exclusions = read_exclusions(lexical_data_to_exclude, self.context)
+
+        self.context.info(f"Reading in {len(database_paths)} lexical database input(s).")
+        # Database sources may be read in worker threads, which don't
+        # inherit the labels of the current profiling stage
+        labels = self.context.stage_labels()
+        def load(database_path):
+            with self.context.stage("database", **{**labels, "source": database_path}) as stage:
+                result = self.load_database(database_path,
+                                            get_exclusions(exclusions, database_path))
+                if result is not None:
+                    stems, checked, _ = result
+                    stage.count(rows=checked,
+                                entries=sum(len(entries) for entries in stems.values()))
+                return result
+        threads = min(self.conf.get("database_threads") or 1, len(database_paths))
+        if threads > 1:
+            # Parsing CSVs is mostly I/O and C code, so the sources can
+            # be read concurrently. executor.map returns the results in
+            # the order of database_paths, which keeps the merge below
+            # deterministic.
+            self.context.info(f"Reading lexical databases using {threads} threads.")
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                results = list(executor.map(load, database_paths))
+        else:
+            results = map(load, database_paths)
+
+        # Merge the entries from *each* lexical database source
+        for database_path, result in zip(database_paths, results):
+            if result is None:
+                continue
+            stems, checked, excluded = result
+            for lexicon, entries in stems.items():
+                self.lexicons[lexicon].update(entries)
+            self.context.info(f"Lexical database {database_path}:\n",
+                f"Checked {checked} lexical entries.\n",
+                f"Added {checked - excluded} entries to lexc file.\n",
+                f"Excluded {excluded} entries specified by the user.")
+
+    def load_database(self, database_path:str, exclusions:dict):
+        """Read the lexical database in `database_path` and return a tuple
+        `(stems, checked, excluded)`, where `stems` maps stem
+        sublexicons like `VTA_Stems` to sets of LexcEntry objects and the
+        remaining elements are entry counts. Returns `None` if the
+        configuration doesn't specify a lexical database.
+
+        This function doesn't modify the lexicons of this LexcFile, so it
+        can be run in a worker thread.
+
+        """
+        self.context.info(f"Reading external lexical database {self.conf['lexical_database']} from directory {database_path}\n")
+        if self.conf["lexical_database"] == "None":
+            return None
+        chunk_size = self.conf.get("database_chunk_size") or None
+        stems = {}
+        checked = 0
+        excluded = 0
+        start_time = time.perf_counter()
+        for chunk in read_database_chunks(os.path.join(database_path,
+                                                       self.conf["lexical_database"]),
+                                          chunk_size):
+            # Only proceed with stems which are *not* to be excluded
+            chunk_excluded = get_exclusion_mask(chunk, exclusions)
+            self.get_stems(chunk[~chunk_excluded], stems)
+            checked += len(chunk)
+            excluded += int(chunk_excluded.sum())
+            if chunk_size:
+                elapsed = time.perf_counter() - start_time
+                self.context.info(f"Read {checked} lexical entries from {database_path}",
+                                  f"({checked / max(elapsed, 1e-9):.0f} rows/sec).")
+        return stems, checked, excluded
+
+    def get_stems(self, lexeme_database:pd.DataFrame, stems:dict) -> None:
+        """Add LexcEntry objects for the lemma/stem entries in
+        `lexeme_database` into `stems`, which maps `{paradigm}_Stems`
+        sublexicon names to entry sets. Raises KeyError if the paradigm
+        of an entry doesn't have a stem lexicon in this lexc file (i.e.
+        the paradigm doesn't occur in the inflection tables).
+
+        """
+        stem_lexicon = lexeme_database["Paradigm"].astype(str) + "_Stems"
+        next_lexicon = (lexeme_database["Paradigm"].astype(str) + "_Class=" +
+                        lexeme_database["Class"].astype(str) + "_Boundary")
+        entries = pd.DataFrame({"lexicon": stem_lexicon,
+                                "analysis": escape_column(lexeme_database["Lemma"]),
+                                "surface": escape_column(lexeme_database["Stem"]),
+                                "next_lexicon": next_lexicon})
+        for lexicon, group in entries.groupby("lexicon", sort=False):
+            if not lexicon in self.lexicons:
+                raise KeyError(lexicon)
+            if not lexicon in stems:
+                stems[lexicon] = set()
+            stems[lexicon].update(
+                LexcEntry(*entry) for entry in group.itertuples(index=False, name=None))
 
     def add_derivations(self):
-        der_csv = pd.read_csv(pjoin(self.source_path, self.conf["derivational_csv_file"]))
-        for _, row in der_csv.iterrows():
-            DerivationPath(row,self.conf).extend_lexicons(self.lexicons)
+        with self.context.stage("derivations") as stage:
+            entries = self.count_entries()
+            der_csv = self.context.read_csv(pjoin(self.source_path, self.conf["derivational_csv_file"]))
+            for _, row in der_csv.iterrows():
+                DerivationPath(row,self.conf,self.context).extend_lexicons(self.lexicons)
+            stage.count(rows=len(der_csv), entries=self.count_entries() - entries)
+
+    def count_entries(self) -> int:
+        """Return the total number of entries in all sublexicons."""
+        return sum(len(entries) for entries in self.lexicons.values())
             
+    def get_entry_lexicons(self) -> list[str]:
+        """Return the sublexicons through which paths enter this lexc
+           file: the root lexicon, the POS stem lexicon (like
+           `VerbStems`) when returning from the pre-element lexicons and
+           the shared lexicons of the configuration (like the targets of
+           derivations in other lexc files). Other lexc files refer to
+           these by name.
+
+        """
+        return ([self.root_lexicon, f"{self.conf.get('pos')}Stems"] +
+                list(self.conf.get("shared_lexicons", [])))
+
+    def prune(self) -> PruneReport:
+        """Remove sublexicons which are unreachable and entries which can't
+           lead to the end of a word (e.g. entries continuing to a
+           `{paradigm}_Stems` lexicon without any stems). Continuations
+           to lexicons in other lexc files are assumed to be valid. See
+           `lexc_graph.prune_lexicons()`.
+
+        """
+        report = prune_lexicons(self.lexicons, self.get_entry_lexicons())
+        self.context.info(f"Pruned {len(report.removed_lexicons)} sublexicons and",
+                          f"{report.removed_entries} entries from",
+                          self.get_lexc_file_name())
+        for lexicon in report.removed_lexicons:
+            self.context.info(f"  Removed sublexicon {lexicon}",force=False)
+        return report
+
+    def merge(self) -> dict[str, list[str]]:
+        """Merge sublexicons which accept the same language, like the
+           `_Flags` lexicons of inflection classes with identical
+           endings. See `lexc_graph.merge_lexicons()`. Returns a
+           dictionary mapping each remaining representative to the
+           sublexicons merged into it.
+
+        """
+        size = len(self.lexicons)
+        merged = merge_lexicons(self.lexicons, self.get_entry_lexicons())
+        for representative, names in merged.items():
+            self.merged_lexicons.setdefault(representative, []).extend(names)
+        self.context.info(f"Merged {size - len(self.lexicons)} equivalent sublexicons in",
+                          self.get_lexc_file_name())
+        return merged
+
+    def lexc_blocks(self):
+        """Yield the lexc code for this file one sublexicon at a
+           time. Each block consists of a comment block, the `LEXICON`
+           line and the sorted sublexicon entries.
+
+        """
+        self.context.info(f"Writing {len(self.lexicons)} sublexicons:",force=False)
+        for lexicon in self.lexicons:
+            lexc_rows = sorted(self.lexicons[lexicon])
+            self.context.info(lambda: f"  {lexicon} ({len(lexc_rows)} entries)",force=False)
+            block = []
+            try:
+                block.append(comment_block(lexicon) + "\n\n")
+            except ValueError as e:
+                self.context.warn(f"Failed to generate comment block: {e}",
+                                  key="Failed to generate comment block")
+            for name in self.merged_lexicons.get(lexicon, []):
+                block.append(f"! Merged: {name}\n")
+            block.append(f"LEXICON {lexicon}\n")
+            block.extend(f"{entry2str(row)}\n" for row in lexc_rows)
+            block.append("\n")
+            yield "".join(block)
+
+    def get_lexc_file_name(self) -> str:
+        """Return the name of the lexc file: the field "regular_lexc_file"
+           in the configuration file for a regular lexc file and
+           "irregular_lexc_file" otherwise.
+
+        """
+        return self.conf["regular_lexc_file" if self.regular
+                         else "irregular_lexc_file"]
+
+    def to_module(self) -> LexcModule:
+        """Return the in-memory LexcModule for this lexc file. The lexc
+           code is generated lazily when the module is iterated.
+
+        """
+        return LexcModule(self.get_lexc_file_name(), self.lexc_blocks, self.lexicons)
+
     def write_lexc(self) -> None:
         """Write contents to lexc file. If this is a regular lexc file, write
            to the file given by the field "regular_lexc_file" in the
            configuration file. Otherwise, write to the file given by
            "irregular_lexc_file".
+
+           The file is replaced atomically and only if its contents
+           change, which preserves the modification time of unchanged
+           files.
         """
-        
-        lexc_fn = os.path.join(self.lexc_path,
-                               self.conf["regular_lexc_file" if self.regular
-                                         else "irregular_lexc_file"])
-        lexc_file = open(lexc_fn,"w")
-        info(f"Writing {len(self.lexicons)} sublexicons:",force=False)
-        for lexicon in self.lexicons:            
-            lexc_rows = sorted(list(self.lexicons[lexicon]))
-            info(f"  {lexicon} ({len(lexc_rows)} entries)",force=False)
-            try:
-                print(comment_block(lexicon) + "\n", file=lexc_file)
-            except ValueError as e:
-                warn(f"Failed to generate comment block: {e}")
-            print(f"LEXICON {lexicon}", file=lexc_file)
-            for row in lexc_rows:
-                print(entry2str(row), file=lexc_file)
-            print("", file=lexc_file)
+        with self.context.stage("write_lexc", file=self.get_lexc_file_name()) as stage:
+            stage.count(sublexicons=len(self.lexicons), entries=self.count_entries())
+            if not self.to_module().write(self.lexc_path):
+                lexc_fn = os.path.join(self.lexc_path, self.get_lexc_file_name())
+                self.context.info(f"{lexc_fn} is unchanged.")
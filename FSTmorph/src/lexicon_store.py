@@ -0,0 +1,178 @@
+"""Compact storage for lexc sublexicons.
+
+   A lexc file for a large lexicon contains millions of LexcEntry
+   objects, and the same strings (continuation lexicon names like
+   `VTA_Class=VTA_C_Prefix=NI_Order=Ind_Endings`, tag strings and flag
+   diacritics) are repeated across thousands of entries. The
+   LexiconStore interns every string into a SymbolTable and stores each
+   entry as a single integer which packs the IDs of its analysis,
+   surface string and continuation lexicon. Duplicate entries are
+   therefore eliminated by comparing integers.
+
+   LexiconStore can be used in place of a `dict` mapping sublexicon
+   names to sets of LexcEntry objects:
+
+   ```
+   lexicons = LexiconStore()
+   lexicons["VTA_Stems"] = set()
+   lexicons["VTA_Stems"].add(LexcEntry("VTA_Stems", "waabam", "waabam",
+                                       "VTA_Class=VTA_C_Boundary"))
+   for entry in lexicons["VTA_Stems"]:
+       ...
+   ```
+
+"""
+
+from .lexc_path import LexcEntry
+
+ID_BITS = 32
+"""Number of bits used for each symbol ID in a packed entry."""
+
+ID_MASK = (1 << ID_BITS) - 1
+
+class SymbolTable:
+    """Bidirectional mapping between strings and integer IDs."""
+    __slots__ = ("ids", "symbols")
+
+    def __init__(self):
+        self.ids = {}
+        self.symbols = []
+
+    def intern(self, symbol:str) -> int:
+        """Return the ID of symbol. Unseen symbols get a fresh ID."""
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            if symbol_id > ID_MASK:
+                raise ValueError(f"Symbol table is full: {len(self.symbols)} symbols")
+            self.ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def get(self, symbol:str) -> int:
+        """Return the ID of symbol, or `None` for unseen symbols."""
+        return self.ids.get(symbol)
+
+    def __getitem__(self, symbol_id:int) -> str:
+        return self.symbols[symbol_id]
+
+    def __len__(self):
+        return len(self.symbols)
+
+class Sublexicon:
+    """The entries of one lexc sublexicon. Entries are stored as packed
+       integers `(analysis_id << 64) | (surface_id << 32) | next_id`.
+       Iteration decodes them back into LexcEntry objects.
+
+    """
+    __slots__ = ("name", "symbols", "entries")
+
+    def __init__(self, name:str, symbols:SymbolTable):
+        self.name = name
+        self.symbols = symbols
+        self.entries = set()
+
+    def encode(self, entry) -> int:
+        """Pack a LexcEntry (or a `(lexicon, analysis, surface,
+           next_lexicon)` tuple) into an integer. The lexicon isn't
+           stored, so it has to be the name of this sublexicon.
+
+        """
+        if entry[0] != self.name:
+            raise ValueError(f"Entry of LEXICON {entry[0]} added to LEXICON {self.name}: {entry}")
+        intern = self.symbols.intern
+        return ((intern(entry[1]) << (2 * ID_BITS)) |
+                (intern(entry[2]) << ID_BITS) |
+                intern(entry[3]))
+
+    def find(self, entry) -> int:
+        """Return the packed integer for `entry` like `encode()`, but
+           without interning new symbols. Returns `None` if the entry
+           can't be in this sublexicon because it belongs to another
+           lexicon or one of its strings has never been seen.
+
+        """
+        if entry[0] != self.name:
+            return None
+        get = self.symbols.get
+        ids = (get(entry[1]), get(entry[2]), get(entry[3]))
+        if None in ids:
+            return None
+        return (ids[0] << (2 * ID_BITS)) | (ids[1] << ID_BITS) | ids[2]
+
+    def decode(self, key:int) -> LexcEntry:
+        """Unpack an integer into a LexcEntry."""
+        symbols = self.symbols.symbols
+        return LexcEntry(self.name,
+                         symbols[key >> (2 * ID_BITS)],
+                         symbols[(key >> ID_BITS) & ID_MASK],
+                         symbols[key & ID_MASK])
+
+    def add(self, entry) -> None:
+        self.entries.add(self.encode(entry))
+
+    def update(self, entries) -> None:
+        encode = self.encode
+        self.entries.update(encode(entry) for entry in entries)
+
+    def discard(self, entry) -> None:
+        key = self.find(entry)
+        if key is not None:
+            self.entries.discard(key)
+
+    def __contains__(self, entry) -> bool:
+        key = self.find(entry)
+        return key is not None and key in self.entries
+
+    def __iter__(self):
+        return map(self.decode, self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+class LexiconStore:
+    """Mapping from sublexicon names to Sublexicon objects. Sublexicons
+       are kept in insertion order. All sublexicons share one
+       SymbolTable.
+
+    """
+    def __init__(self, symbols:SymbolTable=None):
+        self.symbols = SymbolTable() if symbols is None else symbols
+        self.sublexicons = {}
+
+    def __setitem__(self, name:str, entries) -> None:
+        """Replace the sublexicon `name` with the given entries (e.g. an
+           empty set).
+
+        """
+        sublexicon = Sublexicon(self.symbols.symbols[self.symbols.intern(name)],
+                                self.symbols)
+        sublexicon.update(entries)
+        self.sublexicons[sublexicon.name] = sublexicon
+
+    def __getitem__(self, name:str) -> Sublexicon:
+        return self.sublexicons[name]
+
+    def __delitem__(self, name:str) -> None:
+        del self.sublexicons[name]
+
+    def __contains__(self, name:str) -> bool:
+        return name in self.sublexicons
+
+    def __iter__(self):
+        return iter(self.sublexicons)
+
+    def __len__(self):
+        return len(self.sublexicons)
+
+    def get(self, name:str, default=None):
+        return self.sublexicons.get(name, default)
+
+    def keys(self):
+        return self.sublexicons.keys()
+
+    def values(self):
+        return self.sublexicons.values()
+
+    def items(self):
+        return self.sublexicons.items()
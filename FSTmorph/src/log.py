@@ -1,22 +1,184 @@
-"""Simple module for message logging during compilation (this might be
-   replaced by a real logging library at some point)."""
+"""Leveled, structured message logging during compilation.
 
+   A Logger prints messages at the levels DEBUG, INFO, WARNING and
+   ERROR to stderr, either as plain text or as JSON lines. The
+   existing `info(*msg, force=...)` and `warn(*msg, force=...)` calls
+   map to these levels: messages with `force=False` are logged at the
+   DEBUG level, which is only shown in verbose mode.
+
+   Messages are formatted lazily. Any part of a message can be a
+   callable without arguments, which is only called if the message is
+   actually printed:
+
+   ```
+   logger.info(lambda: json.dumps(config, indent=2), force=False)
+   ```
+
+   Warnings which can be repeated many times during a build (like
+   invalid segmented forms) are logged with a `key`. Only the first
+   `max_repeats` messages with the same key are printed. The rest are
+   counted and reported as one line by `flush()` at the end of the
+   build, e.g. `Invalid segmented form (missing '>>'): 5230 times, 5227
+   not shown`. `warn_all()` logs a warning for each item of a sequence
+   without formatting the messages which aren't printed.
+"""
+
+import json
+import threading
+from itertools import islice
 from sys import stderr
 
-# This is a temporary solution and should be replaced with proper logging
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "debug",
+               INFO: "info",
+               WARNING: "warning",
+               ERROR: "error"}
+
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+"""Maps level names like `"info"` to levels."""
+
+MAX_REPEATS = 3
+"""Default number of printed warnings with the same key."""
+
+def format_message(msg) -> str:
+    """Join the parts of a message like `print` does. Callable parts
+       are called first.
+
+    """
+    return " ".join(str(part() if callable(part) else part) for part in msg)
+
+class Logger:
+    """Logger for one build. Messages are printed to stderr (or
+       `stream`) if their level is at least `level`. By default, this is
+       INFO, or DEBUG in verbose mode. With `json_lines`, each message
+       is printed as a JSON object on its own line.
+
+       Warnings with the same key are printed at most `max_repeats`
+       times. In verbose mode, all warnings are printed.
+
+    """
+    def __init__(self, verbose=False, stream=None, level=None, json_lines=False, max_repeats=MAX_REPEATS):
+        self.verbose = verbose
+        self.stream = stream
+        self.level = level
+        self.json_lines = json_lines
+        self.max_repeats = max_repeats
+        self.repeats = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Loggers are sent to worker processes (e.g. inside a
+        # BuildCache), and locks can't be pickled
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def get_level(self) -> int:
+        if self.level is not None:
+            return self.level
+        return DEBUG if self.verbose else INFO
 
-verbose=False
-"""Ugly global variable toggles verbose mode for warnings"""
+    def enabled(self, level:int) -> bool:
+        """Return True if messages at `level` are printed."""
+        return level >= self.get_level()
+
+    def count_repeat(self, key:str, count:int=1) -> int:
+        """Count `count` messages with `key`. Returns how many of them
+           should be printed.
+
+        """
+        with self.lock:
+            total, shown = self.repeats.get(key, (0, 0))
+            show = count
+            if not self.verbose and self.max_repeats is not None:
+                show = max(0, min(count, self.max_repeats - shown))
+            self.repeats[key] = (total + count, shown + show)
+        return show
+
+    def log(self, level:int, *msg, key:str=None, **fields) -> None:
+        """Print a message at `level`. If `key` is given, the message is
+           counted towards the repeat limit of that key. Keyword
+           arguments are added as fields to JSON lines (callable values
+           are called first) and ignored in text output.
+
+        """
+        if not self.enabled(level):
+            return
+        if key is not None and self.count_repeat(key) == 0:
+            return
+        self.emit(level, format_message(msg), key, fields)
+
+    def emit(self, level:int, message:str, key:str=None, fields:dict=None) -> None:
+        stream = self.stream or stderr
+        if self.json_lines:
+            record = {"level": LEVEL_NAMES[level], "message": message}
+            if key is not None:
+                record["key"] = key
+            for name, value in (fields or {}).items():
+                record[name] = value() if callable(value) else value
+            print(json.dumps(record, default=str), file=stream)
+        elif level >= WARNING:
+            print("\033[0;31m",end="",file=stream)
+            print(message, "\033[0m", file=stream)
+        else:
+            print(message, file=stream)
+
+    def debug(self, *msg, **fields):
+        self.log(DEBUG, *msg, **fields)
+
+    def info(self, *msg, force=True, **fields):
+        self.log(INFO if force else DEBUG, *msg, **fields)
+
+    def warn(self, *msg, force=True, **fields):
+        self.log(WARNING if force else DEBUG, *msg, **fields)
+
+    def error(self, *msg, **fields):
+        self.log(ERROR, *msg, **fields)
+
+    def warn_all(self, items, message, key:str, force=True) -> None:
+        """Log the warning `message(item)` with `key` for each item in the
+           sequence `items`. Only the messages which are printed are
+           formatted.
+
+        """
+        level = WARNING if force else DEBUG
+        if len(items) == 0 or not self.enabled(level):
+            return
+        for item in islice(items, self.count_repeat(key, len(items))):
+            self.emit(level, message(item), key)
+
+    def flush(self) -> None:
+        """Print a summary line for each key whose warnings weren't all
+           printed, and reset the counters. The summaries are warnings,
+           so they aren't printed if the level is above WARNING.
+
+        """
+        with self.lock:
+            repeats = self.repeats
+            self.repeats = {}
+        if not self.enabled(WARNING):
+            return
+        for key, (total, shown) in repeats.items():
+            if total > shown:
+                self.emit(WARNING, f"{key}: {total} times, {total - shown} not shown", key,
+                          {"count": total, "suppressed": total - shown})
+
+default_logger = Logger()
+"""Logger used by the module-level functions below"""
 
 def set_verbose(mode):
-    global verbose
-    verbose = mode
-    
+    default_logger.verbose = mode
+
 def info(*msg, force=True):
-    if force or verbose:
-        print(*msg, file=stderr)
+    default_logger.info(*msg, force=force)
 
 def warn(*msg, force=True):
-    if force or verbose:
-        print("\033[0;31m",end="",file=stderr)
-        print(*msg, "\033[0m", file=stderr)
+    default_logger.warn(*msg, force=force)
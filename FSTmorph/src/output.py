@@ -0,0 +1,97 @@
+"""Functions for writing generated lexc files.
+
+   Output files are written through a large buffer into a temporary file
+   in the destination directory, which is then atomically renamed to
+   the destination. If the destination already has identical contents,
+   it is left untouched. This preserves the modification time of
+   unchanged lexc files, so that build tools like make don't needlessly
+   recompile the FST.
+
+   Generated lexc files can also be kept in memory as LexcModule
+   objects, which produce their contents as a sequence of string
+   chunks.
+
+"""
+
+import filecmp
+import os
+import tempfile
+from os.path import basename, dirname, exists, join as pjoin
+
+WRITE_BUFFER_SIZE = 1 << 20
+"""Buffer size (in bytes) for writing output files."""
+
+def get_file_mode(path:str) -> int:
+    """Return the permission bits for the output file `path`: those of
+       the existing file or, for new files, the default permissions
+       given by the umask.
+
+    """
+    if exists(path):
+        return os.stat(path).st_mode & 0o777
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def write_if_changed(path:str, chunks) -> bool:
+    """Write the strings in the iterable `chunks` into the file
+       `path`. The file is replaced atomically and only if its contents
+       change. Returns `True` if the file was (re)written and `False` if
+       it was already up-to-date.
+
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=dirname(path) or ".",
+                                    prefix=f".{basename(path)}.",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", buffering=WRITE_BUFFER_SIZE) as f:
+            for chunk in chunks:
+                f.write(chunk)
+        if exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+            os.remove(tmp_path)
+            return False
+        os.chmod(tmp_path, get_file_mode(path))
+        os.replace(tmp_path, path)
+        return True
+    except BaseException:
+        if exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class LexcModule:
+    """A generated lexc file like `root.lexc` or `ojibwe_verbs.lexc` held
+       in memory. `get_chunks` is a function which returns an iterable
+       of strings whose concatenation is the contents of the file. Large
+       lexc files are produced one sublexicon at a time, so their full
+       text doesn't need to be held in memory.
+
+       Modules generated from a `LexcFile` also give access to its
+       sublexicons through `lexicons`. For modules rendered from
+       templates, `lexicons` is `None`.
+
+    """
+    def __init__(self, file_name:str, get_chunks, lexicons=None):
+        self.file_name = file_name
+        self.get_chunks = get_chunks
+        self.lexicons = lexicons
+
+    def chunks(self):
+        """Iterate over the contents of this module in chunks."""
+        return iter(self.get_chunks())
+
+    def text(self) -> str:
+        """Return the contents of this module as one string."""
+        return "".join(self.chunks())
+
+    def write(self, lexc_path:str) -> bool:
+        """Write this module into the directory `lexc_path`. See
+           `write_if_changed()`.
+
+        """
+        return write_if_changed(pjoin(lexc_path, self.file_name), self.chunks())
+
+def read_lexc_module(lexc_path:str, file_name:str) -> LexcModule:
+    """Read the lexc file `file_name` in `lexc_path` into a LexcModule."""
+    with open(pjoin(lexc_path, file_name)) as f:
+        text = f.read()
+    return LexcModule(file_name, lambda: [text])
@@ -0,0 +1,220 @@
+"""Per-stage timing and memory profiling for lexc builds.
+
+   A Profiler records one StageRecord for each stage of a build (like
+   reading an inflection table or rendering a template):
+
+   ```
+   profiler = Profiler()
+   with profiler.stage("inflection_csv", csv="VTA_IND.csv") as stage:
+       ...
+       stage.count(rows=len(table))
+   profiler.write("profile.json")
+   ```
+
+   Each record contains the wall and CPU time of the stage, the
+   increase of the peak resident set size of the process, the change
+   of the memory allocated by Python and the peak allocation above the
+   starting level (measured by `tracemalloc`, which slows down the
+   build, so it can be turned off) and counts like rows or entries
+   given by the caller. Stages can be nested. Nested stages inherit
+   the labels of the enclosing stage in the same thread.
+
+   CPU time, RSS and tracemalloc figures are process-wide, so for
+   stages running in concurrent threads they include the work of the
+   other threads.
+"""
+
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+StageRecord = namedtuple("StageRecord",
+                         ["stage",
+                          "labels",
+                          "depth",
+                          "wall",
+                          "cpu",
+                          "rss_peak",
+                          "rss_increase",
+                          "allocated",
+                          "allocation_peak",
+                          "counts"])
+StageRecord.__doc__ = \
+"""Measurements for one stage: the stage name, a dictionary of labels
+    (like the configuration or CSV file), the nesting depth, wall and
+    CPU time in seconds, the peak RSS of the process at the end of the
+    stage and its increase during the stage in bytes, the change of
+    memory allocated by Python and the peak allocation above the level
+    at the start of the stage in bytes (`None` if tracemalloc is off)
+    and a dictionary of counts.
+
+"""
+
+def get_peak_rss() -> int:
+    """Return the peak resident set size of this process in bytes (0 if
+       it isn't available).
+
+    """
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+class Stage:
+    """A running stage. Returned by `Profiler.stage()`."""
+    def __init__(self, labels:dict):
+        self.labels = labels
+        self.counts = {}
+        self.allocation_peak = 0
+
+    def count(self, **counts) -> None:
+        """Add to the counts of this stage (e.g. `stage.count(rows=10)`)."""
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+class NullStage:
+    """Stage which records nothing. Used when profiling is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def count(self, **counts) -> None:
+        pass
+
+NULL_STAGE = NullStage()
+
+class Profiler:
+    """Collects StageRecord objects for a build. Records can be added
+       from several threads.
+
+    """
+    def __init__(self, trace_memory:bool=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started_tracemalloc = False
+
+    def get_stack(self) -> list[Stage]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def labels(self) -> dict:
+        """Return the labels of the innermost running stage in this
+           thread. Pass these to stages started in worker threads.
+
+        """
+        stack = self.get_stack()
+        return dict(stack[-1].labels) if stack else {}
+
+    @contextmanager
+    def stage(self, name:str, **labels):
+        """Context manager which records the stage `name`. Yields a Stage
+           object for adding counts. Records are added when stages end,
+           so nested stages come before the enclosing stage.
+
+        """
+        stage = self.enter(labels)
+        try:
+            yield stage
+        finally:
+            self.exit(name, stage)
+
+    def enter(self, labels:dict) -> Stage:
+        stack = self.get_stack()
+        stage = Stage({**self.labels(), **labels})
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracemalloc = True
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].allocation_peak = max(stack[-1].allocation_peak, peak)
+            tracemalloc.reset_peak()
+            stage.allocated = current
+        stage.depth = len(stack)
+        stage.rss = get_peak_rss()
+        stage.cpu = time.process_time()
+        stage.wall = time.perf_counter()
+        stack.append(stage)
+        return stage
+
+    def exit(self, name:str, stage:Stage) -> StageRecord:
+        wall = time.perf_counter() - stage.wall
+        cpu = time.process_time() - stage.cpu
+        rss = get_peak_rss()
+        stack = self.get_stack()
+        stack.pop()
+        allocated = None
+        allocation_peak = None
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(stage.allocation_peak, peak)
+            if stack:
+                stack[-1].allocation_peak = max(stack[-1].allocation_peak, peak)
+            allocated = current - stage.allocated
+            allocation_peak = peak - stage.allocated
+        record = StageRecord(name, stage.labels, stage.depth, wall, cpu, rss, rss - stage.rss,
+                             allocated, allocation_peak, stage.counts)
+        with self.lock:
+            self.records.append(record)
+        return record
+
+    def merge(self, records:list) -> None:
+        """Add records collected by another Profiler (e.g. in a worker
+           process).
+
+        """
+        with self.lock:
+            self.records.extend(StageRecord(*record) for record in records)
+
+    def stop(self) -> None:
+        """Stop tracemalloc if this profiler started it."""
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    def totals(self) -> dict[str, dict]:
+        """Return the number of records and the total wall and CPU time
+           and counts for each stage name. Nested stages of the same
+           name are counted twice.
+
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record.stage, {"calls": 0, "wall": 0.0, "cpu": 0.0, "counts": {}})
+            total["calls"] += 1
+            total["wall"] += record.wall
+            total["cpu"] += record.cpu
+            for name, value in record.counts.items():
+                total["counts"][name] = total["counts"].get(name, 0) + value
+        return totals
+
+    def report(self) -> dict:
+        """Return the records and totals as a dictionary which can be
+           written as JSON.
+
+        """
+        return {"stages": [record._asdict() for record in self.records],
+                "totals": self.totals(),
+                "peak_rss": max((record.rss_peak for record in self.records), default=0)}
+
+    def write(self, profile_file:str) -> None:
+        """Write the report into the JSON file `profile_file`."""
+        with open(profile_file, "w") as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
@@ -2,11 +2,12 @@
    code."""
 
 from jinja2 import Environment, FileSystemLoader
-import pandas as pd
 from os import listdir
 from os.path import join as pjoin, expanduser, basename, dirname
 from math import isnan
-from .lexc_path import escape, LexcPath
+from .lexc_path import escape
+from .output import LexcModule
+from .build_context import BuildContext
 from re import sub
 
 NO_CH_CONJUNCT="@D.ChCnj@"
@@ -89,30 +90,46 @@ def get_allomorph(pv,order_filter):
         raise ValueError(f"Unknown order filter {order_filter}")
     return None if allomorph == None else (canonical, allomorph)
 
-def get_load_pre_element_database(source_dirs,prefix_database):
+def get_load_pre_element_database(source_dirs,prefix_database,context:BuildContext):
     """Return a function which can be used to load the preverb database
        in a jinja template file. We need a specialized function because
        information about file paths is not accessible from the template.
 
+       The prefix databases are grouped by paradigm once, when the
+       template first calls the function. Each call is then a dictionary
+       lookup followed by a single join.
+
     """    
-    def load_pre_element_database(pv_tag,next_sublex):
-        res = ""
+    index = None
+    escaped_entries = {}
+    def get_index():
+        # Map each paradigm (e.g. PVLex) to its (lemma, stem) pairs in
+        # the order of source_dirs and database rows
+        index = {}
         for source_dir in source_dirs:
-            paradigm = sub("/$","",pv_tag)
             if not prefix_database in ["None", None] and not source_dir in ["None", None] :
-                df = pd.read_csv(pjoin(source_dir, prefix_database))
-                for _, pv in df.iterrows():
-                    if pv.Paradigm == paradigm:
-                        if res != "":
-                            res += "\n"
-                        tag = escape(f"{pv_tag}{pv.Lemma}+")
-                        # We need to register our preverb/prenoun tag as a multicharacter symbol
-                        LexcPath.multichar_symbols.add(tag)
-                        res += f"{tag}:{pv.Stem} {next_sublex} ;"
-        return res    
+                df = context.read_csv(pjoin(source_dir, prefix_database))
+                for paradigm, group in df.groupby("Paradigm", sort=False):
+                    if not paradigm in index:
+                        index[paradigm] = []
+                    index[paradigm].extend(zip(group.Lemma, group.Stem))
+        return index
+
+    def load_pre_element_database(pv_tag,next_sublex):
+        nonlocal index
+        if index is None:
+            index = get_index()
+        if not pv_tag in escaped_entries:
+            paradigm = sub("/$","",pv_tag)
+            escaped_entries[pv_tag] = [(escape(f"{pv_tag}{lemma}+"), stem)
+                                       for lemma, stem in index.get(paradigm, [])]
+        entries = escaped_entries[pv_tag]
+        # We need to register our preverb/prenoun tags as multicharacter symbols
+        context.add_multichar_symbols(tag for tag, _ in entries)
+        return "\n".join(f"{tag}:{stem} {next_sublex} ;" for tag, stem in entries)
     return load_pre_element_database
     
-def get_load_pre_element_csv(source_dir):
+def get_load_pre_element_csv(source_dir,context:BuildContext):
     """Return a function which can be used to load a preverb spreadsheet
        from a jinja template file. We need a specialized function because
        information about file paths is not accessible from the template.
@@ -121,14 +138,14 @@ def get_load_pre_element_csv(source_dir):
     def load_pre_element_csv(sources,next_pv_lexicon,order_filter):
         entries = []
         for csv_fn, pv_tag in sources:
-            df = pd.read_csv(pjoin(source_dir, csv_fn))
+            df = context.read_csv(pjoin(source_dir, csv_fn))
             for _, pv in df.iterrows():
                 res = get_allomorph(pv, order_filter)
                 if res != None and not "NONE" in res:
                     canonical, allomorph = res
                     canonical = pv_tag + canonical
                     # We need to define preverb/prenoun tag as a multichar symbol
-                    LexcPath.multichar_symbols.add(f"{escape(canonical)}+")
+                    context.add_multichar_symbol(f"{escape(canonical)}+")
                     # If the allomorph has a disallow changed conjunct
                     # tag, add one to the canonical form as well
                     if allomorph.find(NO_CH_CONJUNCT) != -1:
@@ -140,7 +157,7 @@ def get_load_pre_element_csv(source_dir):
         return "\n".join(entries)
     return load_pre_element_csv
 
-def get_load_enclitic_csv(source_dir):
+def get_load_enclitic_csv(source_dir,context:BuildContext):
     """Return a function which can be used to load the enclitic spreadsheet
        from a jinja template file. We need a specialized function because
        information about file paths is not accessible from the template.
@@ -149,14 +166,14 @@ def get_load_enclitic_csv(source_dir):
     def load_enclitic_csv(sources, next_lexicon):
         entries = []
         for csv_fn, general_tag in sources:
-            enclitic_csv = pd.read_csv(pjoin(source_dir, csv_fn))
+            enclitic_csv = context.read_csv(pjoin(source_dir, csv_fn))
             for _, clitic in enclitic_csv.iterrows():
                 full_form = clitic["Full_Form"]
                 clitic_form = clitic["Clitic_Form"]
                 if full_form and clitic_form and full_form != "NONE" and clitic_form != "NONE":
                     tag = general_tag + clitic["POS"] + "/" + full_form
                     # We need to define the enclitic tag as a multichar symbol
-                    LexcPath.multichar_symbols.add(f"{escape(tag)}+")
+                    context.add_multichar_symbol(f"{escape(tag)}+")
                     entries.append(
                         f"+{escape(tag)}:{escape(clitic_form)} {next_lexicon} ;")
         if entries == []:
@@ -164,14 +181,14 @@ def get_load_enclitic_csv(source_dir):
         return "\n".join(entries)
     return load_enclitic_csv
 
-def get_generate_pre_element_sub_lexicons(source_dir):
+def get_generate_pre_element_sub_lexicons(source_dir,context:BuildContext):
     """Return a function which will generate Any, Independent,
        PlainConjuct and ChangedConjunct preverb lexicons in a jinja
        template file. We need a specialized function because
        information about file paths is not accessible from the
        template.
     """    
-    load_pre_element_csv = get_load_pre_element_csv(source_dir)
+    load_pre_element_csv = get_load_pre_element_csv(source_dir,context)
     def generate_pre_element_sub_lexicons(sources,pv_lexicon):
         lexicons = [(f"LEXICON {pv_lexicon}{order_filter}\n" +
                      load_pre_element_csv(sources,
@@ -198,7 +215,7 @@ def pretty_join(str_list):
             lines.append(s)
     return "\n".join(lines)
 
-def get_all_pre_element_tags(source_dir):
+def get_all_pre_element_tags(source_dir,context:BuildContext):
     """Return a function which harvests all preverb/prenoun tags from a
        spreadsheet.  The function can be called from a jinja template
        file. We need a specialized function because information about
@@ -210,9 +227,11 @@ def get_all_pre_element_tags(source_dir):
         tag_transformation = eval(tag_transformation)
         for fn in listdir(path=source_dir):
             if fn.endswith(".csv"):
-                df = pd.read_csv(pjoin(source_dir,fn))
-                df.Tag = df.Tag.transform(tag_transformation)
-                pre_element_tags.update(zip(df["Tag"],df["PV"]))
+                # The DataFrame is shared via the CSV cache, so we
+                # don't modify it in place
+                df = context.read_csv(pjoin(source_dir,fn))
+                tags = df.Tag.transform(tag_transformation)
+                pre_element_tags.update(zip(tags,df["PV"]))
         pre_element_tags = sorted(list(pre_element_tags))
         return pretty_join([f"{tag}/{pv}+" for tag, pv in pre_element_tags])
     
@@ -229,8 +248,18 @@ def get_add_lexeme_multichar_symbols(config):
         return pretty_join([escape(symbol) for symbol in config["multichar_symbols"]])
     return add_lexeme_multichar_symbols
 
-def render_pre_element_lexicon(config,source_path,lexc_path):
-    """ Render a preverb or prenoun Jinja template into lexc code."""
+def get_template_module(template_file, template_string):
+    """Return a LexcModule for a rendered Jinja template. The lexc file
+       name is the template file name without the `.j2` extension.
+
+    """
+    return LexcModule(template_file.replace(".j2",""),
+                      lambda: [template_string, "\n"])
+
+def render_pre_element_module(config,source_path,context:BuildContext):
+    """ Render a preverb or prenoun Jinja template into an in-memory
+        LexcModule. Harvested multichar symbols are added to the build
+        context."""
     csv_src_path = pjoin(source_path,config['pv_source_path'])
     template_file = basename(config['template_path'])
     template_dir = pjoin(expanduser(source_path),
@@ -243,23 +272,31 @@ def render_pre_element_lexicon(config,source_path,lexc_path):
     jinja_template = env.get_template(template_file)
     func_dict = {
         "all_pre_element_tags":
-        get_all_pre_element_tags(csv_src_path),
+        get_all_pre_element_tags(csv_src_path,context),
         "load_pre_element_csv":
-        get_load_pre_element_csv(csv_src_path),
+        get_load_pre_element_csv(csv_src_path,context),
         "load_pre_element_database":
-        get_load_pre_element_database(database_src_dirs,prefix_database),
+        get_load_pre_element_database(database_src_dirs,prefix_database,context),
         "generate_pre_element_sub_lexicons":
-        get_generate_pre_element_sub_lexicons(csv_src_path),
+        get_generate_pre_element_sub_lexicons(csv_src_path,context),
         "add_lexeme_multichar_symbols":
         get_add_lexeme_multichar_symbols(config)
     }
     jinja_template.globals.update(func_dict)
-    template_string = jinja_template.render()
-    with open(pjoin(lexc_path, template_file.replace(".j2","")),"w") as f:
-        print(template_string, file=f)
+    with context.stage("render", template=template_file) as stage:
+        template_string = jinja_template.render()
+        stage.count(characters=len(template_string))
+    return get_template_module(template_file, template_string)
 
-def render_enclitic_lexicon(source_path, lexc_path, database_src_dirs):
-    """ Render the enclitic Jinja template into lexc code."""
+def render_pre_element_lexicon(config,source_path,lexc_path,context:BuildContext):
+    """ Render a preverb or prenoun Jinja template into lexc code.
+        Harvested multichar symbols are added to the build context."""
+    render_pre_element_module(config,source_path,context).write(lexc_path)
+
+def render_enclitic_module(source_path, database_src_dirs, context:BuildContext):
+    """ Render the enclitic Jinja template into an in-memory
+        LexcModule. Harvested multichar symbols are added to the build
+        context."""
     csv_src_path = pjoin(source_path, "./OtherSpreadsheets")
     template_file = "enclitics.lexc.j2"
     template_dir = pjoin(expanduser(source_path), "templates")
@@ -268,20 +305,26 @@ def render_enclitic_lexicon(source_path, lexc_path, database_src_dirs):
     jinja_template = env.get_template(template_file)
     func_dict = {
         "all_pre_element_tags":
-        get_all_pre_element_tags(csv_src_path),
+        get_all_pre_element_tags(csv_src_path,context),
         "load_enclitic_csv":
-        get_load_enclitic_csv(csv_src_path),
+        get_load_enclitic_csv(csv_src_path,context),
         "load_pre_element_database":
-        get_load_pre_element_database(database_src_dirs,prefix_database),
+        get_load_pre_element_database(database_src_dirs,prefix_database,context),
         "generate_pre_element_sub_lexicons":
-        get_generate_pre_element_sub_lexicons(csv_src_path)
+        get_generate_pre_element_sub_lexicons(csv_src_path,context)
         # "add_lexeme_multichar_symbols":
         # get_add_lexeme_multichar_symbols(config)
     }
     jinja_template.globals.update(func_dict)
-    template_string = jinja_template.render()
-    with open(pjoin(lexc_path, template_file.replace(".j2","")),"w") as f:
-        print(template_string, file=f)
+    with context.stage("render", template=template_file) as stage:
+        template_string = jinja_template.render()
+        stage.count(characters=len(template_string))
+    return get_template_module(template_file, template_string)
+
+def render_enclitic_lexicon(source_path, lexc_path, database_src_dirs, context:BuildContext):
+    """ Render the enclitic Jinja template into lexc code. Harvested
+        multichar symbols are added to the build context."""
+    render_enclitic_module(source_path, database_src_dirs, context).write(lexc_path)
 
 def get_add_harvested_multichar_symbols(multichar_symbols):
     """Return a function which adds multichar symbols from a set
@@ -294,17 +337,27 @@ def get_add_harvested_multichar_symbols(multichar_symbols):
         return pretty_join(sorted(multichar_symbols))
     return add_harvested_multichar_symbols
 
-def render_root_lexicon(source_path, lexc_path):
-    """ Render a root lexicon Jinja template into lexc code."""
+def render_root_module(source_path, context:BuildContext):
+    """ Render a root lexicon Jinja template into an in-memory
+        LexcModule. The multichar symbols harvested by the build context
+        are declared in the root lexicon, so this needs to be called
+        after all other modules have been generated."""
     template_dir = dirname(expanduser(source_path))
     env = Environment(loader=FileSystemLoader(template_dir))
     template_file = basename(source_path)
     jinja_template = env.get_template(template_file)
     func_dict = {
         "add_harvested_multichar_symbols":
-        get_add_harvested_multichar_symbols(LexcPath.multichar_symbols)
+        get_add_harvested_multichar_symbols(context.multichar_symbols)
     }
     jinja_template.globals.update(func_dict)
-    template_string = jinja_template.render()
-    with open(pjoin(lexc_path, template_file.replace(".j2","")), "w") as f:        
-        print(template_string, file=f)
+    with context.stage("render", template=template_file) as stage:
+        template_string = jinja_template.render()
+        stage.count(characters=len(template_string))
+    return get_template_module(template_file, template_string)
+
+def render_root_lexicon(source_path, lexc_path, context:BuildContext):
+    """ Render a root lexicon Jinja template into lexc code. The
+        multichar symbols harvested by the build context are declared
+        in the root lexicon."""
+    render_root_module(source_path, context).write(lexc_path)
@@ -0,0 +1,57 @@
+"""Shared fixtures for the unit tests. The tests run on a small
+   synthetic data set (see `fstmorph.benchmarks.synthetic_data`).
+
+"""
+
+import random
+
+import pytest
+
+from fstmorph.benchmarks.synthetic_data import generate
+from fstmorph.src.csv_cache import csv_cache
+from fstmorph.src.lexc_lookup import END_LEXICON, apply_flags
+
+LEMMAS = 200
+"""Number of lemmas in the synthetic lexical databases."""
+
+@pytest.fixture(scope="session")
+def data(tmp_path_factory):
+    return generate(str(tmp_path_factory.mktemp("synthetic_data")), LEMMAS)
+
+@pytest.fixture(autouse=True)
+def clear_csv_cache():
+    """Release the spreadsheets which a test has read into the
+       process-wide CSV cache."""
+    yield
+    csv_cache.clear()
+
+def get_sample_paths(lookup, walks, flags=True, max_length=50, seed=0):
+    """Return the sorted `(analysis, form)` pairs of the paths found by
+       `walks` random walks from the root of the LexcLookup `lookup`.
+       With `flags`, walks only take the entries which the flag
+       diacritics allow, so only valid paths are returned.
+
+    """
+    rng = random.Random(seed)
+    paths = set()
+    for _ in range(walks):
+        lexicon, state, upper, lower = lookup.root, (), [], []
+        for _ in range(max_length):
+            if lexicon == END_LEXICON:
+                paths.add(("".join(upper), "".join(lower)))
+                break
+            steps = [(entry, apply_flags(entry[2], state) if flags else state)
+                     for entry in lookup.entries.get(lexicon, ())]
+            steps = [step for step in steps if step[1] is not None]
+            if not steps:
+                break
+            (entry_upper, entry_lower, _, lexicon), state = rng.choice(steps)
+            upper.append(entry_upper)
+            lower.append(entry_lower)
+    return sorted(paths)
+
+@pytest.fixture
+def sample_paths():
+    """Function sampling the paths of a LexcLookup (see
+       `get_sample_paths()`)."""
+    return get_sample_paths
@@ -3,16 +3,25 @@
 #
 # License: CC0 (see LICENSE)
 
-from subprocess import Popen, PIPE
+from subprocess import Popen, PIPE, TimeoutExpired
 from argparse import ArgumentParser
 from io import StringIO
 from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from functools import cached_property
 
+import hashlib
+import json
 import os
 import os.path
+import queue
 import re
 import shutil
+import sqlite3
 import sys
+import threading
+import time
 import yaml
 
 
@@ -27,13 +36,18 @@ def string_to_list(data):
     else: return data
 
 def invert_dict(data):
+        # Keys are collected in dicts (which keep insertion order), so
+        # checking for duplicates doesn't scan a list
         tmp = OrderedDict()
         for key, val in data.items():
             for v in string_to_list(val):
-                d = tmp.setdefault(v, [])
-                if key not in d:
-                    d.append(key)
-        return tmp
+                tmp.setdefault(v, {})[key] = None
+        return OrderedDict((k, list(v)) for k, v in tmp.items())
+
+def unique_inputs(cases):
+    """Return the inputs of the test cases without `~` prefixes, each
+    only once and in order of first occurrence."""
+    return list(OrderedDict.fromkeys(case.input.lstrip("~") for case in cases))
 
 COLORS = {
     "red": "\033[1;31m",
@@ -45,6 +59,19 @@ COLORS = {
     "reset": "\033[m"
 }
 
+TAB_RE = re.compile(r'\t+')
+
+def parse_fst_line(line):
+    """Return the input and the result in a line of lookup output."""
+    results = TAB_RE.split(line)
+    # This test is needed because xfst's lookup
+    # sometimes output strings like
+    # bearkoe\tbearkoe\t+N+Sg+Nom, instead of the expected
+    # bearkoe\tbearkoe+N+Sg+Nom
+    if len(results) > 2 and results[2][0] == '+':
+        return results[0].strip(), results[1].strip() + results[2].strip()
+    return results[0].strip(), results[1].strip()
+
 def colourise(string, *args, **kwargs):
     kwargs.update(COLORS)
     return string.format(*args, **kwargs)
@@ -60,6 +87,315 @@ def check_path_exists(program):
 class LookupError(Exception):
     pass
 
+DEFAULT_TIMEOUT = 300
+"""Seconds to wait for output from a long-lived lookup process."""
+
+MAX_QUEUED_LINES = 10000
+
+class LookupProcess:
+    """A lookup process for one transducer. Queries are written to the
+    process one per line. The lookup application prints the results of
+    each query followed by an empty line, which ends the result. Every
+    result line starts with the query, so output which doesn't belong
+    to the expected query (e.g. a warning or a missing empty line) is
+    detected and raises LookupError.
+
+    A long-lived process (see `lookup()`) must flush its output after
+    each result. `hfst-lookup` does this, and so does `flookup` with
+    `-b` (which `LookupPool` adds). If no output arrives for `timeout`
+    seconds, the process is killed and LookupError is raised, so an
+    application which buffers its output can't hang the run."""
+
+    def __init__(self, program, fst, timeout=DEFAULT_TIMEOUT):
+        self.program = program
+        self.fst = fst
+        self.timeout = timeout
+        self.app = Popen(program + [fst], stdin=PIPE, stdout=PIPE, stderr=PIPE, close_fds=True,
+                         encoding='utf-8')
+        # stdout and stderr are read continuously, so the process can't
+        # block on them and reads from stdout can time out
+        self.lines = queue.Queue(MAX_QUEUED_LINES)
+        self.out_reader = threading.Thread(target=self._read_out, daemon=True)
+        self.out_reader.start()
+        self.err = []
+        self.err_reader = threading.Thread(target=self._read_err, daemon=True)
+        self.err_reader.start()
+
+    def _read_out(self):
+        for line in self.app.stdout:
+            self.lines.put(line)
+        self.lines.put('')
+
+    def _read_err(self):
+        for line in self.app.stderr:
+            self.err.append(line)
+
+    def _join_out_reader(self):
+        # Empty the queue, so the reader can't block on a full queue
+        while self.out_reader.is_alive():
+            try:
+                self.lines.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def _feed(self, keys, close, errors):
+        try:
+            for key in keys:
+                self.app.stdin.write(key + '\n')
+            if close:
+                self.app.stdin.close()
+            else:
+                self.app.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            errors.append(e)
+
+    def alive(self):
+        return self.app.poll() is None
+
+    def _fail(self, feeder, message):
+        # The output can't be matched to the queries any more, so the
+        # process is stopped (LookupPool restarts it when needed)
+        self.app.kill()
+        feeder.join()
+        raise LookupError(self.error(message))
+
+    def error(self, out=''):
+        """Describe why the process failed."""
+        try:
+            self.app.stdin.close()
+        except OSError:
+            pass
+        self.app.wait()
+        self._join_out_reader()
+        self.err_reader.join()
+        err = ''.join(self.err).strip()
+        return "\n".join(
+            [i for i in [out, err, "(Error code: %s)" % self.app.returncode] if i != '']
+        )
+
+    def lookup(self, keys, close=False, ordered=False):
+        """Look up `keys` and return a map from each key to the set of
+        its results. The output is parsed line by line as it arrives,
+        while the keys are written in a separate thread, so the process
+        can't block on a full output pipe while we are writing. With
+        `close`, the input is closed after the last key and the results
+        are read until the process exits, which it must do without an
+        error. Otherwise the process is kept running for more lookups,
+        and waiting for its output times out after `timeout` seconds.
+        With `ordered`, the results are lists in output order instead
+        of sets."""
+        errors = []
+        feeder = threading.Thread(target=self._feed, args=(keys, close, errors), daemon=True)
+        feeder.start()
+        parsed = {}
+        count = 0
+        lines = 0
+        last = ''
+        while count < len(keys):
+            try:
+                line = self.lines.get(timeout=None if close else self.timeout)
+            except queue.Empty:
+                self._fail(feeder,
+                    "No output for %s seconds. The lookup application must flush its "
+                    "output after each result." % self.timeout)
+            if line == '' and close:
+                break
+            if line == '':
+                feeder.join()
+                raise LookupError(self.error(last))
+            if line.strip() == '':
+                if lines == 0:
+                    self._fail(feeder, "Lookup output has no result for `%s`." % keys[count])
+                count += 1
+                lines = 0
+            else:
+                last = line.rstrip('\n')
+                if '\t' not in last or parse_fst_line(last)[0] != keys[count].strip():
+                    self._fail(feeder, "Unexpected lookup output for `%s`: %s" % (keys[count], last))
+                lines += 1
+                key, result = parse_fst_line(last)
+                if not ordered:
+                    parsed.setdefault(key, set()).add(result)
+                else:
+                    results = parsed.setdefault(key, [])
+                    if result not in results:
+                        results.append(result)
+        feeder.join()
+        if errors or (close and self.app.wait() != 0):
+            raise LookupError(self.error(last))
+        return parsed
+
+    def close(self):
+        if self.alive():
+            try:
+                self.app.stdin.close()
+            except OSError:
+                pass
+            try:
+                self.app.wait(timeout=10)
+            except TimeoutExpired:
+                self.app.kill()
+                self.app.wait()
+        self._join_out_reader()
+        self.err_reader.join()
+        self.app.stdout.close()
+        self.app.stderr.close()
+
+class LookupPool:
+    """Lookup processes shared by all test files of one run: `jobs`
+    processes for each lookup application and transducer, so every
+    transducer is loaded only once per job. A process which has failed
+    is restarted when it is needed again. `flookup` is run with `-b`,
+    so it flushes its output after each result."""
+
+    def __init__(self, jobs=1, timeout=DEFAULT_TIMEOUT):
+        self.jobs = jobs
+        self.timeout = timeout
+        self.processes = {}
+
+    def get(self, program, fst, job=0):
+        key = (tuple(program), os.path.abspath(fst), job)
+        process = self.processes.get(key)
+        if process is None or not process.alive():
+            if process is not None:
+                process.close()
+            if os.path.basename(program[0]) == "flookup" and "-b" not in program:
+                program = program + ["-b"]
+            process = LookupProcess(program, fst, self.timeout)
+            self.processes[key] = process
+        return process
+
+    def lookup(self, program, fst, keys, ordered=False):
+        """Look up `keys` like `LookupProcess.lookup()`. The keys are
+        split into one consecutive shard per job and the shards are
+        looked up concurrently. Their results are merged in the order of
+        `keys`."""
+        if self.jobs == 1 or len(keys) < 2:
+            return self.get(program, fst).lookup(keys, ordered=ordered)
+        jobs = min(self.jobs, len(keys))
+        shards = [keys[i * len(keys) // jobs:(i + 1) * len(keys) // jobs] for i in range(jobs)]
+        processes = [self.get(program, fst, job) for job in range(jobs)]
+        with ThreadPoolExecutor(jobs) as executor:
+            shard_results = list(executor.map(LookupProcess.lookup, processes, shards,
+                                              [False] * jobs, [ordered] * jobs))
+        parsed = shard_results[0]
+        for results in shard_results[1:]:
+            for key, values in results.items():
+                if key not in parsed:
+                    parsed[key] = values
+                elif not ordered:
+                    parsed[key].update(values)
+                else:
+                    parsed[key].extend(v for v in values if v not in parsed[key])
+        return parsed
+
+    def close(self):
+        for process in self.processes.values():
+            process.close()
+        self.processes = {}
+
+def default_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "fstmorph", "lookup-cache.sqlite")
+
+MAX_QUERY_KEYS = 500
+"""Number of keys looked up in the cache with one query (SQLite limits
+the number of query parameters)."""
+
+class LookupCache:
+    """Lookup results stored in an SQLite database, keyed by transducer,
+    direction (`gen` or `morph`) and input. A transducer is identified
+    by a hash of its content and the lookup command, so cached results
+    are used until the transducer changes."""
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS transducers (
+                hash TEXT PRIMARY KEY,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                hash TEXT NOT NULL,
+                direction TEXT NOT NULL,
+                input TEXT NOT NULL,
+                results TEXT NOT NULL,
+                PRIMARY KEY (hash, direction, input)
+            ) WITHOUT ROWID;
+        """)
+        self.started = time.time()
+        self.hashes = {}
+        self.hits = 0
+        self.misses = 0
+        self.pruned = None
+
+    def transducer_hash(self, program, fst):
+        """Return the hash of a transducer and the lookup command. Hashes
+        are computed once per run unless the file changes."""
+        stat = os.stat(fst)
+        key = (tuple(program), os.path.abspath(fst), stat.st_size, stat.st_mtime_ns)
+        if key not in self.hashes:
+            h = hashlib.sha256()
+            h.update(json.dumps(program).encode('utf-8'))
+            with open(fst, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+            self.hashes[key] = h.hexdigest()
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO transducers VALUES (?, ?)",
+                                (self.hashes[key], time.time()))
+        return self.hashes[key]
+
+    def get(self, fst_hash, direction, keys):
+        """Return a map from the cached keys to the lists of their
+        results in output order. The keys are looked up in batches of
+        `MAX_QUERY_KEYS`."""
+        found = {}
+        for i in range(0, len(keys), MAX_QUERY_KEYS):
+            batch = keys[i:i + MAX_QUERY_KEYS]
+            found.update(self.db.execute(
+                "SELECT input, results FROM results WHERE hash = ? AND direction = ? "
+                "AND input IN (%s)" % ",".join("?" * len(batch)),
+                [fst_hash, direction] + list(batch)))
+        cached = {key: json.loads(found[key]) for key in keys if key in found}
+        self.hits += len(cached)
+        self.misses += len(keys) - len(cached)
+        return cached
+
+    def put(self, fst_hash, direction, keys, parsed):
+        """Store the results of `keys` in the map `parsed`, whose values
+        are lists of results in output order."""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                ((fst_hash, direction, key, json.dumps(list(parsed.get(key, ())))) for key in keys))
+
+    def prune(self, days):
+        """Remove the results of transducers which haven't been used
+        during the last `days` days. With 0, only the results of the
+        transducers used in this run are kept."""
+        cutoff = self.started - days * 24 * 60 * 60
+        with self.db:
+            old = self.db.execute("SELECT hash FROM transducers WHERE last_used < ?",
+                                  (cutoff,)).fetchall()
+            self.pruned = self.db.executemany("DELETE FROM results WHERE hash = ?", old).rowcount
+            self.db.executemany("DELETE FROM transducers WHERE hash = ?", old)
+        if self.pruned > 0:
+            self.db.execute("VACUUM")
+
+    def stats(self):
+        total = self.hits + self.misses
+        text = "Lookup cache: %d hits, %d misses (%.1f%% hit rate)" % (
+            self.hits, self.misses, 100.0 * self.hits / total if total else 0.0)
+        if self.pruned is not None:
+            text += ", %d results pruned" % self.pruned
+        return text + "\n"
+
+    def close(self):
+        self.db.close()
+
 # Courtesy of https://gist.github.com/844388. Thanks!
 class _OrderedDictYAMLLoader(yaml.Loader):
     """A YAML loader that loads mappings into ordered dictionaries."""
@@ -101,11 +437,14 @@ def yaml_load_ordered(f):
 
 
 class TestFile:
+    """The test sections of a YAML (or lexc) test file. The test indexes
+    are built on first access and cached, so `data` mustn't be
+    modified afterwards."""
     def __init__(self, data, system="hfst"):
         self.data = data
         self._system = system
 
-    @property
+    @cached_property
     def surface_tests(self):
         tests = OrderedDict()
         for title, cases in self.data['Tests'].items():
@@ -115,7 +454,7 @@ class TestFile:
             tests[title] = new_cases
         return tests
 
-    @property
+    @cached_property
     def lexical_tests(self):
         tests = OrderedDict()
         for title, cases in self.data['Tests'].items():
@@ -125,6 +464,16 @@ class TestFile:
             tests[title] = new_cases
         return tests
 
+    @cached_property
+    def surface_inputs(self):
+        """Inputs of all `surface_tests`, each only once."""
+        return unique_inputs(case for cases in self.surface_tests.values() for case in cases)
+
+    @cached_property
+    def lexical_inputs(self):
+        """Inputs of all `lexical_tests`, each only once."""
+        return unique_inputs(case for cases in self.lexical_tests.values() for case in cases)
+
     @property
     def gen(self):
         return self.data.get("Config", {}).get(self._system, {}).get("Gen", None)
@@ -247,8 +596,11 @@ class MorphTest:
         def final_result(self, *args):
             pass
 
-    def __init__(self, args):
-        self.args = args
+    def __init__(self, args, test_file=None, pool=None, cache=None):
+        # run_tests() changes args, so each test gets its own copy
+        self.args = copy(args)
+        self.pool = pool
+        self.cache = cache
 
         # TODO: check for null case
 
@@ -256,7 +608,7 @@ class MorphTest:
         self.passes = 0
 
         self.count = OrderedDict()
-        self.load_config(self.args.test_file)
+        self.load_config(test_file or self.args.test_file)
 
     def run(self):
         #timing_begin = time.time()
@@ -353,33 +705,55 @@ class MorphTest:
         args = self.args
         self.results = {"gen": {}, "morph": {}}
 
-        def parser(self, d, f, tests):
+        def parser(self, d, f, tests, inputs):
             # TODO: handle ~ in file parser
+            # Each input is looked up once. The results of all test
+            # sections share one key -> results map.
             if key is not None:
-                keys = [x.lstrip("~") for x in tests[key]]
+                keys = unique_inputs(tests[key])
             else:
-                keys = [x[0].lstrip("~") for vals in tests.values() for x in vals]
-            app = Popen(self.program + [f], stdin=PIPE, stdout=PIPE, stderr=PIPE, close_fds=True)
-            args = '\n'.join(keys) + '\n'
-
-            res, err = app.communicate(args.encode('utf-8'))
-            res = res.decode('utf-8').split('\n\n')
-            err = err.decode('utf-8').strip()
-
-            if app.returncode != 0:
-                self.results['err'] = "\n".join(
-                    [i for i in [res[0], err, "(Error code: %s)" % app.returncode] if i != '']
-                )
-            else:
-                self.results[d] = self.parse_fst_output(res)
+                keys = inputs
+
+            cached = {}
+            if self.cache is not None:
+                fst_hash = self.cache.transducer_hash(self.program, f)
+                cached = self.cache.get(fst_hash, d, keys)
+                keys = [k for k in keys if k not in cached]
+
+            # Cached results are kept in output order. Sets built from
+            # them iterate like sets built from the lookup output, so
+            # the output doesn't depend on the cache.
+            ordered = self.cache is not None
+            parsed = {}
+            try:
+                if not keys:
+                    pass
+                elif self.pool is not None:
+                    parsed = self.pool.lookup(self.program, f, keys, ordered)
+                else:
+                    process = LookupProcess(self.program, f)
+                    try:
+                        parsed = process.lookup(keys, close=True, ordered=ordered)
+                    finally:
+                        process.close()
+            except LookupError as e:
+                self.results['err'] = str(e)
+                return
+
+            if ordered:
+                self.cache.put(fst_hash, d, keys, parsed)
+                # Keys without any output lines aren't in the map
+                parsed.update((k, v) for k, v in cached.items() if v)
+                parsed = {k: set(v) for k, v in parsed.items()}
+            self.results[d] = parsed
 
         if args.lexical:
-            parser(self, "gen", self.gen, self.config.surface_tests)
+            parser(self, "gen", self.gen, self.config.surface_tests, self.config.surface_inputs)
             if self.args.verbose:
                 self.out.info("Generating...\n")
 
         if args.surface:
-            parser(self, "morph", self.morph, self.config.lexical_tests)
+            parser(self, "morph", self.morph, self.config.lexical_tests, self.config.lexical_inputs)
             if self.args.verbose:
                 self.out.info("Morphing...\n")
 
@@ -530,26 +904,6 @@ class MorphTest:
 
 
 
-    def parse_fst_output(self, fst):
-        parsed = {}
-        for item in fst:
-            res = item.replace('\r\n','\n').replace('\r','\n').split('\n')
-            for i in res:
-                if i.strip() != '':
-                    results = re.split(r'\t+', i)
-                    key = results[0].strip()
-                    if not key in parsed:
-                        parsed[key] = set()
-                    # This test is needed because xfst's lookup
-                    # sometimes output strings like
-                    # bearkoe\tbearkoe\t+N+Sg+Nom, instead of the expected
-                    # bearkoe\tbearkoe+N+Sg+Nom
-                    if len(results) > 2 and results[2][0] == '+':
-                        parsed[key].add(results[1].strip() + results[2].strip())
-                    else:
-                        parsed[key].add(results[1].strip())
-        return parsed
-
     def __str__(self):
         return str(self.out)
 
@@ -678,6 +1032,22 @@ class UI(ArgumentParser):
         self.add_argument("-F", "--fallback",
             dest="transducer", nargs='?', required=False,
             help="""Which fallback transducer to use (ignored, use --gen and --morph).""")
+        self.add_argument("-j", "--jobs", dest="jobs", type=int, default=1,
+            help="""Number of lookup processes for each transducer. The
+            queries are split between them (default: 1)""")
+        self.add_argument("--timeout", dest="timeout", type=float, default=DEFAULT_TIMEOUT,
+            help="""Seconds to wait for output from a lookup process
+            which is shared by several files or jobs (default: %d)""" % DEFAULT_TIMEOUT)
+        self.add_argument("--cache", dest="cache", action="store_true",
+            help="""Cache lookup results in an SQLite file and serve the
+            results of unchanged transducers from it""")
+        self.add_argument("--cache-file", dest="cache_file", metavar="FILE",
+            help="""SQLite file for --cache (default:
+            $XDG_CACHE_HOME/fstmorph/lookup-cache.sqlite)""")
+        self.add_argument("--prune-cache", dest="prune_cache", type=float, metavar="DAYS",
+            help="""With --cache, remove cached results of transducers
+            which haven't been used for DAYS days after the run (0: all
+            transducers not used in this run)""")
         self.add_argument("-v", "--verbose",
             dest="verbose", action="store_true",
             help="More verbose output.")
@@ -689,14 +1059,64 @@ class UI(ArgumentParser):
         self.add_argument("--morph", dest="morph", nargs='?', required=False,
             help="Override morph transducer used for test")
 
-        self.add_argument("test_file",
-            help="YAML file with test rules")
-
-        self.test = MorphTest(self.parse_args())
+        self.add_argument("test_file", nargs="+",
+            help="""YAML files with test rules. With several files, one
+            lookup process for each transducer is shared by all files""")
+
+        self.args = self.parse_args()
+        if self.args.jobs < 1:
+            self.error("--jobs must be at least 1")
+        if self.args.cache_file is not None and not self.args.cache:
+            self.error("--cache-file requires --cache")
+        if self.args.prune_cache is not None and not self.args.cache:
+            self.error("--prune-cache requires --cache")
+
+    def open_cache(self):
+        if not self.args.cache:
+            return None
+        path = self.args.cache_file or default_cache_path()
+        try:
+            return LookupCache(path)
+        except (OSError, sqlite3.Error) as e:
+            sys.stderr.write("Can't open lookup cache %s, not using it: %s\n" % (path, e))
+            return None
 
     def start(self):
-        ret = self.test.run()
-        sys.stdout.write(str(self.test))
+        test_files = self.args.test_file
+        pool = None
+        if len(test_files) > 1 or self.args.jobs > 1:
+            pool = LookupPool(self.args.jobs, self.args.timeout)
+        cache = self.open_cache()
+        ret = 0
+        try:
+            for fn in test_files:
+                if len(test_files) == 1:
+                    test = MorphTest(self.args, fn, pool, cache)
+                    ret = test.run()
+                    sys.stdout.write(str(test))
+                    break
+                # With several files, a file which can't be tested is
+                # reported and the remaining files are still tested
+                try:
+                    test = MorphTest(self.args, fn, pool, cache)
+                    ret = max(ret, test.run())
+                except (LookupError, IOError) as e:
+                    sys.stdout.write("YAML test file %s\n" % fn)
+                    sys.stdout.write("Error: %s\n" % e)
+                    ret = max(ret, 1)
+                else:
+                    sys.stdout.write("YAML test file %s\n" % fn)
+                    sys.stdout.write(str(test))
+                sys.stdout.flush()
+        finally:
+            if pool is not None:
+                pool.close()
+            if cache is not None:
+                if self.args.prune_cache is not None:
+                    cache.prune(self.args.prune_cache)
+                if not self.args.silent:
+                    sys.stderr.write(cache.stats())
+                cache.close()
         sys.exit(ret)
 
 def main():
@@ -0,0 +1,114 @@
+"""Tests for the content-hash build cache of csv2lexc."""
+
+import os
+from os.path import join as pjoin, realpath
+
+from fstmorph import csv2lexc as csv2lexc_module
+from fstmorph.benchmarks.synthetic_data import generate
+from fstmorph.csv2lexc import csv2lexc
+from fstmorph.src import build_cache
+from fstmorph.src.build_cache import CACHE_FILE_NAME, BuildCache, hash_inputs
+
+def build(data, lexc_path, **options):
+    os.makedirs(lexc_path, exist_ok=True)
+    csv2lexc(",".join(data.config_files),
+             data.source_path,
+             lexc_path,
+             ",".join(data.database_paths),
+             data.lexical_data_to_exclude,
+             read_lexical_database=True,
+             add_derivations=True,
+             alt_tag=True,
+             verbose=False,
+             **options)
+
+def read_lexc_files(lexc_path):
+    files = {}
+    for file_name in sorted(os.listdir(lexc_path)):
+        if file_name != CACHE_FILE_NAME:
+            with open(pjoin(lexc_path, file_name)) as f:
+                files[file_name] = f.read()
+    return files
+
+def get_mtimes(lexc_path):
+    return {file_name: os.stat(pjoin(lexc_path, file_name)).st_mtime_ns
+            for file_name in os.listdir(lexc_path)}
+
+def get_regenerated_files(lexc_path, mtimes):
+    """Return the lexc files which were written since `mtimes`, except
+       for root.lexc, which is always rendered.
+
+    """
+    return sorted(file_name for file_name, mtime in get_mtimes(lexc_path).items()
+                  if mtime != mtimes[file_name] and
+                  not file_name in [CACHE_FILE_NAME, "root.lexc"])
+
+def test_cache_hit(tmp_path):
+    (tmp_path / "out.lexc").write_text("LEXICON Root\n")
+    cache = BuildCache(str(tmp_path))
+    cache.store("out.lexc", "inputs", {"+Sg", "+Pl"})
+    cache.save()
+    cache = BuildCache(str(tmp_path))
+    assert cache.lookup("out.lexc", "inputs") == {"+Sg", "+Pl"}
+    assert cache.lookup("out.lexc", "other inputs") is None
+    assert cache.lookup("other.lexc", "inputs") is None
+    # Edited output files are regenerated
+    (tmp_path / "out.lexc").write_text("LEXICON Root\n# ;\n")
+    assert cache.lookup("out.lexc", "inputs") is None
+
+def test_input_hash(tmp_path):
+    input_file = tmp_path / "input.csv"
+    input_file.write_text("a,b\n")
+    input_hash = hash_inputs({"root_lexicon": "VerbRoot"}, [str(input_file)], regular=True)
+    assert hash_inputs({"root_lexicon": "VerbRoot"}, [str(input_file)], regular=True) == input_hash
+    assert hash_inputs({"root_lexicon": "NounRoot"}, [str(input_file)], regular=True) != input_hash
+    assert hash_inputs({"root_lexicon": "VerbRoot"}, [str(input_file)], regular=False) != input_hash
+    input_file.write_text("a,c\n")
+    assert hash_inputs({"root_lexicon": "VerbRoot"}, [str(input_file)], regular=True) != input_hash
+    # Creating a missing input also invalidates the hash
+    missing = str(tmp_path / "missing.csv")
+    input_hash = hash_inputs({}, [missing])
+    input_file.rename(missing)
+    assert hash_inputs({}, [missing]) != input_hash
+
+def test_code_hash_covers_csv2lexc(monkeypatch):
+    driver = realpath(csv2lexc_module.__file__)
+    assert driver in [realpath(path) for path in build_cache.CODE_FILES]
+    input_hash = hash_inputs({}, [])
+    hash_file = build_cache.hash_file
+    monkeypatch.setattr(build_cache, "hash_file",
+                        lambda path: "changed" if realpath(path) == driver else hash_file(path))
+    assert hash_inputs({}, []) != input_hash
+
+def test_rebuild_with_build_cache(tmp_path):
+    data = generate(str(tmp_path / "data"), 20)
+    lexc_path = str(tmp_path / "lexc")
+    build(data, lexc_path, build_cache=True)
+    files = read_lexc_files(lexc_path)
+    mtimes = get_mtimes(lexc_path)
+    build(data, lexc_path, build_cache=True)
+    assert read_lexc_files(lexc_path) == files
+    assert get_regenerated_files(lexc_path, mtimes) == []
+    # A new noun in the database only invalidates the noun lexc file
+    with open(pjoin(data.database_paths[0], "NOUNS.csv")) as f:
+        fields = f.read().splitlines()[1].split(",")
+    fields[3] = "newstem"
+    with open(pjoin(data.database_paths[0], "NOUNS.csv"), "a") as f:
+        f.write(",".join(fields) + "\n")
+    mtimes = get_mtimes(lexc_path)
+    build(data, lexc_path, build_cache=True)
+    assert get_regenerated_files(lexc_path, mtimes) == ["ojibwe_nouns.lexc"]
+    assert "newstem" in read_lexc_files(lexc_path)["ojibwe_nouns.lexc"]
+
+def test_parallel_build_with_build_cache(data, tmp_path):
+    # The build cache is sent to the worker processes, so it (and its
+    # logger) must be picklable
+    serial_path = str(tmp_path / "serial")
+    parallel_path = str(tmp_path / "parallel")
+    build(data, serial_path)
+    build(data, parallel_path, jobs=2, build_cache=True)
+    assert os.path.exists(pjoin(parallel_path, CACHE_FILE_NAME))
+    assert read_lexc_files(parallel_path) == read_lexc_files(serial_path)
+    # The second build uses the cache
+    build(data, parallel_path, jobs=2, build_cache=True)
+    assert read_lexc_files(parallel_path) == read_lexc_files(serial_path)
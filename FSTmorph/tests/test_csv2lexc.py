@@ -0,0 +1,118 @@
+"""Tests for complete csv2lexc builds on synthetic data."""
+
+import io
+import json
+import os
+import tracemalloc
+from os.path import join as pjoin
+
+from fstmorph.benchmarks.synthetic_data import generate
+from fstmorph.csv2lexc import csv2lexc, csv2lexc_modules
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.csv_cache import csv_cache
+from fstmorph.src.log import Logger
+
+def get_undefined_lexicons(modules):
+    """Return the continuations of the generated lexc files which aren't
+       defined in any of them (like `EncliticRoot`).
+
+    """
+    lexicons = [module.lexicons for module in modules if module.lexicons is not None]
+    defined = set(name for store in lexicons for name in store)
+    return set(entry.next_lexicon
+               for store in lexicons
+               for name in store
+               for entry in store[name]
+               if entry.next_lexicon != "#" and not entry.next_lexicon in defined)
+
+def test_prune_and_merge_keep_derivation_targets(tmp_path):
+    # Derivations from verbs into noun classes continue into
+    # ojibwe_nouns.lexc. The noun classes have identical endings, so
+    # merging would otherwise rename some of the targets.
+    data = generate(str(tmp_path), 20)
+    with open(pjoin(data.source_path, "DerivationalSpreadsheets", "Der.csv"), "a") as f:
+        f.write("win,Der/win,VAI,VAI_V,NI,NI_C\n")
+        f.write("win,Der/win,VAI,VAI_V,NI,NI_V\n")
+    def build_modules(**options):
+        context = BuildContext(Logger(stream=io.StringIO()))
+        return csv2lexc_modules(data.config_files,
+                                data.source_path,
+                                data.database_paths,
+                                data.lexical_data_to_exclude,
+                                add_derivations=True,
+                                context=context,
+                                **options)
+    undefined = get_undefined_lexicons(build_modules())
+    for options in [{"prune": True}, {"merge_lexicons": True},
+                    {"prune": True, "merge_lexicons": True}]:
+        assert get_undefined_lexicons(build_modules(**options)) <= undefined
+
+def test_modules_match_lexc_files(data, tmp_path):
+    lexc_path = str(tmp_path / "lexc")
+    os.makedirs(lexc_path)
+    csv2lexc(",".join(data.config_files),
+             data.source_path,
+             lexc_path,
+             ",".join(data.database_paths),
+             data.lexical_data_to_exclude,
+             read_lexical_database=True,
+             add_derivations=True,
+             alt_tag=True,
+             verbose=False,
+             log_level="error")
+    stream = io.StringIO()
+    context = BuildContext(Logger(stream=stream, max_repeats=1))
+    modules = csv2lexc_modules(data.config_files,
+                               data.source_path,
+                               data.database_paths,
+                               data.lexical_data_to_exclude,
+                               add_derivations=True,
+                               alt_tag=True,
+                               context=context)
+    # Repeated warnings are summarized before the lexc code is generated
+    assert "Invalid segmented form (missing '<<'): 8 times, 7 not shown" in stream.getvalue()
+    assert sorted(module.file_name for module in modules) == sorted(os.listdir(lexc_path))
+    for module in modules:
+        with open(pjoin(lexc_path, module.file_name)) as f:
+            assert module.text() == f.read(), module.file_name
+
+def test_builds_use_their_own_csv_cache(data, tmp_path):
+    csv2lexc(",".join(data.config_files),
+             data.source_path,
+             str(tmp_path),
+             ",".join(data.database_paths),
+             data.lexical_data_to_exclude,
+             read_lexical_database=True,
+             add_derivations=True,
+             alt_tag=True,
+             verbose=False,
+             log_level="error")
+    for module in csv2lexc_modules(data.config_files,
+                                   data.source_path,
+                                   data.database_paths,
+                                   data.lexical_data_to_exclude,
+                                   add_derivations=True):
+        module.text()
+    assert len(csv_cache.entries) == 0
+
+def test_profile_without_memory_tracing(data, tmp_path):
+    csv2lexc(",".join(data.config_files),
+             data.source_path,
+             str(tmp_path),
+             ",".join(data.database_paths),
+             data.lexical_data_to_exclude,
+             read_lexical_database=True,
+             add_derivations=True,
+             alt_tag=True,
+             verbose=False,
+             jobs=2,
+             profile=True,
+             profile_memory=False,
+             log_level="error")
+    assert not tracemalloc.is_tracing()
+    with open(tmp_path / "profile.json") as f:
+        stages = json.load(f)["stages"]
+    assert set(stage["labels"].get("config") for stage in stages if stage["stage"] == "config") == \
+        set(data.config_files)
+    assert all(stage["allocated"] is None and stage["allocation_peak"] is None
+               for stage in stages)
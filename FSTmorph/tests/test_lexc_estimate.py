@@ -0,0 +1,63 @@
+"""Tests for the path counts of `lexc_estimate`."""
+
+from fstmorph.src.lexc_estimate import count_paths, estimate_modules
+from fstmorph.src.lexc_lookup import LexcLookup
+from fstmorph.src.output import LexcModule
+
+FLAGS = """
+LEXICON Root
+@P.Prefix.NI@:@P.Prefix.NI@ni Flags ;
+@P.Prefix.GI@:@P.Prefix.GI@gi Flags ;
+
+LEXICON Flags
+@R.Prefix.NI@ Endings ;
+
+LEXICON Endings
++1Sg:aa # ;
+"""
+
+def module(text, file_name="root.lexc"):
+    return LexcModule(file_name, lambda: [text])
+
+def test_blocked_flag_paths_are_not_valid():
+    estimate = estimate_modules([module(FLAGS)])
+    assert estimate.complete
+    assert estimate.paths == 2
+    assert estimate.valid_paths == 1
+    assert estimate.loop_free_valid_paths == 1
+    lookup = LexcLookup("Root")
+    lookup.add_lexc(FLAGS)
+    assert lookup.analyze("niaa") == ["+1Sg"]
+    assert lookup.analyze("giaa") == []
+
+def test_missing_nodes_have_no_paths():
+    counts = count_paths({"A": ["B", None], "B": ["Dead"]}, ["A", "Missing"])
+    assert counts.paths == {"A": 1, "B": 0, "Missing": 0}
+    assert counts.loops == []
+
+def test_bounded_loop():
+    # The loop B -> C -> B can't reach the end, so it doesn't add paths
+    counts = count_paths({"A": ["B", None], "B": ["C"], "C": ["B"]}, ["A"])
+    assert counts.paths["A"] == 1
+    assert counts.loop_free_paths["A"] == 1
+    assert counts.loops == ["B"]
+
+def test_unbounded_loop():
+    counts = count_paths({"A": ["B"], "B": ["B", "C"], "C": [None, None]}, ["A"])
+    assert counts.paths["A"] is None
+    assert counts.paths["C"] == 2
+    assert counts.loop_free_paths["A"] == 2
+    assert counts.loops == ["B"]
+
+def test_entry_lexicons():
+    root = module("LEXICON Root\nVerbRoot ;\n")
+    verbs = module("LEXICON VerbRoot\na Suffix ;\nb Suffix ;\n\n"
+                   "LEXICON Suffix\nc EncliticRoot ;\n", "verbs.lexc")
+    enclitics = module("LEXICON EncliticRoot\n# ;\nx # ;\n", "enclitics.lexc")
+    estimate = estimate_modules([root, verbs, enclitics])
+    assert estimate.paths == 4
+    assert estimate.valid_paths == 4
+    entry_lexicons = {m.file_name: m.entry_lexicons for m in estimate.modules}
+    assert entry_lexicons == {"root.lexc": {"Root": (1, 1)},
+                              "verbs.lexc": {"VerbRoot": (2, 2)},
+                              "enclitics.lexc": {"EncliticRoot": (2, 2)}}
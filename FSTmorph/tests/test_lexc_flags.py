@@ -0,0 +1,47 @@
+"""Tests for pruning impossible flag diacritic paths with `lexc_flags`."""
+
+import io
+
+from fstmorph.benchmarks.synthetic_data import generate
+from fstmorph.csv2lexc import csv2lexc_modules
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.lexc_flags import prune_flag_paths
+from fstmorph.src.lexc_lookup import LexcLookup
+from fstmorph.src.lexc_path import LexcEntry
+from fstmorph.src.log import Logger
+
+def test_pruning_keeps_analyses(tmp_path, sample_paths):
+    data = generate(str(tmp_path), 20)
+    context = BuildContext(Logger(stream=io.StringIO()))
+    modules = csv2lexc_modules(data.config_files,
+                               data.source_path,
+                               data.database_paths,
+                               data.lexical_data_to_exclude,
+                               add_derivations=True,
+                               context=context)
+    # The paradigm XX is never set, so these entries are impossible in
+    # a generated module and in a template module
+    verbs = next(module for module in modules if module.file_name == "ojibwe_verbs.lexc")
+    verb_entry = LexcEntry("VerbRoot", "@R.Paradigm.XX@", "@R.Paradigm.XX@", "VerbStems")
+    verbs.lexicons["VerbRoot"].add(verb_entry)
+    enclitics = modules[-1]
+    enclitic_text = enclitics.text().replace("LEXICON EncliticRoot\n",
+                                             "LEXICON EncliticRoot\n@R.Paradigm.XX@nango # ;\n")
+    enclitics.get_chunks = lambda: [enclitic_text]
+    assert "nango" in enclitics.text()
+    before = LexcLookup.from_modules(modules)
+
+    analysis = prune_flag_paths(modules, context)
+    assert analysis.complete
+    assert verb_entry in analysis.impossible_entries
+    assert not verb_entry in verbs.lexicons["VerbRoot"]
+    assert not "nango" in enclitics.text()
+    after = LexcLookup.from_modules(modules)
+    valid = sample_paths(before, 2000)
+    assert len(valid) > 100
+    for analysis_string, form in valid:
+        assert analysis_string in before.analyze(form)
+        assert after.analyze(form) == before.analyze(form)
+        assert after.generate(analysis_string) == before.generate(analysis_string)
+    for _, form in sample_paths(before, 2000, flags=False):
+        assert after.analyze(form) == before.analyze(form)
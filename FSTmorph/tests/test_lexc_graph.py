@@ -0,0 +1,65 @@
+"""Tests comparing the words of lexicons built with and without the
+   sublexicon pruning and merging of `lexc_graph`."""
+
+import io
+from os.path import join as pjoin
+
+from fstmorph.benchmarks.synthetic_data import generate
+from fstmorph.csv2lexc import csv2lexc_modules
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.lexc_lookup import LexcLookup
+from fstmorph.src.log import Logger
+
+def build_modules(data, **options):
+    return csv2lexc_modules(data.config_files,
+                            data.source_path,
+                            data.database_paths,
+                            data.lexical_data_to_exclude,
+                            add_derivations=True,
+                            context=BuildContext(Logger(stream=io.StringIO())),
+                            **options)
+
+def count_entries(modules):
+    return sum(len(entries)
+               for module in modules if module.lexicons is not None
+               for entries in module.lexicons.values())
+
+def assert_same_words(lookup, other, sample_paths):
+    """Check that random paths of `lookup` have the same analyses and
+       generations in `other`, and vice versa.
+
+    """
+    for first, second in [(lookup, other), (other, lookup)]:
+        paths = sample_paths(first, 1000)
+        assert len(paths) > 100
+        for analysis, form in paths:
+            assert second.analyze(form) == first.analyze(form)
+            assert second.generate(analysis) == first.generate(analysis)
+
+def test_pruning_keeps_words(tmp_path, sample_paths):
+    data = generate(str(tmp_path), 20)
+    # There are no VAI_zz stems, so the derivations from VAI_zz are
+    # unreachable
+    with open(pjoin(data.source_path, "DerivationalSpreadsheets", "Der.csv"), "a") as f:
+        f.write("magad,Der/magad,VAI,VAI_zz,VII,VII_n\n")
+    modules = build_modules(data)
+    pruned = build_modules(data, prune=True)
+    assert count_entries(pruned) < count_entries(modules)
+    assert_same_words(LexcLookup.from_modules(modules), LexcLookup.from_modules(pruned),
+                      sample_paths)
+
+def count_lexicons(modules):
+    return sum(len(module.lexicons) for module in modules if module.lexicons is not None)
+
+def test_merging_keeps_words(tmp_path, sample_paths):
+    data = generate(str(tmp_path), 20)
+    # Derivations into merged noun classes in ojibwe_nouns.lexc
+    with open(pjoin(data.source_path, "DerivationalSpreadsheets", "Der.csv"), "a") as f:
+        f.write("win,Der/win,VAI,VAI_V,NI,NI_C\n")
+        f.write("win,Der/win,VAI,VAI_V,NI,NI_V\n")
+    modules = build_modules(data)
+    lookup = LexcLookup.from_modules(modules)
+    for options in [{"merge_lexicons": True}, {"prune": True, "merge_lexicons": True}]:
+        merged = build_modules(data, **options)
+        assert count_lexicons(merged) < count_lexicons(modules)
+        assert_same_words(lookup, LexcLookup.from_modules(merged), sample_paths)
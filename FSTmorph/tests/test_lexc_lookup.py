@@ -0,0 +1,108 @@
+"""Tests for the flag diacritics and loops of `lexc_lookup`."""
+
+import pytest
+
+from fstmorph.src.lexc_lookup import LexcLookup, apply_flag, apply_flags
+
+POS_NI = (True, "NI")
+NEG_NI = (False, "NI")
+POS_GI = (True, "GI")
+
+@pytest.mark.parametrize("flag, before, allowed, after", [
+    # P and N set the feature whatever its value was
+    ("@P.Prefix.NI@", None, True, POS_NI),
+    ("@P.Prefix.NI@", POS_GI, True, POS_NI),
+    ("@N.Prefix.NI@", POS_NI, True, NEG_NI),
+    # R with a value requires that value, without a value any value
+    ("@R.Prefix.NI@", POS_NI, True, POS_NI),
+    ("@R.Prefix.NI@", POS_GI, False, POS_GI),
+    ("@R.Prefix.NI@", NEG_NI, False, NEG_NI),
+    ("@R.Prefix.NI@", None, False, None),
+    ("@R.Prefix@", NEG_NI, True, NEG_NI),
+    ("@R.Prefix@", None, False, None),
+    # D is the inverse of R
+    ("@D.Prefix.NI@", POS_NI, False, POS_NI),
+    ("@D.Prefix.NI@", POS_GI, True, POS_GI),
+    ("@D.Prefix.NI@", NEG_NI, True, NEG_NI),
+    ("@D.Prefix.NI@", None, True, None),
+    ("@D.Prefix@", NEG_NI, False, NEG_NI),
+    ("@D.Prefix@", None, True, None),
+    # C clears the feature
+    ("@C.Prefix@", POS_NI, True, None),
+    ("@C.Prefix@", None, True, None),
+    # U sets unset features and features set negatively to another
+    # value, and otherwise requires the value
+    ("@U.Prefix.NI@", None, True, POS_NI),
+    ("@U.Prefix.NI@", POS_NI, True, POS_NI),
+    ("@U.Prefix.NI@", POS_GI, False, POS_GI),
+    ("@U.Prefix.NI@", (False, "GI"), True, POS_NI),
+    ("@U.Prefix.NI@", NEG_NI, False, NEG_NI),
+])
+def test_apply_flag(flag, before, allowed, after):
+    state = {"Order": (True, "Ind")}
+    if before is not None:
+        state["Prefix"] = before
+    assert apply_flag(flag, state) == allowed
+    assert state.pop("Order") == (True, "Ind")
+    assert state.get("Prefix") == after
+
+def test_apply_flags():
+    state = apply_flags(("@P.Prefix.NI@", "@P.Order.Ind@"), ())
+    assert state == (("Order", (True, "Ind")), ("Prefix", POS_NI))
+    assert apply_flags((), state) is state
+    assert apply_flags(("@R.Prefix.NI@", "@D.Order.Ind@"), state) is None
+
+FLAGS = """
+LEXICON Root
+@P.Prefix.NI@:@P.Prefix.NI@ni Verbs ;
+@P.Prefix.GI@:@P.Prefix.GI@gi Verbs ;
+Verbs ;
+
+LEXICON Verbs
+waabam Endings ;
+
+LEXICON Endings
+@R.Prefix.NI@+1Sg:@R.Prefix.NI@aa # ;
+@R.Prefix.GI@+2Sg:@R.Prefix.GI@aa # ;
+@D.Prefix@+3Sg:@D.Prefix@ # ;
+"""
+
+def test_flags_in_lookup():
+    lookup = LexcLookup()
+    lookup.add_lexc(FLAGS)
+    assert lookup.analyze("niwaabamaa") == ["waabam+1Sg"]
+    assert lookup.analyze("giwaabamaa") == ["waabam+2Sg"]
+    assert lookup.analyze("waabam") == ["waabam+3Sg"]
+    assert lookup.analyze("waabamaa") == []
+    assert lookup.analyze("niwaabam") == []
+    # The prefix is only on the surface side
+    assert lookup.generate("waabam+1Sg") == ["niwaabamaa"]
+    assert lookup.generate("waabam+3Sg") == ["waabam"]
+
+LOOPS = """
+LEXICON Root
+Preverbs ;
+
+LEXICON Preverbs
+Preverbs ;
+Other ;
+@P.PV.Set@gii- Preverbs ;
+Stems ;
+
+LEXICON Other
+Preverbs ;
+
+LEXICON Stems
+@R.PV.Set@:@R.PV.Set@ Stems ;
+nibaa # ;
+"""
+
+def test_loops_without_input():
+    # Preverbs loops to itself and through Other without consuming
+    # input, and Stems loops once the flag is set
+    lookup = LexcLookup()
+    lookup.add_lexc(LOOPS)
+    assert lookup.analyze("nibaa") == ["nibaa"]
+    assert lookup.analyze("gii-gii-nibaa") == ["gii-gii-nibaa"]
+    assert lookup.analyze("gii-") == []
+    assert lookup.generate("gii-nibaa") == ["gii-nibaa"]
@@ -0,0 +1,90 @@
+"""Tests comparing the columnar engine in `lexc_table` with the row-wise
+   `LexcPath` engine on synthetic inflection tables."""
+
+import io
+from os.path import join as pjoin
+
+import pandas as pd
+import pytest
+
+from fstmorph.csv2lexc import read_config
+from fstmorph.src import lexc_table
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.lexc_path import LexcPath
+from fstmorph.src.lexicon_store import LexiconStore
+from fstmorph.src.log import Logger
+
+def read_table(data, conf, name):
+    return pd.read_csv(pjoin(data.source_path, conf["morphology_source_path"], f"{name}.csv"),
+                       keep_default_na=False)
+
+def extend_lexicons(table, conf, regular, engine):
+    """Convert `table` using `engine` ("rows" or "columnar"). Returns
+       the sublexicons, the harvested multichar symbols and the warning
+       counts.
+
+    """
+    context = BuildContext(Logger(verbose=True, stream=io.StringIO()))
+    lexicons = LexiconStore()
+    lexicons[conf["root_lexicon"]] = set()
+    if engine == "rows":
+        for _, row in table.iterrows():
+            LexcPath(row, conf, regular, context).extend_lexicons(lexicons)
+    else:
+        lexc_table.extend_lexicons(table, conf, regular, lexicons, context)
+    return ({name: set(entries) for name, entries in lexicons.items()},
+            context.multichar_symbols,
+            context.logger.repeats)
+
+def assert_same_lexicons(table, conf, regular):
+    lexicons, symbols, warnings = extend_lexicons(table, conf, regular, "rows")
+    columnar_lexicons, columnar_symbols, columnar_warnings = \
+        extend_lexicons(table, conf, regular, "columnar")
+    # Sublexicons are written in the order in which they are created
+    assert list(columnar_lexicons) == list(lexicons)
+    assert columnar_lexicons == lexicons
+    assert columnar_symbols == symbols
+    assert columnar_warnings == warnings
+
+def add_defective_rows(table, conf):
+    """Return a copy of `table` with missing forms and forms without
+       morpheme boundaries.
+
+    """
+    table = table.copy()
+    missing = conf["missing_form_marker"]
+    # No forms at all
+    table.loc[0, ["Form1Surface", "Form2Surface", "Form2Split"]] = [missing, "", ""]
+    table.loc[1, ["Form1Surface", "Form1Split", "Form2Surface", "Form2Split"]] = ["", "", "", ""]
+    # Only a second form, which doesn't get the +Alt tag
+    table.loc[2, ["Form1Surface", "Form2Surface", "Form2Split"]] = [missing, "abc", "<<abc>>d"]
+    # Missing prefix boundary, suffix boundary and both
+    table.loc[3, "Form1Split"] = "ab>>c"
+    table.loc[4, "Form1Split"] = "a<<bc"
+    table.loc[5, ["Form1Split", "Form2Surface", "Form2Split"]] = ["abc", "abcd", "abc>>d"]
+    return table
+
+@pytest.fixture(params=[True, False], ids=["alt_tag", "no_alt_tag"])
+def configs(request, data):
+    return [read_config(config_file, data.database_paths, request.param)
+            for config_file in data.config_files]
+
+def test_regular_tables(data, configs):
+    for conf in configs:
+        for name in conf["regular_csv_files"]:
+            assert_same_lexicons(read_table(data, conf, name), conf, regular=True)
+
+def test_irregular_tables(data, configs):
+    conf = configs[0]
+    conf["root_lexicon"] += "Irregular"
+    for name in conf["irregular_csv_files"]:
+        assert_same_lexicons(read_table(data, conf, name), conf, regular=False)
+
+def test_missing_forms_and_boundaries(data, configs):
+    for conf in configs:
+        table = add_defective_rows(read_table(data, conf, conf["regular_csv_files"][0]), conf)
+        assert_same_lexicons(table, conf, regular=True)
+    conf = configs[0]
+    conf["root_lexicon"] += "Irregular"
+    table = add_defective_rows(read_table(data, conf, conf["irregular_csv_files"][0]), conf)
+    assert_same_lexicons(table, conf, regular=False)
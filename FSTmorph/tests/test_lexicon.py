@@ -0,0 +1,104 @@
+"""Tests for reading lexical databases into a LexcFile."""
+
+import io
+import json
+from os.path import join as pjoin
+
+import pandas as pd
+import pytest
+
+from fstmorph.benchmarks.synthetic_data import generate
+from fstmorph.csv2lexc import read_config
+from fstmorph.src.build_context import BuildContext
+from fstmorph.src.lexicon import LexcFile, read_database_chunks, read_exclusions
+from fstmorph.src.log import Logger
+
+def read_database(database_path, file_name):
+    return pd.read_csv(pjoin(database_path, file_name), keep_default_na=False, dtype=str)
+
+def build_lexicon(data, conf, read_lexical_database=True, exclude=None, context=None):
+    return LexcFile(conf,
+                    data.source_path,
+                    None,
+                    data.database_paths,
+                    exclude,
+                    read_lexical_database,
+                    add_derivations=False,
+                    regular=True,
+                    context=context or BuildContext(Logger(stream=io.StringIO())))
+
+def get_stem_entries(lexicon):
+    return set(entry
+               for name in lexicon.lexicons if name.endswith("_Stems")
+               for entry in lexicon.lexicons[name])
+
+def write_exclusions(path, rows):
+    pd.DataFrame(rows, columns=["Directory", "Field", "Value"]).to_csv(path, index=False)
+    return str(path)
+
+def test_exclusions_apply_to_their_directory(data, tmp_path):
+    conf = read_config(data.config_files[0], data.database_paths, alt_tag=False)
+    databases = [read_database(path, conf["lexical_database"]) for path in data.database_paths]
+    excluded_lemma = databases[1]["Lemma"][0]
+    exclude = write_exclusions(tmp_path / "exclude.csv",
+                               [["OPD", "Class", "VAI_rfx"],
+                                ["Community", "Lemma", excluded_lemma]])
+    table_entries = get_stem_entries(build_lexicon(data, conf, read_lexical_database=False))
+    database_entries = get_stem_entries(build_lexicon(data, conf, exclude=exclude)) - table_entries
+    kept = set()
+    for database, excluded in zip(databases, [databases[0]["Class"] == "VAI_rfx",
+                                              databases[1]["Lemma"] == excluded_lemma]):
+        assert excluded.any()
+        kept.update(zip(database["Paradigm"][~excluded] + "_Stems",
+                        database["Lemma"][~excluded],
+                        database["Stem"][~excluded],
+                        database["Paradigm"][~excluded] + "_Class=" +
+                        database["Class"][~excluded] + "_Boundary"))
+    assert set(tuple(entry) for entry in database_entries) == kept
+    # VAI_rfx entries are only excluded from OPD
+    assert (databases[1]["Class"] == "VAI_rfx").any()
+    assert any(entry.next_lexicon == "VAI_Class=VAI_rfx_Boundary" for entry in database_entries)
+
+def test_bad_exclusion_rows_are_reported(tmp_path):
+    exclude = write_exclusions(tmp_path / "exclude.csv",
+                               [["OPD", "Lemma", "x"],
+                                ["OPD", "Gloss", "y"],
+                                ["Community", "Stem", "z"]])
+    stream = io.StringIO()
+    context = BuildContext(Logger(stream=stream, json_lines=True))
+    exclusions = read_exclusions(exclude, context)
+    assert exclusions == {"OPD": {"Class": set(), "Lemma": {"x"}, "Paradigm": set(), "Stem": set()},
+                          "Community": {"Class": set(), "Lemma": set(), "Paradigm": set(),
+                                        "Stem": {"z"}}}
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(r["level"], r["file"], r["row"], r["field"]) for r in records] == \
+        [("warning", exclude, 1, "Gloss")]
+
+def test_unknown_paradigm_in_database(tmp_path):
+    data = generate(str(tmp_path), 20)
+    conf = read_config(data.config_files[0], data.database_paths, alt_tag=False)
+    with open(pjoin(data.database_paths[0], conf["lexical_database"]), "a") as f:
+        f.write("VXX,VXX_a,lemma,stem,synthetic\n")
+    with pytest.raises(KeyError, match="VXX_Stems"):
+        build_lexicon(data, conf)
+
+def test_read_database_chunks(data):
+    database_file = pjoin(data.database_paths[0], "VERBS.csv")
+    whole = next(read_database_chunks(database_file, None))
+    chunks = list(read_database_chunks(database_file, 7))
+    assert len(chunks) == -(-len(whole) // 7)
+    assert all(len(chunk) <= 7 for chunk in chunks)
+    pd.testing.assert_frame_equal(pd.concat(chunks), whole)
+
+@pytest.mark.parametrize("chunk_size, threads", [(7, 1), (0, 2), (7, 2)])
+def test_chunked_and_threaded_database_reading(data, chunk_size, threads):
+    for config_file in data.config_files:
+        conf = read_config(config_file, data.database_paths, alt_tag=False)
+        expected = build_lexicon(data, conf, exclude=data.lexical_data_to_exclude).to_module().text()
+        conf = read_config(config_file, data.database_paths, alt_tag=False,
+                           database_chunk_size=chunk_size, database_threads=threads)
+        # The lexc code is the same in every build, however the threads
+        # are scheduled
+        for _ in range(3):
+            lexicon = build_lexicon(data, conf, exclude=data.lexical_data_to_exclude)
+            assert lexicon.to_module().text() == expected
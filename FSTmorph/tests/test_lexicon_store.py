@@ -0,0 +1,48 @@
+"""Tests for the packed sublexicons of `lexicon_store`."""
+
+import pytest
+
+from fstmorph.src.lexc_path import LexcEntry
+from fstmorph.src.lexicon_store import LexiconStore
+
+def make_store():
+    lexicons = LexiconStore()
+    lexicons["VTA_Stems"] = {LexcEntry("VTA_Stems", "waabam", "waabam", "VTA_Boundary"),
+                             ("VTA_Stems", "nisaabaw", "nisaabaw", "VTA_Boundary")}
+    return lexicons
+
+def test_entries_round_trip():
+    lexicons = make_store()
+    assert list(lexicons) == ["VTA_Stems"]
+    assert sorted(lexicons["VTA_Stems"]) == \
+        [LexcEntry("VTA_Stems", "nisaabaw", "nisaabaw", "VTA_Boundary"),
+         LexcEntry("VTA_Stems", "waabam", "waabam", "VTA_Boundary")]
+    lexicons["VTA_Stems"].add(LexcEntry("VTA_Stems", "waabam", "waabam", "VTA_Boundary"))
+    assert len(lexicons["VTA_Stems"]) == 2
+
+def test_entries_of_other_lexicons_are_rejected():
+    lexicons = make_store()
+    entry = LexcEntry("VAI_Stems", "nibaa", "nibaa", "VAI_Boundary")
+    with pytest.raises(ValueError, match="LEXICON VAI_Stems"):
+        lexicons["VTA_Stems"].add(entry)
+    with pytest.raises(ValueError, match="LEXICON VAI_Stems"):
+        lexicons["VAI_Stems"] = [entry._replace(lexicon="VTA_Stems")]
+    # Entries of other lexicons are never members
+    waabam = LexcEntry("VTA_Stems", "waabam", "waabam", "VTA_Boundary")
+    assert waabam in lexicons["VTA_Stems"]
+    lexicons["VAI_Stems"] = set()
+    assert not waabam._replace(lexicon="VAI_Stems") in lexicons["VTA_Stems"]
+    lexicons["VTA_Stems"].discard(waabam._replace(lexicon="VAI_Stems"))
+    assert len(lexicons["VTA_Stems"]) == 2
+
+def test_lookups_dont_intern_symbols():
+    lexicons = make_store()
+    symbols = len(lexicons.symbols)
+    unseen = LexcEntry("VTA_Stems", "waabam", "waabam", "VTA_Unseen")
+    assert not unseen in lexicons["VTA_Stems"]
+    lexicons["VTA_Stems"].discard(unseen)
+    # Known symbols in a combination which isn't an entry
+    assert not LexcEntry("VTA_Stems", "waabam", "nisaabaw", "VTA_Boundary") in lexicons["VTA_Stems"]
+    assert len(lexicons.symbols) == symbols
+    lexicons["VTA_Stems"].discard(LexcEntry("VTA_Stems", "waabam", "waabam", "VTA_Boundary"))
+    assert [entry.analysis for entry in lexicons["VTA_Stems"]] == ["nisaabaw"]
@@ -0,0 +1,105 @@
+"""Tests for the leveled and aggregated logging of `log`."""
+
+import io
+import json
+import pickle
+
+from fstmorph.src.log import ERROR, Logger
+
+def lines(stream):
+    return [line.replace("\033[0;31m", "").replace(" \033[0m", "")
+            for line in stream.getvalue().splitlines()]
+
+def test_levels():
+    stream = io.StringIO()
+    logger = Logger(stream=stream)
+    logger.info("shown")
+    logger.info("hidden", force=False)
+    logger.debug("hidden")
+    logger.warn("warning")
+    logger.warn("hidden warning", force=False)
+    assert lines(stream) == ["shown", "warning"]
+    stream = io.StringIO()
+    logger = Logger(verbose=True, stream=stream)
+    logger.info("detail", force=False)
+    assert lines(stream) == ["detail"]
+    stream = io.StringIO()
+    logger = Logger(verbose=True, stream=stream, level=ERROR)
+    logger.warn("warning")
+    logger.error("error")
+    assert lines(stream) == ["error"]
+
+def test_lazy_messages():
+    calls = []
+    def part():
+        calls.append(1)
+        return "expensive"
+    stream = io.StringIO()
+    logger = Logger(stream=stream)
+    logger.info("not", part, force=False)
+    assert calls == []
+    logger.info("an", part, "message")
+    assert calls == [1]
+    assert lines(stream) == ["an expensive message"]
+
+def test_repeat_limit_and_flush():
+    stream = io.StringIO()
+    logger = Logger(stream=stream, max_repeats=2)
+    for i in range(5):
+        logger.warn(f"Invalid form {i}", key="Invalid form")
+    logger.warn("Other", key="Other")
+    formatted = []
+    logger.warn_all(range(4), lambda i: formatted.append(i) or f"Missing {i}", key="Invalid form")
+    # The limit is shared by warn() and warn_all(), and messages which
+    # aren't printed aren't formatted
+    assert formatted == []
+    logger.warn_all(range(3), lambda i: f"Missing {i}", key="Missing")
+    assert lines(stream) == ["Invalid form 0", "Invalid form 1", "Other", "Missing 0", "Missing 1"]
+    assert logger.repeats == {"Invalid form": (9, 2), "Other": (1, 1), "Missing": (3, 2)}
+    logger.flush()
+    assert lines(stream)[5:] == ["Invalid form: 9 times, 7 not shown",
+                                 "Missing: 3 times, 1 not shown"]
+    assert logger.repeats == {}
+    # The counters start again after flushing
+    logger.warn("Invalid form 9", key="Invalid form")
+    assert lines(stream)[-1] == "Invalid form 9"
+
+def test_verbose_mode_prints_all_warnings():
+    stream = io.StringIO()
+    logger = Logger(verbose=True, stream=stream, max_repeats=1)
+    for i in range(3):
+        logger.warn(f"Invalid form {i}", key="Invalid form")
+    logger.flush()
+    assert lines(stream) == ["Invalid form 0", "Invalid form 1", "Invalid form 2"]
+
+def test_flush_above_warning_level():
+    stream = io.StringIO()
+    logger = Logger(stream=stream, level=ERROR, max_repeats=1)
+    for i in range(3):
+        logger.warn(f"Invalid form {i}", key="Invalid form")
+    logger.flush()
+    assert stream.getvalue() == ""
+    assert logger.repeats == {}
+
+def test_json_lines():
+    stream = io.StringIO()
+    logger = Logger(stream=stream, json_lines=True, max_repeats=1)
+    logger.info("Reading", "VTA_IND.csv", file="VTA_IND.csv", rows=lambda: 10)
+    logger.warn("Invalid form", key="Invalid form", row=1)
+    logger.warn("Invalid form", key="Invalid form", row=2)
+    logger.flush()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert records == [{"level": "info", "message": "Reading VTA_IND.csv",
+                        "file": "VTA_IND.csv", "rows": 10},
+                       {"level": "warning", "message": "Invalid form", "key": "Invalid form",
+                        "row": 1},
+                       {"level": "warning", "message": "Invalid form: 2 times, 1 not shown",
+                        "key": "Invalid form", "count": 2, "suppressed": 1}]
+
+def test_pickle():
+    logger = Logger(verbose=True, max_repeats=1)
+    logger.count_repeat("Invalid form", 3)
+    copy = pickle.loads(pickle.dumps(logger))
+    assert copy.verbose and copy.repeats == {"Invalid form": (3, 3)}
+    with copy.lock:
+        pass
@@ -0,0 +1,196 @@
+"""Tests for the lookup processes of `run_yaml_tests` using a fake
+   lookup application."""
+
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+from fstmorph.tests import run_yaml_tests
+
+FAKE_LOOKUP = """\
+import sys
+# The "transducer" is a file of tab-separated input/output pairs. The
+# first line selects how the output is broken.
+with open(sys.argv[-1]) as f:
+    mode = f.readline().strip()
+    pairs = {}
+    for line in f:
+        i, o = line.rstrip("\\n").split("\\t")
+        pairs.setdefault(i, []).append(o)
+if mode == "crash":
+    sys.stderr.write("fst broken\\n")
+    sys.exit(3)
+out = sys.stdout
+if mode == "buffered":
+    out = open(1, "w", buffering=1 << 16, closefd=False)
+for n, line in enumerate(sys.stdin):
+    q = line.rstrip("\\n")
+    if mode == "warning" and n == 1:
+        out.write("Warning: something happened\\n")
+    for o in pairs.get(q, [q + "+?"]):
+        out.write(q + "\\t" + o + "\\t0.0\\n")
+    out.write("\\n")
+    if mode == "extra-blank" and n == 0:
+        out.write("\\n")
+    if mode != "buffered":
+        out.flush()
+"""
+
+PAIRS = [("walk+V", "walks"), ("walk+V", "walked"), ("run+V", "runs")]
+
+@pytest.fixture
+def fake_lookup(tmp_path):
+    script = tmp_path / "fakelookup.py"
+    script.write_text(FAKE_LOOKUP)
+    return [sys.executable, str(script)]
+
+def write_fst(path, mode="ok", pairs=PAIRS):
+    with open(path, "w") as f:
+        f.write(mode + "\n")
+        for i, o in pairs:
+            f.write(f"{i}\t{o}\n")
+    return str(path)
+
+def test_shared_process(fake_lookup, tmp_path):
+    process = run_yaml_tests.LookupProcess(fake_lookup, write_fst(tmp_path / "gen.tsv"), timeout=10)
+    try:
+        assert process.lookup(["walk+V", "run+V"]) == {"walk+V": {"walks", "walked"},
+                                                       "run+V": {"runs"}}
+        assert process.lookup(["sing+V"], ordered=True) == {"sing+V": ["sing+V+?"]}
+        assert process.alive()
+    finally:
+        process.close()
+
+def test_single_lookup(fake_lookup, tmp_path):
+    process = run_yaml_tests.LookupProcess(fake_lookup, write_fst(tmp_path / "gen.tsv"))
+    try:
+        assert process.lookup(["walk+V"], close=True, ordered=True) == \
+            {"walk+V": ["walks", "walked"]}
+    finally:
+        process.close()
+
+@pytest.mark.parametrize("mode, message", [("buffered", "No output for 0.5 seconds"),
+                                           ("extra-blank", "no result for `run+V`"),
+                                           ("warning", "Unexpected lookup output for `run+V`")])
+def test_broken_output(fake_lookup, tmp_path, mode, message):
+    process = run_yaml_tests.LookupProcess(fake_lookup, write_fst(tmp_path / "gen.tsv", mode),
+                                           timeout=0.5)
+    try:
+        with pytest.raises(run_yaml_tests.LookupError, match=re.escape(message)):
+            process.lookup(["walk+V", "run+V"])
+        assert not process.alive()
+    finally:
+        process.close()
+
+def test_pool_restarts_failed_process(fake_lookup, tmp_path):
+    fst = write_fst(tmp_path / "gen.tsv", "warning")
+    pool = run_yaml_tests.LookupPool(timeout=10)
+    try:
+        with pytest.raises(run_yaml_tests.LookupError):
+            pool.lookup(fake_lookup, fst, ["walk+V", "run+V"])
+        write_fst(fst)
+        assert pool.lookup(fake_lookup, fst, ["run+V"]) == {"run+V": {"runs"}}
+    finally:
+        pool.close()
+
+def write_yaml(path, gen, morph, app):
+    with open(path, "w") as f:
+        f.write("Config:\n"
+                "  hfst:\n"
+                f"    Gen: {gen}\n"
+                f"    Morph: {morph}\n"
+                f"    App: {' '.join(app)}\n"
+                "Tests:\n"
+                "  Verbs:\n"
+                "    walk+V: [walks, walked]\n"
+                "    run+V: runs\n")
+    return str(path)
+
+def test_continue_after_failed_file(fake_lookup, tmp_path):
+    gen = write_fst(tmp_path / "gen.tsv")
+    morph = write_fst(tmp_path / "morph.tsv", pairs=[(o, i) for i, o in PAIRS])
+    broken = write_fst(tmp_path / "broken.tsv", "crash")
+    test_files = [write_yaml(tmp_path / "missing.yaml", tmp_path / "missing.tsv", morph, fake_lookup),
+                  write_yaml(tmp_path / "crash.yaml", broken, morph, fake_lookup),
+                  write_yaml(tmp_path / "good.yaml", gen, morph, fake_lookup)]
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path / "cache"))
+    result = subprocess.run([sys.executable, run_yaml_tests.__file__] + test_files,
+                            capture_output=True, encoding="utf-8", env=env)
+    assert result.returncode == 1
+    sections = result.stdout.split("YAML test file ")
+    assert sections[1].startswith(test_files[0])
+    assert "Error: File %s does not exist." % (tmp_path / "missing.tsv") in sections[1]
+    assert sections[2].startswith(test_files[1])
+    assert "Error:" in sections[2] and "fst broken" in sections[2]
+    assert sections[3].startswith(test_files[2])
+    assert "Total passes: 6, Total fails: 0" in sections[3]
+
+def test_cache_hit(tmp_path):
+    fst = write_fst(tmp_path / "gen.tsv")
+    cache = run_yaml_tests.LookupCache(str(tmp_path / "cache.sqlite"))
+    fst_hash = cache.transducer_hash(["lookup"], fst)
+    keys = ["key%d" % i for i in range(run_yaml_tests.MAX_QUERY_KEYS + 10)]
+    assert cache.get(fst_hash, "gen", keys) == {}
+    cache.put(fst_hash, "gen", keys, {key: [key + "+A", key + "+B"] for key in keys[1:]})
+    cache.close()
+
+    cache = run_yaml_tests.LookupCache(str(tmp_path / "cache.sqlite"))
+    assert cache.transducer_hash(["lookup"], fst) == fst_hash
+    cached = cache.get(fst_hash, "gen", keys + ["missing"])
+    assert list(cached) == keys
+    assert cached[keys[0]] == []
+    assert cached[keys[1]] == [keys[1] + "+A", keys[1] + "+B"]
+    assert cache.get(fst_hash, "morph", keys) == {}
+    assert (cache.hits, cache.misses) == (len(keys), 1 + len(keys))
+    cache.close()
+
+def test_cache_invalidation(tmp_path):
+    fst = write_fst(tmp_path / "gen.tsv")
+    cache = run_yaml_tests.LookupCache(str(tmp_path / "cache.sqlite"))
+    fst_hash = cache.transducer_hash(["lookup"], fst)
+    cache.put(fst_hash, "gen", ["walk+V"], {"walk+V": ["walks"]})
+    assert cache.transducer_hash(["lookup", "-q"], fst) != fst_hash
+    write_fst(fst, pairs=[("walk+V", "walkses")])
+    new_hash = cache.transducer_hash(["lookup"], fst)
+    assert new_hash != fst_hash
+    assert cache.get(new_hash, "gen", ["walk+V"]) == {}
+    cache.close()
+
+def test_cache_prune(tmp_path):
+    old_fst = write_fst(tmp_path / "old.tsv")
+    new_fst = write_fst(tmp_path / "new.tsv", pairs=[])
+    cache = run_yaml_tests.LookupCache(str(tmp_path / "cache.sqlite"))
+    old_hash = cache.transducer_hash(["lookup"], old_fst)
+    cache.put(old_hash, "gen", ["a", "b"], {"a": ["x"], "b": ["y"]})
+    cache.close()
+
+    cache = run_yaml_tests.LookupCache(str(tmp_path / "cache.sqlite"))
+    new_hash = cache.transducer_hash(["lookup"], new_fst)
+    cache.put(new_hash, "gen", ["a"], {"a": ["z"]})
+    cache.prune(1)
+    assert cache.pruned == 0
+    cache.prune(0)
+    assert cache.pruned == 2
+    assert cache.get(old_hash, "gen", ["a", "b"]) == {}
+    assert cache.get(new_hash, "gen", ["a"]) == {"a": ["z"]}
+    cache.close()
+
+def test_cache_is_opt_in(fake_lookup, tmp_path):
+    gen = write_fst(tmp_path / "gen.tsv")
+    morph = write_fst(tmp_path / "morph.tsv", pairs=[(o, i) for i, o in PAIRS])
+    test_file = write_yaml(tmp_path / "test.yaml", gen, morph, fake_lookup)
+    # The results are printed in set order
+    env = dict(os.environ, XDG_CACHE_HOME=str(tmp_path / "cache"), PYTHONHASHSEED="0")
+    def run(*args):
+        return subprocess.run([sys.executable, run_yaml_tests.__file__, *args, test_file],
+                              capture_output=True, encoding="utf-8", env=env)
+    uncached = run()
+    assert not os.path.exists(tmp_path / "cache")
+    assert not "Lookup cache" in uncached.stderr
+    assert "Lookup cache: 0 hits, 5 misses" in run("--cache").stderr
+    cached = run("--cache")
+    assert "Lookup cache: 5 hits, 0 misses" in cached.stderr
+    assert cached.stdout == uncached.stdout